@@ -0,0 +1,74 @@
+"""Compare diffing character metadata of a whole group at once against queuing it track by track
+
+Usage: python benchmarks/bench_character_diff.py [num_tracks]
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from amqcsl.objects import CSLTrack
+from amqcsl.objects._db_types import CSLExtraMetadata, CSLMetadata, ExtraMetadata
+from amqcsl.workflows import character as cm
+
+RESOURCES = Path(__file__).parent.parent / 'tests' / 'resources'
+
+
+def make_tracks(num_tracks: int) -> list[tuple[CSLTrack, CSLMetadata | None]]:
+    with open(RESOURCES / 'superstar' / 'aspire.json') as file:
+        base = json.load(file)
+    rtn: list[tuple[CSLTrack, CSLMetadata | None]] = []
+    for i in range(num_tracks):
+        data = dict(base[i % len(base)])
+        data['id'] = f'{data["id"]}-{i}'
+        track = CSLTrack.from_json(data)
+        # Half the tracks already have some character metadata, one of which is stale
+        extra_metas = [
+            CSLExtraMetadata(f'meta-{i}-{j}', 2, 'Character', name)
+            for j, name in enumerate([cred.artist.name for cred in track.artist_credits][:1] + ['Old Character'])
+        ]
+        meta = CSLMetadata(False, [], extra_metas, len(extra_metas), []) if i % 2 else None
+        rtn.append((track, meta))
+    return rtn
+
+
+def best_of(func: Callable[[], object], repeat: int = 3) -> float:
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def per_track(tracks: list[tuple[CSLTrack, CSLMetadata | None]], artist_to_meta: cm.ArtistToMeta) -> None:
+    report = cm.UnknownArtistReport()
+    for track, meta in tracks:
+        if track.type == 'OffVocal':
+            continue
+        bundle = cm.QueueCharacterMetadataBundle(track, artist_to_meta, meta, report)
+        # Adds are only filtered when vended, so count that as part of the diff
+        for sub_bundle in bundle.bundles:
+            bool(sub_bundle)
+
+
+def main(num_tracks: int) -> None:
+    tracks = make_tracks(num_tracks)
+    artists = {cred.artist for track, _ in tracks for cred in track.artist_credits}
+    artist_to_meta = {
+        artist: [ExtraMetadata(True, 'Character', artist.name), ExtraMetadata(True, 'Character', f'{artist.name} 2')]
+        for artist in artists
+    }
+
+    per_track_time = best_of(lambda: per_track(tracks, artist_to_meta))
+    bulk_time = best_of(lambda: cm.diff_character_metadata(tracks, artist_to_meta))
+    print(f'{num_tracks} tracks')
+    print(f'per track: {per_track_time:8.3f} s')
+    print(f'bulk:      {bulk_time:8.3f} s')
+    print(f'speedup:   {per_track_time / bulk_time:8.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
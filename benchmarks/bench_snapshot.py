@@ -0,0 +1,52 @@
+"""Compare loading tracks from a snapshot against re-parsing JSON
+
+Usage: python benchmarks/bench_snapshot.py [num_tracks]
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from amqcsl.objects import CSLTrack, dumps_snapshot, loads_snapshot
+
+RESOURCES = Path(__file__).parent.parent / 'tests' / 'resources'
+
+
+def make_tracks_json(num_tracks: int) -> list[dict[str, object]]:
+    with open(RESOURCES / 'idolypride' / 'tracks.json') as file:
+        base = json.load(file)
+    rtn: list[dict[str, object]] = []
+    for i in range(num_tracks):
+        data = dict(base[i % len(base)])
+        data['id'] = f'{data["id"]}-{i}'
+        rtn.append(data)
+    return rtn
+
+
+def best_of(func: Callable[[], object], repeat: int = 3) -> float:
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(num_tracks: int) -> None:
+    raw_json = json.dumps(make_tracks_json(num_tracks)).encode()
+    tracks = [CSLTrack.from_json(data) for data in json.loads(raw_json)]
+    snapshot = dumps_snapshot(tracks)
+    assert loads_snapshot(snapshot) == tracks
+
+    json_time = best_of(lambda: [CSLTrack.from_json(data) for data in json.loads(raw_json)])
+    snapshot_time = best_of(lambda: loads_snapshot(snapshot))
+    print(f'{num_tracks} tracks')
+    print(f'json:     {len(raw_json) / 1e6:8.2f} MB {json_time:8.3f} s')
+    print(f'snapshot: {len(snapshot) / 1e6:8.2f} MB {snapshot_time:8.3f} s')
+    print(f'speedup:  {json_time / snapshot_time:8.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
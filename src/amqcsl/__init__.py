@@ -1,4 +1,5 @@
 from .clients._sync_client import DBClient
 from .clients._async_client import AsyncDBClient
+from .clients._driver import AsyncioExecutor, SerialExecutor, ThreadExecutor
 
-__all__ = ['DBClient', 'AsyncDBClient']
+__all__ = ['DBClient', 'AsyncDBClient', 'SerialExecutor', 'ThreadExecutor', 'AsyncioExecutor']
@@ -0,0 +1,33 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+
+def write_json_file(path: Path, data: Any) -> None:
+    """Write data to a JSON file, e.g. a local manifest, journal or cache
+
+    Args:
+        path: Path to the file
+        data: JSON serializable data
+    """
+    # Write to a temporary file first, so a crash never leaves a half written file behind
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_json_file(path: Path) -> Any:
+    """Read a JSON file written by write_json_file
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Decoded JSON, or None if the file doesn't exist
+    """
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
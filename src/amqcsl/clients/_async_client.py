@@ -1,6 +1,18 @@
 import asyncio
+import contextlib
 import logging
-from collections.abc import AsyncIterator, Callable, Coroutine, Iterable, Sequence
+import time
+from collections import deque
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Iterable,
+    Mapping,
+    Sequence,
+)
 from functools import cached_property
 from os import PathLike
 from pathlib import Path
@@ -11,10 +23,17 @@ import httpx
 from attrs import define, field
 from attrs.validators import gt, instance_of, le, optional
 
+from amqcsl.clients._audio import AudioManifest, UploadJournal, aiter_file
+from amqcsl.clients._driver import AsyncioExecutor, adrive, aiter_steps, arequest_step
+from amqcsl.clients.bundles._core import JSONCodec, default_json_codec
 from amqcsl.clients.bundles._misc import (
+    UPLOAD_ERRORS,
     AddAudioBundle,
+    AudioUploadReport,
     AuthBundle,
     Bundle,
+    ChunkedListEditBundle,
+    ChunkResult,
     CreateAlbumBundle,
     CreateGroupBundle,
     CreateListBundle,
@@ -28,14 +47,22 @@ from amqcsl.clients.bundles._misc import (
     GroupEditBundle,
     ListBundle,
     ListEditBundle,
+    ListEditResult,
     LogoutBundle,
     SongAddMetadataBundle,
     SongDeleteBundle,
     SongDeleteMetadataBundle,
     SongEditBundle,
     TrackAddMetadataBundle,
+    TrackBatchAddMetadataBundle,
     TrackDeleteMetadataBundle,
     TrackEditBundle,
+    TracksEditBundle,
+    UploadSession,
+    is_retryable,
+    presign_request,
+    read_upload_session,
+    upload_request,
 )
 from amqcsl.clients.bundles._pages import (
     IterArtistsBundle,
@@ -43,6 +70,7 @@ from amqcsl.clients.bundles._pages import (
     IterTracksBundle,
     PageBundle,
     PageMultiVendor,
+    RawPage,
 )
 from amqcsl.exceptions import ClientDoesNotExistError
 from amqcsl.objects._db_types import (
@@ -77,6 +105,29 @@ async def default_func[T](_: 'AsyncDBClient', item: T) -> T:
     return item
 
 
+#: Seconds between journal saves in add_audio_many
+_JOURNAL_SAVE_INTERVAL = 1.0
+
+
+class _ByteBudget:
+    """Semaphore over bytes, a single item larger than the limit is let through alone"""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size: int) -> None:
+        async with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
 @define
 class AsyncDBClient:
     """Async client for accessing the db.
@@ -97,6 +148,10 @@ class AsyncDBClient:
     max_query_size: int = field(default=1500, validator=[instance_of(int), gt(0)])
     #: Maximum number of concurrent requests
     max_request_count: int = field(default=15, validator=[instance_of(int), gt(0), le(50)])
+    #: JSON backend for decoding responses and encoding request bodies, defaults to orjson/msgspec if installed
+    json_codec: JSONCodec = field(factory=default_json_codec, validator=instance_of(JSONCodec))
+    #: Executor for requests sent together, on top of max_request_count
+    executor: AsyncioExecutor = field(factory=AsyncioExecutor, validator=instance_of(AsyncioExecutor))
 
     _lists: CSLLists = field(factory=dict)
     _groups: CSLGroups = field(factory=dict)
@@ -139,19 +194,8 @@ class AsyncDBClient:
             Output of the bundle
         """
         logger.debug(f'Processing {type(bundle)}')
-        client = self.client
-        g = bundle.vendor(client)
-        res: httpx.Response | Sequence[httpx.Response] | None = None
-        while True:
-            try:
-                req = g.send(res)  # type: ignore[reportArgumentType]
-            except StopIteration as e:
-                return e.value
-            match req:
-                case httpx.Request():
-                    res = await self._send_request(req)
-                case reqs:
-                    res = await asyncio.gather(*map(self._send_request, reqs))
+        step = arequest_step(self._send_request, self.executor)
+        return await adrive(bundle.vendor(self.client, self.json_codec), step)  # type: ignore[reportArgumentType]
 
     def enqueue(self, bundle: Bundle[None]):
         """Add an object to the queue
@@ -202,7 +246,7 @@ class AsyncDBClient:
         else:
             if isinstance(exc_val, httpx.HTTPStatusError):
                 try:
-                    error_data = exc_val.response.json()
+                    error_data = self.json_codec.loads(exc_val.response.content)
                     logger.error('JSON given with error, check logs', extra={'data': error_data})
                 except Exception:
                     logger.error('No JSON given with error')
@@ -245,34 +289,19 @@ class AsyncDBClient:
     async def _process_pages[T](
         self,
         bundle: PageBundle[T, PageMultiVendor],
+        max_pages: int | None = None,
     ) -> AsyncIterator[T]:
         logger.debug(f'Processing {type(bundle)}')
-        g = bundle.vendor(self.client)
-
-        # First page
-        [req] = next(g)
-        res = await self._send_request(req)
-        raw_page = bundle.process_response(res)
-        page = bundle.clean_raw_page(raw_page)
-        for item in page:
-            yield item
 
-        # Other pages
-        reqs = g.send([raw_page])
-        async with asyncio.TaskGroup() as tg:
-            tasks = [tg.create_task(self._request_page_and_process(bundle, req)) for req in reqs]
-        for task in tasks:
-            for item in task.result():
-                yield item
+        async def request_page(req: httpx.Request) -> RawPage:
+            return bundle.process_response(await self._send_request(req))
 
-    async def _request_page_and_process[T, R](
-        self,
-        bundle: PageBundle[T, PageMultiVendor],
-        req: httpx.Request,
-    ) -> Iterable[T]:
-        res = await self._send_request(req)
-        raw_page = bundle.process_response(res)
-        return bundle.clean_raw_page(raw_page)
+        executor = self.executor if max_pages is None else AsyncioExecutor(max_pages)
+        steps = aiter_steps(bundle.vendor(self.client, self.json_codec), arequest_step(request_page, executor))
+        async for req, raw_pages in steps:
+            for raw_page in [raw_pages] if isinstance(req, httpx.Request) else raw_pages:
+                for item in bundle.clean_raw_page(raw_page):
+                    yield item
 
     async def iter_tracks(
         self,
@@ -284,6 +313,7 @@ class AsyncDBClient:
         missing_info: bool = False,
         from_active_list: bool | None = None,
         batch_size: int = 50,
+        max_pages: int | None = None,
     ) -> AsyncIterator[CSLTrack]:
         """Gather tracks matching search term, optionally applying a continuation to each track
 
@@ -295,6 +325,7 @@ class AsyncDBClient:
             missing_info: Restrict to songs missing info
             from_active_list: Restrict to songs from active list, defaults to True if active_list is given and False otherwise
             batch_size: How many tracks to query at once (page size)
+            max_pages: Maximum number of pages requested at once, defaults to the limit of the client's executor
 
         Returns:
             Iterable of results from calling func on each track
@@ -309,7 +340,7 @@ class AsyncDBClient:
             from_active_list=from_active_list,
             batch_size=batch_size,
         )
-        async for item in self._process_pages(bundle):
+        async for item in self._process_pages(bundle, max_pages):
             yield item
 
     async def iter_songs(
@@ -396,6 +427,120 @@ class AsyncDBClient:
         bundle = GetMetadataBundle(track)
         return await self.process(bundle)
 
+    async def prefetch_metadata(
+        self,
+        tracks: Iterable[CSLTrack] | AsyncIterable[CSLTrack],
+        *,
+        ordered: bool = True,
+        max_in_flight: int | None = None,
+    ) -> AsyncIterator[tuple[CSLTrack, CSLMetadata | None]]:
+        """Fetch metadata of tracks concurrently, consuming tracks only as fast as metadata is fetched
+        At most max_in_flight tracks are buffered at once, so memory stays bounded
+        however many tracks there are and however slow the consumer is
+
+        Args:
+            tracks: Tracks to get metadata from, e.g. from iter_tracks
+            ordered: Yield pairs in the same order as tracks, otherwise as soon as they're fetched
+            max_in_flight: Maximum number of tracks with pending or unconsumed metadata, defaults to 2 * max_request_count
+
+        Yields:
+            (track, CSLMetadata or None if it doesn't have any metadata)
+        """
+        limit = 2 * self.max_request_count if max_in_flight is None else max_in_flight
+        if limit <= 0:
+            raise ValueError('max_in_flight must be positive')
+
+        async def fetch(track: CSLTrack) -> tuple[CSLTrack, CSLMetadata | None]:
+            return track, await self.get_metadata(track)
+
+        async def iter_source() -> AsyncIterator[CSLTrack]:
+            if isinstance(tracks, AsyncIterable):
+                async for track in tracks:
+                    yield track
+            else:
+                for track in tracks:
+                    yield track
+
+        source = iter_source()
+        pending: deque[asyncio.Task[tuple[CSLTrack, CSLMetadata | None]]] = deque()
+        in_flight: set[asyncio.Task[tuple[CSLTrack, CSLMetadata | None]]] = set()
+        try:
+            async for track in source:
+                task = asyncio.create_task(fetch(track))
+                if ordered:
+                    pending.append(task)
+                    if len(pending) >= limit:
+                        yield await pending.popleft()
+                else:
+                    in_flight.add(task)
+                    if len(in_flight) >= limit:
+                        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            yield task.result()
+            while pending:
+                yield await pending.popleft()
+            while in_flight:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            leftover = (*pending, *in_flight)
+            for task in leftover:
+                task.cancel()
+            await asyncio.gather(*leftover, return_exceptions=True)
+            await source.aclose()
+            if isinstance(tracks, AsyncGenerator):
+                await tracks.aclose()
+
+    async def iter_tracks_with_metadata(
+        self,
+        search_term: str = '',
+        *,
+        groups: Iterable[CSLGroup] = (),
+        active_list: CSLList | None = None,
+        missing_audio: bool = False,
+        missing_info: bool = False,
+        from_active_list: bool | None = None,
+        batch_size: int = 50,
+        ordered: bool = True,
+        max_in_flight: int | None = None,
+        max_pages: int | None = None,
+    ) -> AsyncIterator[tuple[CSLTrack, CSLMetadata | None]]:
+        """Iterate over tracks matching search parameters along with their metadata
+        Metadata is fetched while later pages are still being requested, see prefetch_metadata
+
+        Args:
+            search_term: Search term
+            groups: List of groups to restrict to, leave empty if no restriction
+            active_list: List to restrict search by
+            missing_audio: Restrict to songs without audio
+            missing_info: Restrict to songs missing info
+            from_active_list: Restrict to songs from active list, defaults to True if active_list is given and False otherwise
+            batch_size: How many tracks to query at once (page size)
+            ordered: Yield pairs in the same order as the tracks, otherwise as soon as they're fetched
+            max_in_flight: Maximum number of tracks with pending or unconsumed metadata, defaults to 2 * max_request_count
+            max_pages: Maximum number of pages requested at once, see iter_tracks
+
+        Yields:
+            (track, CSLMetadata or None if it doesn't have any metadata)
+        """
+        tracks = self.iter_tracks(
+            search_term,
+            groups=groups,
+            active_list=active_list,
+            missing_audio=missing_audio,
+            missing_info=missing_info,
+            from_active_list=from_active_list,
+            batch_size=batch_size,
+            max_pages=max_pages,
+        )
+        pairs = self.prefetch_metadata(tracks, ordered=ordered, max_in_flight=max_in_flight)
+        try:
+            async for pair in pairs:
+                yield pair
+        finally:
+            await pairs.aclose()
+
     # --- List operations ---
 
     async def create_list(self, name: str, *csl_lists: CSLList) -> CSLList:
@@ -435,6 +580,44 @@ class AsyncDBClient:
         bundle = ListEditBundle(csl_list, name, add, remove)
         await self.process(bundle)
 
+    async def list_edit_chunked(
+        self,
+        csl_list: CSLList,
+        *,
+        add: Iterable[CSLTrack] = (),
+        remove: Iterable[CSLTrack] = (),
+        diff: bool = True,
+        chunk_size: int = 500,
+        max_parallel: int = 4,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+    ) -> ListEditResult:
+        """Add or remove many tracks from a list, split into chunks
+        Chunks that hit a transport error, a 5xx or a 429 are resent without resending the rest
+
+        Args:
+            csl_list: List to edit
+            add: Tracks to add
+            remove: Tracks to remove
+            diff: Fetch the list's current tracks first, to skip tracks that don't need sending
+            chunk_size: Maximum number of tracks per request
+            max_parallel: Maximum number of chunks sent at once
+            retries: Number of times to resend a failed chunk
+            retry_delay: Seconds to wait before the first resend, doubled for each later one
+
+        Returns:
+            ListEditResult
+        """
+        current_ids = None
+        if diff:
+            current_ids = {
+                track.id async for track in self.iter_tracks(active_list=csl_list, batch_size=self.max_batch_size)
+            }
+        bundle = ChunkedListEditBundle(
+            csl_list, add, remove, current_ids, chunk_size, max_parallel, retries, retry_delay
+        )
+        return await self.process(bundle)
+
     # --- General Editing ---
 
     async def create_group(self, name: str) -> CSLGroup:
@@ -559,6 +742,31 @@ class AsyncDBClient:
         else:
             await self.process(bundle)
 
+    async def track_add_metadata_batch(
+        self,
+        edits: Iterable[tuple[CSLTrack, Iterable[Metadata]]],
+        *,
+        override: bool | None = None,
+        existing_metas: Mapping[str, CSLMetadata | None] | None = None,
+        queue: bool = False,
+    ) -> None:
+        """Add metadata to many tracks in one batch, see track_add_metadata
+
+        Args:
+            edits: Iterable of (track, metadata to add), since CSLTrack isn't hashable
+            override: Change metadata to override or append
+            existing_metas: {track id: existing metadata}, pass in to avoid duplicating metadata
+            queue: Whether to queue the request, defaults to False
+
+        Raises:
+            ValueError: If non-metadata is passed into metas
+        """
+        bundle = TrackBatchAddMetadataBundle.from_edits(edits, override, existing_metas)
+        if queue:
+            self.enqueue(bundle)
+        else:
+            await self.process(bundle)
+
     async def track_remove_metadata(
         self,
         track: CSLTrack,
@@ -613,6 +821,43 @@ class AsyncDBClient:
         else:
             await self.process(bundle)
 
+    async def tracks_edit(
+        self,
+        tracks: Iterable[CSLTrack],
+        *,
+        artist_credits: Sequence[TrackPutArtistCredit] | None = None,
+        groups: Sequence[CSLGroup] | None = None,
+        name: str | None = None,
+        original_artist: str | None = None,
+        original_name: str | None = None,
+        song: NewSong | CSLSongSample | None = None,
+        type: TrackType | None = None,
+        chunk_size: int = 100,
+    ) -> list[ChunkResult[CSLTrack]]:
+        """Apply the same edit to many tracks, batching them through batchSongIds
+
+        Args:
+            tracks: Tracks to edit
+            artist_credits: List of new artist credits
+            groups: List of new groups
+            name: New track name
+            original_artist: New track original artist
+            original_name: New track original name
+            song: New song
+            type: New track type
+            chunk_size: Maximum number of tracks per request
+
+        Raises:
+            ValueError: New track type is not a valid track type
+
+        Returns:
+            Result of each chunk
+        """
+        bundle = TracksEditBundle(
+            tracks, artist_credits, groups, name, original_artist, original_name, song, type, chunk_size
+        )
+        return await self.process(bundle)
+
     # --- Album Creation ---
 
     async def create_album(
@@ -663,3 +908,190 @@ class AsyncDBClient:
             self.enqueue(bundle)
         else:
             await self.process(bundle)
+
+    async def add_audio_many(
+        self,
+        audio: Iterable[tuple[CSLTrack, str | PathLike[str]]],
+        *,
+        max_uploads: int = 4,
+        max_bytes_in_flight: int = 256 * 1024 * 1024,
+        presign_ahead: int | None = None,
+        manifest: AudioManifest | None = None,
+        journal: UploadJournal | None = None,
+        upload_retries: int = 2,
+        retry_delay: float = 1.0,
+    ) -> AudioUploadReport:
+        """Add audio to many tracks, presigning uploads ahead of the uploads themselves
+        Uploads are limited separately from max_request_count, both in number and in total size,
+        and a failed track is reported without stopping the others
+
+        Uploads that fail from network or server errors are retried with the same presign session.
+        With a journal, sessions are also kept across runs, so rerunning after a failure
+        skips presigning for tracks whose sessions are still valid
+
+        Args:
+            audio: Iterable of (track, path to the audio file)
+            max_uploads: Maximum number of concurrent uploads
+            max_bytes_in_flight: Maximum total size of the files being uploaded at once
+            presign_ahead: Maximum number of presigned uploads waiting for an upload slot, defaults to 2 * max_uploads
+            manifest: Skip tracks that already have the file according to the manifest, and record new uploads in it
+            journal: Journal to keep presign sessions in until their upload succeeds
+            upload_retries: Number of times to retry a failed upload
+            retry_delay: Seconds to wait before the first retry, doubling every retry
+
+        Returns:
+            AudioUploadReport
+
+        Raises:
+            QueryError: An audio path is invalid
+            ValueError: A limit isn't positive, or upload_retries is negative
+        """
+        if max_uploads <= 0:
+            raise ValueError('max_uploads must be positive')
+        if max_bytes_in_flight <= 0:
+            raise ValueError('max_bytes_in_flight must be positive')
+        if presign_ahead is not None and presign_ahead <= 0:
+            raise ValueError('presign_ahead must be positive')
+        if upload_retries < 0:
+            raise ValueError('upload_retries must not be negative')
+        bundles = [AddAudioBundle(track, path) for track, path in audio]
+        for bundle in bundles:
+            _ = bundle.mime_type
+        report = AudioUploadReport()
+        if manifest is not None:
+            to_upload: list[AddAudioBundle] = []
+            for bundle in bundles:
+                # Hashing reads the whole file, so keep it off the event loop
+                if await asyncio.to_thread(manifest.is_present, bundle.track, bundle.audio_path):
+                    report.skipped.append(bundle.track)
+                else:
+                    to_upload.append(bundle)
+            logger.info(f'Skipping {len(report.skipped)} tracks that already have their audio')
+            bundles = to_upload
+        if not bundles:
+            return report
+        client = self.client
+        budget = _ByteBudget(max_bytes_in_flight)
+        upload_semaphore = asyncio.Semaphore(max_uploads)
+        # Bounds how far presigns run ahead of uploads, the queue itself never holds more than this
+        ahead = asyncio.Semaphore(2 * max_uploads if presign_ahead is None else presign_ahead)
+        presigned: asyncio.Queue[tuple[AddAudioBundle, UploadSession] | None] = asyncio.Queue()
+        pending = iter(bundles)
+        logger.info(f'Uploading audio to {len(bundles)} tracks')
+        start = time.perf_counter()
+
+        async def presign(bundle: AddAudioBundle) -> UploadSession:
+            session = None if journal is None else journal.get(bundle.track, bundle.audio_path)
+            if session is None:
+                res = await self._send_request(presign_request(client, self.json_codec, bundle.track))
+                session = read_upload_session(self.json_codec, bundle.track, res)
+                if journal is not None:
+                    journal.add(bundle.track, bundle.audio_path, session, save=False)
+            else:
+                logger.info(f'Resuming upload of {bundle.track.name} with its journaled session')
+            return session
+
+        async def presign_worker() -> None:
+            for bundle in pending:
+                await ahead.acquire()
+                try:
+                    session = await presign(bundle)
+                except UPLOAD_ERRORS as e:
+                    ahead.release()
+                    logger.error(f'Presigning upload of {bundle.track.name} failed: {e!r}')
+                    report.failed.append((bundle.track, e))
+                else:
+                    presigned.put_nowait((bundle, session))
+
+        async def presign_all() -> None:
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    for _ in range(min(self.max_request_count, len(bundles))):
+                        tg.create_task(presign_worker())
+            finally:
+                for _ in range(max_uploads):
+                    presigned.put_nowait(None)
+
+        async def send_upload(bundle: AddAudioBundle, session: UploadSession) -> None:
+            for attempt in range(upload_retries + 1):
+                try:
+                    async with upload_semaphore:
+                        file = aiter_file(bundle.audio_path)
+                        req = upload_request(client, session, bundle.audio_path, bundle.mime_type, file)
+                        res = await client.send(req)
+                        res.raise_for_status()
+                    return
+                except httpx.HTTPError as e:
+                    if attempt == upload_retries or not is_retryable(e):
+                        raise
+                    logger.warning(f'Uploading audio to {bundle.track.name} failed: {e!r}, retrying')
+                await asyncio.sleep(retry_delay * 2**attempt)
+                if journal is not None:
+                    # Only presign again if the session expired while retrying
+                    session = await presign(bundle)
+
+        def fail(bundle: AddAudioBundle, e: Exception) -> None:
+            logger.error(f'Uploading audio to {bundle.track.name} failed: {e!r}')
+            report.failed.append((bundle.track, e))
+
+        async def upload(bundle: AddAudioBundle, session: UploadSession) -> None:
+            try:
+                size = bundle.audio_path.stat().st_size
+            except OSError as e:
+                fail(bundle, e)
+                return
+            await budget.acquire(size)
+            try:
+                await send_upload(bundle, session)
+            except UPLOAD_ERRORS as e:
+                fail(bundle, e)
+            else:
+                if journal is not None:
+                    journal.complete(bundle.track, save=False)
+                if manifest is not None:
+                    await asyncio.to_thread(manifest.record, bundle.track, bundle.audio_path)
+                report.uploaded.append(bundle.track)
+                report.bytes_uploaded += size
+                report.seconds = time.perf_counter() - start
+                logger.info(
+                    f'Uploaded audio to {bundle.track.name} ({size / 1e6:.1f} MB), '
+                    f'{len(report.uploaded)}/{len(bundles)} at {report.mb_per_s:.2f} MB/s'
+                )
+            finally:
+                await budget.release(size)
+
+        async def upload_worker() -> None:
+            while (item := await presigned.get()) is not None:
+                ahead.release()
+                await upload(*item)
+
+        async def journal_writer(journal: UploadJournal) -> None:
+            # Batches journal writes instead of rewriting the file on every presign and upload
+            while not finished.is_set():
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(finished.wait(), _JOURNAL_SAVE_INTERVAL)
+                if journal.changed:
+                    await asyncio.to_thread(journal.save)
+
+        finished = asyncio.Event()
+        writer = None if journal is None else asyncio.create_task(journal_writer(journal))
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(presign_all())
+                for _ in range(max_uploads):
+                    tg.create_task(upload_worker())
+        finally:
+            finished.set()
+            if writer is not None:
+                await writer
+            if manifest is not None:
+                await asyncio.to_thread(manifest.save)
+        report.seconds = time.perf_counter() - start
+        if journal is not None:
+            journaled = set(journal.pending())
+            report.pending = [track for track, _ in report.failed if track.id in journaled]
+        logger.info(
+            f'Uploaded {report.bytes_uploaded / 1e6:.1f} MB to {len(report.uploaded)} tracks '
+            f'at {report.mb_per_s:.2f} MB/s, {len(report.failed)} failed, {len(report.pending)} resumable'
+        )
+        return report
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections.abc import AsyncIterator
+from os import PathLike
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+
+from amqcsl._json_files import read_json_file, write_json_file
+from amqcsl.clients.bundles._misc import UploadSession
+from amqcsl.objects._db_types import CSLTrack
+
+logger = logging.getLogger('amqcsl.client')
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+async def aiter_file(path: Path, chunk_size: int = _CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a file in chunks off the event loop, so uploads stream it instead of holding it whole
+
+    Args:
+        path: Path to the file
+        chunk_size: Maximum size of each chunk
+
+    Yields:
+        Chunks of the file
+    """
+    file = await asyncio.to_thread(path.open, 'rb')
+    try:
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+class AudioManifest:
+    """Local record of the audio uploaded to each track, for skipping uploads that already happened
+    Files are identified by their sha256, which is cached by path, size and mtime
+    so unchanged files aren't rehashed on every run
+
+    A track counts as present if it has audio, the file's hash matches the last upload to the track,
+    and the track's audio_name is the one seen after that upload,
+    so audio replaced on the db by someone else is uploaded again
+    """
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        self.path = Path(path)
+        data = read_json_file(self.path) or {}
+        #: {track id: {'sha256': hash, 'audio_name': audio name seen after the upload}}
+        self.tracks: dict[str, dict[str, Any]] = data.get('tracks', {})
+        self._files: dict[str, dict[str, Any]] = data.get('files', {})
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.save()
+
+    def save(self) -> None:
+        """Write the manifest to disk"""
+        write_json_file(self.path, {'tracks': self.tracks, 'files': self._files})
+
+    def file_hash(self, audio_path: str | PathLike[str]) -> str:
+        """Get the sha256 of a file, reusing the cached hash if the file is unchanged
+
+        Args:
+            audio_path: Path to the file
+
+        Returns:
+            Hex digest
+        """
+        audio_path = Path(audio_path).resolve()
+        stat = audio_path.stat()
+        cached = self._files.get(str(audio_path))
+        if cached is not None and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+        digest = hashlib.sha256()
+        with open(audio_path, 'rb') as file:
+            while chunk := file.read(_CHUNK_SIZE):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        self._files[str(audio_path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+        return sha256
+
+    def is_present(self, track: CSLTrack, audio_path: str | PathLike[str]) -> bool:
+        """Check if a file was already uploaded to a track
+
+        Args:
+            track: CSLTrack, fetched after any previous upload
+            audio_path: Path to the audio file
+
+        Returns:
+            Whether uploading the file can be skipped
+        """
+        entry = self.tracks.get(track.id)
+        if track.audio_id is None or entry is None or entry['sha256'] != self.file_hash(audio_path):
+            return False
+        if entry['audio_name'] is None:
+            # First time seeing the track since the upload, so this is the audio that was uploaded
+            entry['audio_name'] = track.audio_name
+            return True
+        return entry['audio_name'] == track.audio_name
+
+    def record(self, track: CSLTrack, audio_path: str | PathLike[str]) -> None:
+        """Record a successful upload
+
+        Args:
+            track: CSLTrack the file was uploaded to
+            audio_path: Path to the audio file
+        """
+        self.tracks[track.id] = {'sha256': self.file_hash(audio_path), 'audio_name': None}
+
+
+class UploadJournal:
+    """Local journal of presigned audio uploads that haven't finished yet
+    Keeps each track's presign session so a failed upload can be retried, in this run or a later one,
+    without presigning again while the session is still valid
+
+    Args:
+        path: Path to the journal file
+        session_ttl: Seconds a presign session is assumed to stay valid
+    """
+
+    def __init__(self, path: str | PathLike[str], *, session_ttl: float = 15 * 60) -> None:
+        self.path = Path(path)
+        self.session_ttl = session_ttl
+        #: {track id: {'session_id', 'key', 'url', 'audio_path', 'presigned_at'}}
+        self.sessions: dict[str, dict[str, Any]] = read_json_file(self.path) or {}
+        #: Whether sessions changed since the last save
+        self.changed = False
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.save()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def save(self) -> None:
+        """Write the journal to disk
+        Sessions are copied before writing, so the async client can save from a thread while uploads continue
+        """
+        self.changed = False
+        write_json_file(self.path, dict(self.sessions))
+
+    def add(
+        self,
+        track: CSLTrack,
+        audio_path: str | PathLike[str],
+        session: UploadSession,
+        *,
+        save: bool = True,
+    ) -> None:
+        """Record a presigned upload
+
+        Args:
+            track: CSLTrack the upload is for
+            audio_path: Path to the audio file
+            session: UploadSession from presigning
+            save: Save the journal right away, otherwise it's left to the caller
+        """
+        self.sessions[track.id] = {
+            'session_id': session.session_id,
+            'key': session.key,
+            'url': session.url,
+            'audio_path': str(Path(audio_path).resolve()),
+            'presigned_at': time.time(),
+        }
+        self.changed = True
+        if save:
+            self.save()
+
+    def get(self, track: CSLTrack, audio_path: str | PathLike[str]) -> UploadSession | None:
+        """Get the presign session of a track, if it's for the same file and still valid
+
+        Args:
+            track: CSLTrack
+            audio_path: Path to the audio file
+
+        Returns:
+            UploadSession, or None if the upload needs presigning again
+        """
+        entry = self.sessions.get(track.id)
+        if entry is None or entry['audio_path'] != str(Path(audio_path).resolve()):
+            return None
+        if time.time() - entry['presigned_at'] > self.session_ttl:
+            logger.debug(f'Presign session of {track.name} expired')
+            return None
+        return UploadSession(entry['session_id'], entry['key'], entry['url'])
+
+    def complete(self, track: CSLTrack, *, save: bool = True) -> None:
+        """Remove a finished upload
+
+        Args:
+            track: CSLTrack whose upload finished
+            save: Save the journal right away, otherwise it's left to the caller
+        """
+        if self.sessions.pop(track.id, None) is not None:
+            self.changed = True
+            if save:
+                self.save()
+
+    def pending(self) -> list[str]:
+        """Ids of the tracks with unfinished uploads
+
+        Returns:
+            List of track ids
+        """
+        return list(self.sessions)
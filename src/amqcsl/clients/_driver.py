@@ -0,0 +1,292 @@
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, ClassVar, Protocol, runtime_checkable
+
+import httpx
+from attrs import define, field, frozen
+from attrs.validators import gt, instance_of, optional
+
+from amqcsl.clients.bundles._core import RequestBatch
+
+# --- Executors ---
+
+
+@runtime_checkable
+class Executor(Protocol):
+    """Runs a function over several items for a driver, see SerialExecutor and ThreadExecutor"""
+
+    #: Whether items may run at the same time
+    concurrent: ClassVar[bool]
+
+    def map[T, R](self, func: Callable[[T], R], items: Iterable[T]) -> list[R]: ...
+    def close(self) -> None: ...
+
+
+@frozen
+class SerialExecutor:
+    """Runs items one after another"""
+
+    concurrent: ClassVar[bool] = False
+
+    def map[T, R](self, func: Callable[[T], R], items: Iterable[T]) -> list[R]:
+        """Run func over items in order
+
+        Args:
+            func: Function to run
+            items: Items to run func on
+
+        Returns:
+            Results, in the order of items
+        """
+        return [func(item) for item in items]
+
+    def close(self) -> None:
+        """Nothing to close"""
+
+
+@define
+class ThreadExecutor:
+    """Runs items on a thread pool, created on first use
+    Maps started from inside the pool run serially, so nested drivers can't deadlock waiting on the pool
+    """
+
+    concurrent: ClassVar[bool] = True
+
+    #: Maximum number of items running at once
+    max_workers: int = field(default=15, validator=[instance_of(int), gt(0)])
+    _pool: ThreadPoolExecutor | None = field(default=None, init=False, repr=False)
+    _local: threading.local = field(factory=threading.local, init=False, repr=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False, repr=False)
+
+    def _run[T, R](self, func: Callable[[T], R], item: T) -> R:
+        self._local.in_pool = True
+        return func(item)
+
+    def map[T, R](self, func: Callable[[T], R], items: Iterable[T]) -> list[R]:
+        """Run func over items on the pool
+
+        Args:
+            func: Function to run
+            items: Items to run func on
+
+        Returns:
+            Results, in the order of items
+
+        Raises:
+            Exception: The first exception raised by func, after every item finishes
+        """
+        items = list(items)
+        if len(items) <= 1 or getattr(self._local, 'in_pool', False):
+            return [func(item) for item in items]
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix='amqcsl')
+            pool = self._pool
+        futures = [pool.submit(self._run, func, item) for item in items]
+        wait(futures)
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Shut down the pool, a later map creates a new one"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+@define
+class AsyncioExecutor:
+    """Runs coroutines concurrently on the running event loop"""
+
+    concurrent: ClassVar[bool] = True
+
+    #: Maximum number of coroutines running at once, None for no limit besides the client's max_request_count
+    limit: int | None = field(default=None, validator=optional([instance_of(int), gt(0)]))
+
+    async def map[T, R](self, func: Callable[[T], Awaitable[R]], items: Iterable[T]) -> list[R]:
+        """Run func over items concurrently
+
+        Args:
+            func: Coroutine function to run
+            items: Items to run func on
+
+        Returns:
+            Results, in the order of items
+
+        Raises:
+            Exception: The first exception raised by func
+        """
+        if self.limit is None:
+            return list(await asyncio.gather(*map(func, items)))
+        semaphore = asyncio.Semaphore(self.limit)
+
+        async def run(item: T) -> R:
+            async with semaphore:
+                return await func(item)
+
+        return list(await asyncio.gather(*map(run, items)))
+
+    def close(self) -> None:
+        """Nothing to close"""
+
+
+# --- Drivers ---
+
+
+def iter_steps[Y, S, R](g: Generator[Y, S, R], step: Callable[[Y], S]) -> Generator[tuple[Y, S], None, R]:
+    """Run a generator, answering each value it yields with step
+    Each (yielded, answer) pair is yielded before the answer is sent back,
+    so callers can stream results, e.g. the items of each page
+
+    Args:
+        g: Generator, e.g. a bundle vendor or a workflow generator
+        step: Function answering a yielded value
+
+    Yields:
+        (yielded, answer)
+
+    Returns:
+        Return value of g
+    """
+    try:
+        sent: Any = None
+        while True:
+            try:
+                yielded = g.send(sent)
+            except StopIteration as e:
+                return e.value
+            sent = step(yielded)
+            yield yielded, sent
+    finally:
+        g.close()
+
+
+def drive[Y, S, R](g: Generator[Y, S, R], step: Callable[[Y], S]) -> R:
+    """Run a generator to completion, see iter_steps
+
+    Args:
+        g: Generator
+        step: Function answering a yielded value
+
+    Returns:
+        Return value of g
+    """
+    steps = iter_steps(g, step)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as e:
+            return e.value
+
+
+async def aiter_steps[Y, S](g: Generator[Y, S, Any], step: Callable[[Y], Awaitable[S]]) -> AsyncIterator[tuple[Y, S]]:
+    """Async version of iter_steps, the return value of g is dropped, see adrive
+
+    Args:
+        g: Generator
+        step: Coroutine function answering a yielded value
+
+    Yields:
+        (yielded, answer)
+    """
+    try:
+        sent: Any = None
+        while True:
+            try:
+                yielded = g.send(sent)
+            except StopIteration:
+                return
+            sent = await step(yielded)
+            yield yielded, sent
+    finally:
+        g.close()
+
+
+async def adrive[Y, S, R](g: Generator[Y, S, R], step: Callable[[Y], Awaitable[S]]) -> R:
+    """Async version of drive
+
+    Args:
+        g: Generator
+        step: Coroutine function answering a yielded value
+
+    Returns:
+        Return value of g
+    """
+    try:
+        sent: Any = None
+        while True:
+            try:
+                yielded = g.send(sent)
+            except StopIteration as e:
+                return e.value
+            sent = await step(yielded)
+    finally:
+        g.close()
+
+
+def request_step[T](
+    func: Callable[[httpx.Request], T],
+    executor: Executor,
+) -> Callable[[httpx.Request | Iterable[httpx.Request]], T | list[T]]:
+    """Make a step answering a vendor, a single request with func and several requests with executor.map
+    A RequestBatch is answered with the httpx.TransportError of each failed request instead of raising
+
+    Args:
+        func: Function sending a request, e.g. client.send
+        executor: Executor for several requests
+
+    Returns:
+        Step function
+    """
+
+    def send_catching(req: httpx.Request) -> T | httpx.TransportError:
+        try:
+            return func(req)
+        except httpx.TransportError as e:
+            return e
+
+    def step(req: httpx.Request | Iterable[httpx.Request]) -> T | list[T]:
+        if isinstance(req, httpx.Request):
+            return func(req)
+        if isinstance(req, RequestBatch):
+            if req.delay:
+                time.sleep(req.delay)
+            return executor.map(send_catching, req)  # type: ignore[reportReturnType]
+        return executor.map(func, req)
+
+    return step
+
+
+def arequest_step[T](
+    func: Callable[[httpx.Request], Awaitable[T]],
+    executor: AsyncioExecutor,
+) -> Callable[[httpx.Request | Iterable[httpx.Request]], Awaitable[T | list[T]]]:
+    """Async version of request_step
+
+    Args:
+        func: Coroutine function sending a request
+        executor: AsyncioExecutor for several requests
+
+    Returns:
+        Step coroutine function
+    """
+
+    async def send_catching(req: httpx.Request) -> T | httpx.TransportError:
+        try:
+            return await func(req)
+        except httpx.TransportError as e:
+            return e
+
+    async def step(req: httpx.Request | Iterable[httpx.Request]) -> T | list[T]:
+        if isinstance(req, httpx.Request):
+            return await func(req)
+        if isinstance(req, RequestBatch):
+            if req.delay:
+                await asyncio.sleep(req.delay)
+            return await executor.map(send_catching, req)  # type: ignore[reportReturnType]
+        return await executor.map(func, req)
+
+    return step
@@ -1,5 +1,6 @@
 import logging
-from collections.abc import Iterable, Iterator, Sequence
+import time
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 from os import PathLike
 from pathlib import Path
 from types import TracebackType
@@ -9,10 +10,17 @@ import httpx
 from attrs import define, field
 from attrs.validators import gt, instance_of, optional
 
+from amqcsl.clients._audio import AudioManifest, UploadJournal
+from amqcsl.clients._driver import Executor, ThreadExecutor, drive, iter_steps, request_step
+from amqcsl.clients.bundles._core import JSONCodec, default_json_codec
 from amqcsl.clients.bundles._misc import (
+    UPLOAD_ERRORS,
     AddAudioBundle,
+    AudioUploadReport,
     AuthBundle,
     Bundle,
+    ChunkedListEditBundle,
+    ChunkResult,
     CreateAlbumBundle,
     CreateGroupBundle,
     CreateListBundle,
@@ -26,21 +34,29 @@ from amqcsl.clients.bundles._misc import (
     GroupEditBundle,
     ListBundle,
     ListEditBundle,
+    ListEditResult,
     LogoutBundle,
     SongAddMetadataBundle,
     SongDeleteBundle,
     SongDeleteMetadataBundle,
     SongEditBundle,
     TrackAddMetadataBundle,
+    TrackBatchAddMetadataBundle,
     TrackDeleteMetadataBundle,
     TrackEditBundle,
+    TracksEditBundle,
+    UploadSession,
+    is_retryable,
+    presign_request,
+    read_upload_session,
+    upload_request,
 )
 from amqcsl.clients.bundles._pages import (
     IterArtistsBundle,
     IterSongsBundle,
     IterTracksBundle,
     PageBundle,
-    PageSingleVendor,
+    PageVendor,
     RawPage,
 )
 from amqcsl.exceptions import ClientDoesNotExistError
@@ -88,11 +104,22 @@ class DBClient:
     max_batch_size: int = field(default=100, validator=[instance_of(int), gt(0)])
     #: Maximum number of queries when iterating
     max_query_size: int = field(default=1500, validator=[instance_of(int), gt(0)])
+    #: JSON backend for decoding responses and encoding request bodies, defaults to orjson/msgspec if installed
+    json_codec: JSONCodec = field(factory=default_json_codec, validator=instance_of(JSONCodec))
+    #: Executor for requests sent together, e.g. pages after the first one, use SerialExecutor to send them in turn.
+    #: Defaults to a ThreadExecutor that's closed with the client, executors passed in are left open
+    executor: Executor = field(default=None, validator=optional(instance_of(Executor)))  # type: ignore[reportAssignmentType]
+    _owns_executor: bool = field(default=False, init=False, repr=False)
 
     _lists: CSLLists | None = None
     _groups: CSLGroups | None = None
     _queue: list[Bundle[Any]] = field(factory=list)
 
+    def __attrs_post_init__(self) -> None:
+        if self.executor is None:  # type: ignore[reportUnnecessaryComparison]
+            self.executor = ThreadExecutor()
+            self._owns_executor = True
+
     def is_sync(self) -> bool:
         """Check for if client is synchronous
 
@@ -123,18 +150,7 @@ class DBClient:
         """
         logger.debug(f'Processing {type(bundle)}')
         client = self.client
-        g = bundle.vendor(client)
-        res: httpx.Response | Sequence[httpx.Response] | None = None
-        while True:
-            try:
-                req = g.send(res)  # type: ignore[reportArgumentType]
-            except StopIteration as e:
-                return e.value
-            match req:
-                case httpx.Request():
-                    res = client.send(req)
-                case reqs:
-                    res = [client.send(req) for req in reqs]
+        return drive(bundle.vendor(client, self.json_codec), request_step(client.send, self.executor))  # type: ignore[reportArgumentType]
 
     def enqueue(self, bundle: Bundle[None]):
         """Add an object to the queue
@@ -185,12 +201,14 @@ class DBClient:
         else:
             if isinstance(exc_val, httpx.HTTPStatusError):
                 try:
-                    error_data = exc_val.response.json()
+                    error_data = self.json_codec.loads(exc_val.response.content)
                     logger.error('JSON given with error, check logs', extra={'data': error_data})
                 except Exception:
                     logger.error('No JSON given with error')
             logger.error('Exception encountered, closing client')
 
+        if self._owns_executor:
+            self.executor.close()
         if self._client:
             self._client.close()
 
@@ -221,7 +239,7 @@ class DBClient:
             self._groups = self.process(bundle)
         return self._groups
 
-    def _process_pages[R](self, bundle: PageBundle[R, PageSingleVendor]) -> Iterator[R]:
+    def _process_pages[R](self, bundle: PageBundle[R, PageVendor]) -> Iterator[R]:
         """Processes a page bundle by lazily yielding results
 
         Args:
@@ -232,20 +250,13 @@ class DBClient:
         """
         logger.debug(f'Processing {type(bundle)}')
         client = self.client
-        g = bundle.vendor(client)
-        raw_page: RawPage | None = None
-        while True:
-            try:
-                req = g.send(raw_page)  # type: ignore[reportArgumentType]
-            except StopIteration:
-                break
-            match req:
-                case httpx.Request():
-                    resps = [client.send(req)]
-                case reqs:
-                    resps = [client.send(req) for req in reqs]
-            for res in resps:
-                raw_page = bundle.process_response(res)
+
+        def request_page(req: httpx.Request) -> RawPage:
+            return bundle.process_response(client.send(req))
+
+        steps = iter_steps(bundle.vendor(client, self.json_codec), request_step(request_page, self.executor))  # type: ignore[reportArgumentType]
+        for req, raw_pages in steps:
+            for raw_page in [raw_pages] if isinstance(req, httpx.Request) else raw_pages:
                 yield from bundle.clean_raw_page(raw_page)
 
     def iter_tracks(
@@ -302,12 +313,13 @@ class DBClient:
         )
         yield from self._process_pages(bundle)
 
-    def iter_artists(self, search_term: str, *, batch_size: int = 50) -> Iterator[CSLArtistSample]:
+    def iter_artists(self, search_term: str, *, batch_size: int = 50, lazy: bool = False) -> Iterator[CSLArtistSample]:
         """Iterator over artists matching search_term
 
         Args:
             search_term: Term to search for
             batch_size: Number of artists per page
+            lazy: Request pages one at a time even with a concurrent executor, so stopping early skips the rest
 
         Yields:
             CSLArtistSample
@@ -316,6 +328,7 @@ class DBClient:
             self,
             search_term=search_term,
             batch_size=batch_size,
+            lazy=lazy,
         )
         yield from self._process_pages(bundle)
 
@@ -357,6 +370,56 @@ class DBClient:
         bundle = GetMetadataBundle(track)
         return self.process(bundle)
 
+    def prefetch_metadata(self, tracks: Iterable[CSLTrack]) -> Iterator[tuple[CSLTrack, CSLMetadata | None]]:
+        """Fetch metadata of tracks lazily, same interface as AsyncDBClient.prefetch_metadata
+        Each track's metadata is fetched when its pair is consumed, since a generator can't fetch ahead
+        without threads of its own, the executor only parallelizes requests sent together such as pages
+
+        Args:
+            tracks: Tracks to get metadata from, e.g. from iter_tracks
+
+        Yields:
+            (track, CSLMetadata or None if it doesn't have any metadata)
+        """
+        for track in tracks:
+            yield track, self.get_metadata(track)
+
+    def iter_tracks_with_metadata(
+        self,
+        search_term: str = '',
+        *,
+        groups: Iterable[CSLGroup] = (),
+        active_list: CSLList | None = None,
+        missing_audio: bool = False,
+        missing_info: bool = False,
+        from_active_list: bool | None = None,
+        batch_size: int = 50,
+    ) -> Iterator[tuple[CSLTrack, CSLMetadata | None]]:
+        """Iterate over tracks matching search parameters along with their metadata
+
+        Args:
+            search_term: Search term
+            groups: List of groups to restrict to, leave empty if no restriction
+            active_list: List to restrict search by
+            missing_audio: Restrict to songs without audio
+            missing_info: Restrict to songs missing info
+            from_active_list: Restrict to songs from active list, defaults to True if active_list is given and False otherwise
+            batch_size: How many tracks to query at once (page size)
+
+        Yields:
+            (track, CSLMetadata or None if it doesn't have any metadata)
+        """
+        tracks = self.iter_tracks(
+            search_term,
+            groups=groups,
+            active_list=active_list,
+            missing_audio=missing_audio,
+            missing_info=missing_info,
+            from_active_list=from_active_list,
+            batch_size=batch_size,
+        )
+        yield from self.prefetch_metadata(tracks)
+
     # --- List operations ---
 
     def create_list(self, name: str, *csl_lists: CSLList) -> CSLList:
@@ -396,6 +459,42 @@ class DBClient:
         bundle = ListEditBundle(csl_list, name, add, remove)
         self.process(bundle)
 
+    def list_edit_chunked(
+        self,
+        csl_list: CSLList,
+        *,
+        add: Iterable[CSLTrack] = (),
+        remove: Iterable[CSLTrack] = (),
+        diff: bool = True,
+        chunk_size: int = 500,
+        max_parallel: int = 4,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+    ) -> ListEditResult:
+        """Add or remove many tracks from a list, split into chunks
+        Chunks that hit a transport error, a 5xx or a 429 are resent without resending the rest
+
+        Args:
+            csl_list: List to edit
+            add: Tracks to add
+            remove: Tracks to remove
+            diff: Fetch the list's current tracks first, to skip tracks that don't need sending
+            chunk_size: Maximum number of tracks per request
+            max_parallel: Maximum number of chunks sent at once
+            retries: Number of times to resend a failed chunk
+            retry_delay: Seconds to wait before the first resend, doubled for each later one
+
+        Returns:
+            ListEditResult
+        """
+        current_ids = None
+        if diff:
+            current_ids = {track.id for track in self.iter_tracks(active_list=csl_list, batch_size=self.max_batch_size)}
+        bundle = ChunkedListEditBundle(
+            csl_list, add, remove, current_ids, chunk_size, max_parallel, retries, retry_delay
+        )
+        return self.process(bundle)
+
     # --- General Editing ---
 
     def create_group(self, name: str) -> CSLGroup:
@@ -532,6 +631,31 @@ class DBClient:
         else:
             self.process(bundle)
 
+    def track_add_metadata_batch(
+        self,
+        edits: Iterable[tuple[CSLTrack, Iterable[Metadata]]],
+        *,
+        override: bool | None = None,
+        existing_metas: Mapping[str, CSLMetadata | None] | None = None,
+        queue: bool = False,
+    ) -> None:
+        """Add metadata to many tracks in one batch, see track_add_metadata
+
+        Args:
+            edits: Iterable of (track, metadata to add), since CSLTrack isn't hashable
+            override: Change metadata to override or append
+            existing_metas: {track id: existing metadata}, pass in to avoid duplicating metadata
+            queue: Whether to queue the request, defaults to False
+
+        Raises:
+            ValueError: If non-metadata is passed into metas
+        """
+        bundle = TrackBatchAddMetadataBundle.from_edits(edits, override, existing_metas)
+        if queue:
+            self.enqueue(bundle)
+        else:
+            self.process(bundle)
+
     def track_remove_metadata(
         self,
         track: CSLTrack,
@@ -590,6 +714,43 @@ class DBClient:
         else:
             self.process(bundle)
 
+    def tracks_edit(
+        self,
+        tracks: Iterable[CSLTrack],
+        *,
+        artist_credits: Sequence[TrackPutArtistCredit] | None = None,
+        groups: Sequence[CSLGroup] | None = None,
+        name: str | None = None,
+        original_artist: str | None = None,
+        original_name: str | None = None,
+        song: NewSong | CSLSongSample | None = None,
+        type: TrackType | None = None,
+        chunk_size: int = 100,
+    ) -> list[ChunkResult[CSLTrack]]:
+        """Apply the same edit to many tracks, batching them through batchSongIds
+
+        Args:
+            tracks: Tracks to edit
+            artist_credits: List of new artist credits
+            groups: List of new groups
+            name: New track name
+            original_artist: New track original artist
+            original_name: New track original name
+            song: New song
+            type: New track type
+            chunk_size: Maximum number of tracks per request
+
+        Raises:
+            ValueError: New track type is not a valid track type
+
+        Returns:
+            Result of each chunk
+        """
+        bundle = TracksEditBundle(
+            tracks, artist_credits, groups, name, original_artist, original_name, song, type, chunk_size
+        )
+        return self.process(bundle)
+
     # --- Album Creation ---
 
     def create_album(
@@ -640,3 +801,101 @@ class DBClient:
             self.enqueue(bundle)
         else:
             self.process(bundle)
+
+    def _presign_audio(self, bundle: AddAudioBundle, journal: UploadJournal | None) -> UploadSession:
+        session = None if journal is None else journal.get(bundle.track, bundle.audio_path)
+        if session is None:
+            res = self.client.send(presign_request(self.client, self.json_codec, bundle.track))
+            session = read_upload_session(self.json_codec, bundle.track, res)
+            if journal is not None:
+                journal.add(bundle.track, bundle.audio_path, session)
+        else:
+            logger.info(f'Resuming upload of {bundle.track.name} with its journaled session')
+        return session
+
+    def _upload_audio(
+        self,
+        bundle: AddAudioBundle,
+        journal: UploadJournal | None,
+        upload_retries: int,
+        retry_delay: float,
+    ) -> None:
+        session = self._presign_audio(bundle, journal)
+        for attempt in range(upload_retries + 1):
+            try:
+                with open(bundle.audio_path, 'rb') as file:
+                    res = self.client.send(
+                        upload_request(self.client, session, bundle.audio_path, bundle.mime_type, file)
+                    )
+                res.raise_for_status()
+                return
+            except httpx.HTTPError as e:
+                if attempt == upload_retries or not is_retryable(e):
+                    raise
+                logger.warning(f'Uploading audio to {bundle.track.name} failed: {e!r}, retrying')
+            time.sleep(retry_delay * 2**attempt)
+            if journal is not None:
+                # Only presign again if the session expired while retrying
+                session = self._presign_audio(bundle, journal)
+
+    def add_audio_many(
+        self,
+        audio: Iterable[tuple[CSLTrack, str | PathLike[str]]],
+        *,
+        manifest: AudioManifest | None = None,
+        journal: UploadJournal | None = None,
+        upload_retries: int = 2,
+        retry_delay: float = 1.0,
+    ) -> AudioUploadReport:
+        """Add audio to many tracks one at a time, reporting failures instead of stopping
+        See AsyncDBClient.add_audio_many for concurrent uploads
+
+        Args:
+            audio: Iterable of (track, path to the audio file)
+            manifest: Skip tracks that already have the file according to the manifest, and record new uploads in it
+            journal: Journal to keep presign sessions in until their upload succeeds
+            upload_retries: Number of times to retry a failed upload
+            retry_delay: Seconds to wait before the first retry, doubling every retry
+
+        Returns:
+            AudioUploadReport
+
+        Raises:
+            QueryError: An audio path is invalid
+            ValueError: upload_retries is negative
+        """
+        if upload_retries < 0:
+            raise ValueError('upload_retries must not be negative')
+        bundles = [AddAudioBundle(track, path) for track, path in audio]
+        for bundle in bundles:
+            _ = bundle.mime_type
+        report = AudioUploadReport()
+        start = time.perf_counter()
+        for bundle in bundles:
+            if manifest is not None and manifest.is_present(bundle.track, bundle.audio_path):
+                logger.info(f'Skipping {bundle.track.name}, it already has its audio')
+                report.skipped.append(bundle.track)
+                continue
+            try:
+                size = bundle.audio_path.stat().st_size
+                self._upload_audio(bundle, journal, upload_retries, retry_delay)
+            except UPLOAD_ERRORS as e:
+                logger.error(f'Uploading audio to {bundle.track.name} failed: {e!r}')
+                report.failed.append((bundle.track, e))
+                if journal is not None and bundle.track.id in journal.sessions:
+                    report.pending.append(bundle.track)
+            else:
+                if journal is not None:
+                    journal.complete(bundle.track)
+                if manifest is not None:
+                    manifest.record(bundle.track, bundle.audio_path)
+                    manifest.save()
+                report.uploaded.append(bundle.track)
+                report.bytes_uploaded += size
+                report.seconds = time.perf_counter() - start
+                logger.info(
+                    f'Uploaded audio to {bundle.track.name} ({size / 1e6:.1f} MB), '
+                    f'{len(report.uploaded)}/{len(bundles)} at {report.mb_per_s:.2f} MB/s'
+                )
+        report.seconds = time.perf_counter() - start
+        return report
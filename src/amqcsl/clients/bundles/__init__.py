@@ -1,13 +1,24 @@
 from ._core import (
+    STDLIB_JSON_CODEC,
+    BatchVendor,
     Bundle,
+    JSONCodec,
     MultiVendor,
+    RequestBatch,
     SingleVendor,
     Vendor,
+    build_json_request,
+    default_json_codec,
     httpxClient,
+    read_json,
 )
 from ._misc import (
+    UPLOAD_ERRORS,
     AddAudioBundle,
+    AudioUploadReport,
     AuthBundle,
+    ChunkedListEditBundle,
+    ChunkResult,
     CreateAlbumBundle,
     CreateGroupBundle,
     CreateListBundle,
@@ -21,14 +32,23 @@ from ._misc import (
     GroupEditBundle,
     ListBundle,
     ListEditBundle,
+    ListEditResult,
     LogoutBundle,
     SongAddMetadataBundle,
     SongDeleteBundle,
     SongDeleteMetadataBundle,
     SongEditBundle,
     TrackAddMetadataBundle,
+    TrackBatchAddMetadataBundle,
     TrackDeleteMetadataBundle,
     TrackEditBundle,
+    TracksEditBundle,
+    UploadSession,
+    is_retryable,
+    is_retryable_status,
+    presign_request,
+    read_upload_session,
+    upload_request,
 )
 from ._pages import (
     AsyncPageStrategy,
@@ -49,9 +69,19 @@ __all__ = [
     'MultiVendor',
     'SingleVendor',
     'Vendor',
+    'BatchVendor',
+    'RequestBatch',
     'httpxClient',
+    'JSONCodec',
+    'STDLIB_JSON_CODEC',
+    'build_json_request',
+    'default_json_codec',
+    'read_json',
     'AddAudioBundle',
+    'AudioUploadReport',
     'AuthBundle',
+    'ChunkedListEditBundle',
+    'ChunkResult',
     'CreateAlbumBundle',
     'CreateGroupBundle',
     'CreateListBundle',
@@ -65,14 +95,24 @@ __all__ = [
     'GroupEditBundle',
     'ListBundle',
     'ListEditBundle',
+    'ListEditResult',
     'LogoutBundle',
     'SongAddMetadataBundle',
     'SongDeleteBundle',
     'SongDeleteMetadataBundle',
     'SongEditBundle',
     'TrackAddMetadataBundle',
+    'TrackBatchAddMetadataBundle',
     'TrackDeleteMetadataBundle',
     'TrackEditBundle',
+    'TracksEditBundle',
+    'UploadSession',
+    'UPLOAD_ERRORS',
+    'is_retryable',
+    'is_retryable_status',
+    'presign_request',
+    'read_upload_session',
+    'upload_request',
     'IterArtistsBundle',
     'IterSongsBundle',
     'IterTracksBundle',
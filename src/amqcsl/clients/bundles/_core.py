@@ -1,8 +1,12 @@
-from collections.abc import Generator
-from typing import Iterable, Protocol
+import json
+from collections.abc import Callable, Generator, Iterator, Mapping
+from functools import cache
+from typing import Any, Iterable, Protocol
 
 import httpx
 import rich.repr
+from attrs import field, frozen
+from attrs.validators import ge, instance_of
 
 type httpxClient = httpx.Client | httpx.AsyncClient
 
@@ -11,9 +15,120 @@ type MultiVendor[R] = Generator[Iterable[httpx.Request], Iterable[httpx.Response
 type Vendor[R] = SingleVendor[R] | MultiVendor[R]
 
 
+@frozen
+class RequestBatch:
+    """Several requests a vendor can yield instead of a plain iterable
+    Each request is answered with its response, or with the httpx.TransportError it raised,
+    so one failed request doesn't lose the responses of the others
+    """
+
+    #: Requests to send
+    requests: tuple[httpx.Request, ...] = field(converter=tuple)  # type: ignore[reportUnknownArgumentType]
+    #: Seconds to wait before sending, e.g. to back off before a retry
+    delay: float = field(default=0, validator=[instance_of((int, float)), ge(0)])
+
+    def __iter__(self) -> Iterator[httpx.Request]:
+        return iter(self.requests)
+
+
+type BatchVendor[R] = Generator[RequestBatch, Iterable[httpx.Response | httpx.TransportError], R]
+
+
 class Bundle[R](Protocol):
     # httpxClient is used for build_request and other client methods
     # Do not use to send actual requests, since it should work for both sync
     # and async clients
-    def vendor(self, client: httpxClient) -> Vendor[R]: ...
+    # codec is the (Async)DBClient's json_codec, for building and reading JSON bodies
+    def vendor(self, client: httpxClient, codec: 'JSONCodec') -> Vendor[R]: ...
     def __rich_repr__(self) -> rich.repr.Result: ...
+
+
+# --- JSON ---
+
+
+@frozen
+class JSONCodec:
+    """Pair of functions used to decode responses and encode request bodies"""
+
+    #: Name of the backend
+    name: str
+    #: Function converting response bytes into python objects
+    loads: Callable[[bytes], Any]
+    #: Function converting python objects into utf-8 bytes
+    dumps: Callable[[Any], bytes]
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    # Same settings httpx uses for build_request(json=...)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+STDLIB_JSON_CODEC = JSONCodec('json', json.loads, _stdlib_dumps)
+
+
+@cache
+def default_json_codec() -> JSONCodec:
+    """Get the fastest JSON codec available, trying orjson, then msgspec, then the stdlib
+    Resolved once and cached
+
+    Returns:
+        JSONCodec
+    """
+    try:
+        import orjson  # type: ignore[reportMissingImports]
+    except ImportError:
+        pass
+    else:
+        return JSONCodec('orjson', orjson.loads, orjson.dumps)  # type: ignore[reportUnknownMemberType]
+    try:
+        import msgspec  # type: ignore[reportMissingImports]
+    except ImportError:
+        pass
+    else:
+        return JSONCodec('msgspec', msgspec.json.decode, msgspec.json.encode)  # type: ignore[reportUnknownMemberType]
+    return STDLIB_JSON_CODEC
+
+
+def build_json_request(
+    client: httpxClient,
+    codec: JSONCodec,
+    method: str,
+    url: str,
+    body: Any,
+    *,
+    params: Mapping[str, Any] | None = None,
+) -> httpx.Request:
+    """Build a request with a JSON body, encoded with the client's codec
+
+    Args:
+        client: httpx client
+        codec: JSONCodec to encode the body with
+        method: HTTP method
+        url: URL to send the request to
+        body: Object to encode as JSON
+        params: Query params
+
+    Returns:
+        httpx.Request
+    """
+    return client.build_request(
+        method,
+        url,
+        params=params,
+        content=codec.dumps(body),
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+def read_json(codec: JSONCodec, res: httpx.Response) -> Any:
+    """Decode a response with a codec
+    Bundles should call this at most once per response
+
+    Args:
+        codec: JSONCodec
+        res: Response to decode
+
+    Returns:
+        Decoded JSON
+    """
+    return codec.loads(res.content)
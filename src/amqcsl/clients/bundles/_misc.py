@@ -1,17 +1,18 @@
 import logging
 import mimetypes
-from collections.abc import Iterable, Sequence
+import secrets
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Mapping, Sequence
 from functools import cached_property
 from pathlib import Path
-from typing import override
+from typing import BinaryIO, Protocol, override
 
 import httpx
 import rich.repr
 from attr.validators import optional
-from attrs import Attribute, field, frozen
-from attrs.validators import deep_iterable, gt, in_, instance_of, min_len
+from attrs import Attribute, converters, define, field, frozen
+from attrs.validators import deep_iterable, ge, gt, in_, instance_of, min_len
 
-from amqcsl.exceptions import LoginError, QueryError
+from amqcsl.exceptions import AMQCSLError, LoginError, QueryError
 from amqcsl.objects._db_types import (
     AlbumTrack,
     ArtistCredit,
@@ -33,7 +34,17 @@ from amqcsl.objects._db_types import (
 from amqcsl.objects._json_types import AlbumAddBody, MetadataPostBody, SongMetadataPostBody, TrackPutBody
 from amqcsl.objects._obj_consts import EMPTY_ID, REVERSE_TRACK_TYPE, TrackType
 
-from ._core import Bundle, SingleVendor, httpxClient
+from ._core import (
+    BatchVendor,
+    Bundle,
+    JSONCodec,
+    MultiVendor,
+    RequestBatch,
+    SingleVendor,
+    build_json_request,
+    httpxClient,
+    read_json,
+)
 
 logger = logging.getLogger('amqcsl.client')
 
@@ -62,11 +73,12 @@ class AuthBundle(Bundle[None]):
         except FileNotFoundError:
             return ''
 
-    def login(self, client: httpxClient) -> SingleVendor[None]:
+    def login(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         """Attempt login, saves session_id to file if successful
 
         Args:
             client: HTTPx client
+            codec: JSONCodec
 
         Raises:
             LoginError: If the username and password are invalid
@@ -77,7 +89,7 @@ class AuthBundle(Bundle[None]):
             'username': self.username,
             'password': self.password,
         }
-        res = yield client.build_request('POST', '/api/login', json=body)
+        res = yield build_json_request(client, codec, 'POST', '/api/login', body)
         if res.status_code == 403:
             raise LoginError('Invalid login credentials')
         logger.info(f'Writing session_id to {self.session_path}')
@@ -86,7 +98,7 @@ class AuthBundle(Bundle[None]):
             file.write(session_id)
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         """Verify that the user login info is correct and user has admin
 
         Raises:
@@ -108,7 +120,7 @@ class AuthBundle(Bundle[None]):
             if not is_valid_cookie:
                 logger.info('Invalid session cookie, attempting login')
                 client.cookies.delete('session-id')
-                yield from self.login(client)
+                yield from self.login(client, codec)
                 res = yield client.build_request('GET', '/api/auth/me')
 
             if res is None:
@@ -128,8 +140,9 @@ class AuthBundle(Bundle[None]):
             raise
 
         logger.info('Auth successful')
-        if 'ADMIN' not in res.json()['roles']:
-            raise LoginError(f'User {res.json()["name"]} does not have admin privileges')
+        data = read_json(codec, res)
+        if 'ADMIN' not in data['roles']:
+            raise LoginError(f'User {data["name"]} does not have admin privileges')
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
@@ -142,7 +155,7 @@ class LogoutBundle(Bundle[None]):
     session_path: Path = field(validator=instance_of(Path))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info('Logging out the client')
         res = yield client.build_request('POST', '/api/logout')
         res.raise_for_status()
@@ -162,12 +175,12 @@ type CSLLists = dict[str, CSLList]
 @frozen
 class ListBundle(Bundle[CSLLists]):
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[CSLLists]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[CSLLists]:
         logger.info('Fetching lists')
         res = yield client.build_request('GET', '/api/lists')
         res.raise_for_status()
         rtn: CSLLists = {}
-        for data in res.json():
+        for data in read_json(codec, res):
             csl_list = CSLList.from_json(data)
             rtn[csl_list.name] = csl_list
         return rtn
@@ -184,12 +197,12 @@ type CSLGroups = dict[str, CSLGroup]
 @frozen
 class GroupBundle(Bundle[CSLGroups]):
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[CSLGroups]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[CSLGroups]:
         logger.info('Fetching groups')
         res = yield client.build_request('GET', '/api/groups')
         res.raise_for_status()
         rtn: CSLGroups = {}
-        for data in res.json():
+        for data in read_json(codec, res):
             group = CSLGroup.from_json(data)
             rtn[group.name] = group
         return rtn
@@ -205,14 +218,14 @@ class GetSongBundle(Bundle[CSLSong]):
     song: CSLSongSample = field(validator=instance_of(CSLSongSample))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[CSLSong]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[CSLSong]:
         song = self.song
         if isinstance(song, CSLSong):
             logger.warning(f'client.get_song called with already filled CSLSong {song.name}')
             return song
         res = yield client.build_request('GET', f'/api/song/{song.id}')
         res.raise_for_status()
-        return CSLSong.from_json(res.json())
+        return CSLSong.from_json(read_json(codec, res))
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
@@ -224,14 +237,14 @@ class GetArtistBundle(Bundle[CSLArtist]):
     artist: CSLArtistSample = field(validator=instance_of(CSLArtistSample))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[CSLArtist]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[CSLArtist]:
         artist = self.artist
         if isinstance(artist, CSLArtist):
             logger.warning(f'client.get_artist called with already filled CSLArtist {artist.name}')
             return artist
         res = yield client.build_request('GET', f'/api/artist/{artist.id}')
         res.raise_for_status()
-        return CSLArtist.from_json(res.json())
+        return CSLArtist.from_json(read_json(codec, res))
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
@@ -243,14 +256,15 @@ class GetMetadataBundle(Bundle[CSLMetadata | None]):
     track: CSLTrack = field(validator=instance_of(CSLTrack))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[CSLMetadata | None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[CSLMetadata | None]:
         res = yield client.build_request('GET', f'/api/track/{self.track.id}/metadata')
-        match res.json():
+        data = read_json(codec, res)
+        match data:
             case {'statusCode': 404, 'errors': {'generalErrors': ['Song does not have metadata']}}:
                 return None
             case _:
                 res.raise_for_status()
-                return CSLMetadata.from_json(res.json())
+                return CSLMetadata.from_json(data)
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
@@ -263,13 +277,13 @@ class CreateListBundle(Bundle[None]):
     csl_lists: Iterable[CSLList] = field(default=(), validator=deep_iterable(instance_of(CSLList)))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Creating list {self.name}')
         body = {
             'importListIds': [csl_list.id for csl_list in self.csl_lists],
             'name': self.name,
         }
-        res = yield client.build_request('POST', '/api/list', json=body)
+        res = yield build_json_request(client, codec, 'POST', '/api/list', body)
         res.raise_for_status()
         logger.info(f'List {self.name} created')
 
@@ -287,7 +301,7 @@ class ListEditBundle(Bundle[None]):
     remove: Iterable[CSLTrack] = field(default=(), validator=deep_iterable(instance_of(CSLTrack)))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         csl_list = self.csl_list
         logger.info(f'Editing list {csl_list.name}')
         body = {
@@ -296,7 +310,7 @@ class ListEditBundle(Bundle[None]):
             'name': self.name,
             'removeSongIds': [track.id for track in self.remove],
         }
-        res = yield client.build_request('PUT', f'/api/list/{csl_list.id}', json=body)
+        res = yield build_json_request(client, codec, 'PUT', f'/api/list/{csl_list.id}', body)
         res.raise_for_status()
 
     @override
@@ -305,16 +319,140 @@ class ListEditBundle(Bundle[None]):
         yield 'new_name', self.name, None
 
 
+@frozen
+class ChunkResult[T]:
+    """Outcome of one chunk of a chunked request"""
+
+    #: Items sent in the chunk
+    items: tuple[T, ...]
+    #: Status code of the chunk's last response, None if the last attempt got no response
+    status_code: int | None
+    #: Number of times the chunk was sent
+    attempts: int = 1
+    #: Transport error raised by the last attempt, if any
+    error: httpx.TransportError | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+
+@frozen
+class ListEditResult:
+    """Outcome of a chunked list edit"""
+
+    #: Results of the chunks adding tracks
+    added: list[ChunkResult[CSLTrack]]
+    #: Results of the chunks removing tracks
+    removed: list[ChunkResult[CSLTrack]]
+    #: Number of tracks not sent since the list already had (or didn't have) them
+    skipped: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in (*self.added, *self.removed))
+
+
+@frozen
+class ChunkedListEditBundle(Bundle[ListEditResult]):
+    """List edit split into chunks, for adding or removing many tracks
+    Chunks are sent in waves of at most max_parallel requests, and chunks that hit a transport error,
+    a 5xx or a 429 are resent up to retries times, waiting retry_delay seconds (doubled each attempt) first
+    """
+
+    csl_list: CSLList = field(validator=instance_of(CSLList))
+    add: tuple[CSLTrack, ...] = field(default=(), converter=tuple, validator=deep_iterable(instance_of(CSLTrack)))  # type: ignore[reportUnknownArgumentType]
+    remove: tuple[CSLTrack, ...] = field(default=(), converter=tuple, validator=deep_iterable(instance_of(CSLTrack)))  # type: ignore[reportUnknownArgumentType]
+    #: Ids of the tracks currently in the list, used to skip redundant edits if given
+    current_ids: frozenset[str] | None = field(default=None, converter=converters.optional(frozenset))  # type: ignore[reportUnknownArgumentType]
+    chunk_size: int = field(default=500, validator=[instance_of(int), gt(0)])
+    max_parallel: int = field(default=4, validator=[instance_of(int), gt(0)])
+    retries: int = field(default=2, validator=[instance_of(int), ge(0)])
+    retry_delay: float = field(default=1.0, validator=[instance_of((int, float)), ge(0)])
+
+    @cached_property
+    def filtered(self) -> tuple[list[CSLTrack], list[CSLTrack], int]:
+        current = self.current_ids
+        seen: set[str] = set()
+        add: list[CSLTrack] = []
+        remove: list[CSLTrack] = []
+        for tracks, out, keep_if_current in ((self.add, add, False), (self.remove, remove, True)):
+            for track in tracks:
+                if track.id in seen:
+                    continue
+                seen.add(track.id)
+                if current is None or (track.id in current) == keep_if_current:
+                    out.append(track)
+        return add, remove, len(self.add) + len(self.remove) - len(add) - len(remove)
+
+    @override
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> BatchVendor[ListEditResult]:
+        csl_list = self.csl_list
+        add, remove, skipped = self.filtered
+        size = self.chunk_size
+        chunks = [('addSongIds', tuple(add[i : i + size])) for i in range(0, len(add), size)]
+        chunks += [('removeSongIds', tuple(remove[i : i + size])) for i in range(0, len(remove), size)]
+        logger.info(f'Editing list {csl_list.name} in {len(chunks)} chunks, skipping {skipped} tracks')
+
+        results: dict[int, ChunkResult[CSLTrack]] = {}
+        queue = [(idx, 1) for idx in range(len(chunks))]
+        while queue:
+            wave, queue = queue[: self.max_parallel], queue[self.max_parallel :]
+            reqs: list[httpx.Request] = []
+            for idx, _ in wave:
+                key, tracks = chunks[idx]
+                body = {
+                    'addSongIds': [],
+                    'id': EMPTY_ID,
+                    'name': None,
+                    'removeSongIds': [],
+                }
+                body[key] = [track.id for track in tracks]
+                reqs.append(build_json_request(client, codec, 'PUT', f'/api/list/{csl_list.id}', body))
+            retry = max(attempt for _, attempt in wave) - 1
+            delay = self.retry_delay * 2 ** (retry - 1) if retry else 0
+            answers = yield RequestBatch(reqs, delay)
+            for (idx, attempt), answer in zip(wave, answers):
+                if isinstance(answer, httpx.Response):
+                    result = ChunkResult(chunks[idx][1], answer.status_code, attempt)
+                    reason = f'status {answer.status_code}'
+                    retryable = is_retryable_status(answer.status_code)
+                else:
+                    result = ChunkResult(chunks[idx][1], None, attempt, answer)
+                    reason = repr(answer)
+                    retryable = True
+                results[idx] = result
+                if result.ok:
+                    continue
+                if retryable and attempt <= self.retries:
+                    logger.warning(f'Chunk {idx} of list edit failed with {reason}, retrying')
+                    queue.append((idx, attempt + 1))
+                else:
+                    logger.error(f'Chunk {idx} of list edit failed with {reason}')
+
+        ordered = [results[idx] for idx in range(len(chunks))]
+        add_chunks = -(-len(add) // size)
+        return ListEditResult(ordered[:add_chunks], ordered[add_chunks:], skipped)
+
+    @override
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield 'list', self.csl_list
+        add, remove, skipped = self.filtered
+        yield 'add', len(add)
+        yield 'remove', len(remove)
+        yield 'skipped', skipped, 0
+
+
 @frozen
 class CreateGroupBundle(Bundle[CSLGroup]):
     name: str = field(validator=[instance_of(str), min_len(1)])
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[CSLGroup]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[CSLGroup]:
         logger.info(f'Adding group {self.name}')
-        res = yield client.build_request('POST', '/api/group', json={'name': self.name})
+        res = yield build_json_request(client, codec, 'POST', '/api/group', {'name': self.name})
         res.raise_for_status()
-        return CSLGroup.from_json(res.json())
+        return CSLGroup.from_json(read_json(codec, res))
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
@@ -327,13 +465,13 @@ class GroupEditBundle(Bundle[None]):
     name: str = field(validator=[instance_of(str), min_len(1)])
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Editing group {self.group.name}')
         body = {
             'id': EMPTY_ID,
             'name': self.name,
         }
-        res = yield client.build_request('PUT', f'/api/group/{self.group.id}', json=body)
+        res = yield build_json_request(client, codec, 'PUT', f'/api/group/{self.group.id}', body)
         res.raise_for_status()
 
     @override
@@ -347,7 +485,7 @@ class GroupDeleteBundle(Bundle[None]):
     group: CSLGroup = field(validator=instance_of(CSLGroup))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Deleting group {self.group.name}')
         res = yield client.build_request('DELETE', f'/api/group/{self.group.id}')
         res.raise_for_status()
@@ -364,14 +502,14 @@ class SongEditBundle(Bundle[None]):
     disambiguation: str | None = field(validator=optional(instance_of(str)))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Editing song {self.song.name}')
         body = {
             'id': EMPTY_ID,
             'name': self.name if self.name else self.song.name,
             'disambiguation': self.disambiguation if self.disambiguation else self.song.disambiguation,
         }
-        res = yield client.build_request('PUT', f'/api/group/{self.song.id}', json=body)
+        res = yield build_json_request(client, codec, 'PUT', f'/api/group/{self.song.id}', body)
         res.raise_for_status()
 
     @override
@@ -386,7 +524,7 @@ class SongDeleteBundle(Bundle[None]):
     song: CSLSong = field(validator=instance_of(CSLSong))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Deleting song {self.song.name}')
         res = yield client.build_request('DELETE', f'/api/song/{self.song.id}')
         res.raise_for_status()
@@ -416,7 +554,7 @@ class SongAddMetadataBundle(Bundle[None]):
         return artist_credits, extra_metadata
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Queuing metadata edit on {self.song.name}')
         artist_credits, extra_metadata = self.filtered_metas
         body: SongMetadataPostBody = {
@@ -424,7 +562,7 @@ class SongAddMetadataBundle(Bundle[None]):
             'artistCredits': [meta.to_json() for meta in artist_credits],
             'extraMetadatas': [meta.to_json() for meta in extra_metadata],
         }
-        res = yield client.build_request('POST', f'/api/song/{self.song.id}', json=body)
+        res = yield build_json_request(client, codec, 'POST', f'/api/song/{self.song.id}', body)
         res.raise_for_status()
 
     @override
@@ -441,7 +579,7 @@ class SongDeleteMetadataBundle(Bundle[None]):
     meta: CSLSongArtistCredit | CSLExtraMetadata = field(validator=instance_of((CSLSongArtistCredit, CSLExtraMetadata)))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Removing metadata {self.meta} from song {self.song.name}')
         res = yield client.build_request('DELETE', f'/api/track/{self.song.id}/metadata/{self.meta.id}')
         res.raise_for_status()
@@ -492,7 +630,7 @@ class TrackAddMetadataBundle(Bundle[None]):
         return len(artist_credits) + len(extra_metadata)
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         track = self.track
         logger.info(f'Queuing metadata edit on {track.name}')
 
@@ -506,7 +644,7 @@ class TrackAddMetadataBundle(Bundle[None]):
             'id': EMPTY_ID,
             'override': self._override,
         }
-        res = yield client.build_request('POST', f'/api/track/{track.id}/metadata', json=body)
+        res = yield build_json_request(client, codec, 'POST', f'/api/track/{track.id}/metadata', body)
         res.raise_for_status()
 
     @override
@@ -518,13 +656,67 @@ class TrackAddMetadataBundle(Bundle[None]):
         yield 'extra_metadata', extra_metadata, []
 
 
+@frozen
+class TrackBatchAddMetadataBundle(Bundle[None]):
+    """Metadata edits on many tracks, sent as one concurrent batch
+    The db has no batch metadata route, so every track still costs one request,
+    but all of them are vended at once so the async client sends them concurrently
+    """
+
+    bundles: tuple[TrackAddMetadataBundle, ...] = field(
+        converter=tuple,  # type: ignore[reportUnknownArgumentType]
+        validator=deep_iterable(instance_of(TrackAddMetadataBundle)),
+    )
+
+    @classmethod
+    def from_edits(
+        cls,
+        edits: Iterable[tuple[CSLTrack, Iterable[Metadata]]],
+        override: bool | None = None,
+        existing_metas: Mapping[str, CSLMetadata | None] | None = None,
+    ):
+        existing_metas = existing_metas or {}
+        return cls(
+            TrackAddMetadataBundle(track, tuple(metas), override, existing_metas.get(track.id))
+            for track, metas in edits
+        )
+
+    def __len__(self) -> int:
+        return sum(map(len, self.bundles))
+
+    @override
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> MultiVendor[None]:
+        logger.info(f'Queuing metadata edits on {len(self.bundles)} tracks')
+        # Step every track's vendor in lockstep, vending the requests of each step together
+        pending: list[tuple[SingleVendor[None], httpx.Request]] = []
+        for vendor in (bundle.vendor(client, codec) for bundle in self.bundles):
+            try:
+                pending.append((vendor, next(vendor)))
+            except StopIteration:
+                pass
+        while pending:
+            responses = yield [req for _, req in pending]
+            stepped: list[tuple[SingleVendor[None], httpx.Request]] = []
+            for (vendor, _), res in zip(pending, responses):
+                try:
+                    stepped.append((vendor, vendor.send(res)))
+                except StopIteration:
+                    pass
+            pending = stepped
+
+    @override
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield 'tracks', len(self.bundles)
+        yield 'changes', len(self)
+
+
 @frozen
 class TrackDeleteMetadataBundle(Bundle[None]):
     track: CSLTrack = field(validator=instance_of(CSLTrack))
     meta: CSLSongArtistCredit | CSLExtraMetadata = field(validator=instance_of((CSLSongArtistCredit, CSLExtraMetadata)))
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         logger.info(f'Removing metadata {self.meta} from track {self.track.name}')
         res = yield client.build_request('DELETE', f'/api/track/{self.track.id}/metadata/{self.meta.id}')
         res.raise_for_status()
@@ -535,6 +727,41 @@ class TrackDeleteMetadataBundle(Bundle[None]):
         yield 'meta', self.meta
 
 
+class _TrackEdit(Protocol):
+    artist_credits: Sequence[TrackPutArtistCredit] | None
+    groups: Sequence[CSLGroup] | None
+    name: str | None
+    original_artist: str | None
+    original_name: str | None
+    song: NewSong | CSLSongSample | None
+    type: TrackType | None
+
+
+def _track_put_body(edit: _TrackEdit, batch_song_ids: list[str] | None = None) -> TrackPutBody:
+    body: TrackPutBody = {
+        'artistCredits': None
+        if edit.artist_credits is None
+        else [v.to_json(i) for i, v in enumerate(edit.artist_credits)],
+        'batchSongIds': batch_song_ids,
+        'groupIds': None if edit.groups is None else [group.id for group in edit.groups],
+        'id': EMPTY_ID,
+        'name': edit.name,
+        'newSong': None,
+        'originalArtist': edit.original_artist,
+        'originalName': edit.original_name,
+        'songId': None,
+        'type': None if edit.type is None else REVERSE_TRACK_TYPE[edit.type],
+    }
+    match edit.song:
+        case NewSong():
+            body['newSong'] = edit.song.to_json()
+        case CSLSongSample():
+            body['songId'] = edit.song.id
+        case None:
+            pass
+    return body
+
+
 @frozen
 class TrackEditBundle(Bundle[None]):
     track: CSLTrack = field(validator=instance_of(CSLTrack))
@@ -556,32 +783,12 @@ class TrackEditBundle(Bundle[None]):
     )
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         track = self.track
         logger.info(f'Editing track {track.name}')
 
-        body: TrackPutBody = {
-            'artistCredits': None
-            if self.artist_credits is None
-            else [v.to_json(i) for i, v in enumerate(self.artist_credits)],
-            'batchSongIds': None,
-            'groupIds': None if self.groups is None else [group.id for group in self.groups],
-            'id': EMPTY_ID,
-            'name': self.name,
-            'newSong': None,
-            'originalArtist': self.original_artist,
-            'originalName': self.original_name,
-            'songId': None,
-            'type': None if self.type is None else REVERSE_TRACK_TYPE[self.type],
-        }
-        match self.song:
-            case NewSong():
-                body['newSong'] = self.song.to_json()
-            case CSLSongSample():
-                body['songId'] = self.song.id
-            case None:
-                pass
-        yield client.build_request('PUT', f'/api/track/{track.id}', json=body)
+        body = _track_put_body(self)
+        yield build_json_request(client, codec, 'PUT', f'/api/track/{track.id}', body)
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
@@ -595,6 +802,71 @@ class TrackEditBundle(Bundle[None]):
         yield 'type', self.type, None
 
 
+@frozen
+class TracksEditBundle(Bundle[list[ChunkResult[CSLTrack]]]):
+    """Identical edits on many tracks, sent in chunks through batchSongIds
+    Each chunk is one PUT on the chunk's first track, with every track of the chunk in batchSongIds
+    """
+
+    tracks: tuple[CSLTrack, ...] = field(converter=tuple, validator=deep_iterable(instance_of(CSLTrack)))  # type: ignore[reportUnknownArgumentType]
+    artist_credits: Sequence[TrackPutArtistCredit] | None = field(  # type: ignore[reportUnknownArgumentType]
+        default=None,
+        validator=optional(deep_iterable(instance_of(TrackPutArtistCredit))),  # type: ignore[reportUnknownArgumentType]
+    )
+    groups: Sequence[CSLGroup] | None = field(default=None, validator=optional(deep_iterable(instance_of(CSLGroup))))  # type: ignore[reportUnknownArgumentType]
+    name: str | None = field(default=None, validator=optional(instance_of(str)))
+    original_artist: str | None = field(default=None, validator=optional(instance_of(str)))
+    original_name: str | None = field(default=None, validator=optional(instance_of(str)))
+    song: NewSong | CSLSongSample | None = field(
+        default=None,
+        validator=optional(instance_of((NewSong, CSLSongSample))),
+    )
+    type: TrackType | None = field(
+        default=None,
+        validator=optional(in_(REVERSE_TRACK_TYPE)),  # type: ignore[reportUnknownArgumentType]
+    )
+    chunk_size: int = field(default=100, validator=[instance_of(int), gt(0)])
+
+    @property
+    def chunks(self) -> list[tuple[CSLTrack, ...]]:
+        tracks, size = self.tracks, self.chunk_size
+        return [tracks[i : i + size] for i in range(0, len(tracks), size)]
+
+    @override
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> MultiVendor[list[ChunkResult[CSLTrack]]]:
+        chunks = self.chunks
+        if not chunks:
+            return []
+        logger.info(f'Editing {len(self.tracks)} tracks in {len(chunks)} chunks')
+        reqs = [
+            build_json_request(
+                client,
+                codec,
+                'PUT',
+                f'/api/track/{chunk[0].id}',
+                _track_put_body(self, [track.id for track in chunk]),
+            )
+            for chunk in chunks
+        ]
+        responses = yield reqs
+        results = [ChunkResult(chunk, res.status_code) for chunk, res in zip(chunks, responses)]
+        for result in results:
+            if not result.ok:
+                logger.error(f'Editing chunk of {len(result.items)} tracks failed with status {result.status_code}')
+        return results
+
+    @override
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield 'tracks', len(self.tracks)
+        yield 'artist_credits', self.artist_credits, None
+        yield 'groups', self.groups, None
+        yield 'name', self.name, None
+        yield 'original_artist', self.original_artist, None
+        yield 'original_name', self.original_name, None
+        yield 'song', self.song, None
+        yield 'type', self.type, None
+
+
 @frozen
 class CreateAlbumBundle(Bundle[None]):
     name: str = field(validator=[instance_of(str), min_len(1)])
@@ -604,7 +876,7 @@ class CreateAlbumBundle(Bundle[None]):
     tracks: Sequence[Sequence[AlbumTrack]] = field(validator=deep_iterable(deep_iterable(instance_of(AlbumTrack))))  # type: ignore[reportUnknownArgumentType]
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         name = self.name
         logger.info(f'Adding album {name}')
         body: AlbumAddBody = {
@@ -619,7 +891,7 @@ class CreateAlbumBundle(Bundle[None]):
                 for track_number, track in enumerate(disc, start=1)
             ],
         }
-        res = yield client.build_request('POST', '/api/album', json=body)
+        res = yield build_json_request(client, codec, 'POST', '/api/album', body)
         res.raise_for_status()
 
     @override
@@ -631,6 +903,90 @@ class CreateAlbumBundle(Bundle[None]):
         yield 'tracks', self.tracks
 
 
+@frozen
+class UploadSession:
+    """Presigned audio upload, from POST /api/track/{id}/presigned-upload"""
+
+    session_id: str
+    key: str
+    url: str
+
+
+def presign_request(client: httpxClient, codec: JSONCodec, track: CSLTrack) -> httpx.Request:
+    return build_json_request(client, codec, 'POST', f'/api/track/{track.id}/presigned-upload', {})
+
+
+#: Errors that fail a single track in add_audio_many instead of the whole run
+UPLOAD_ERRORS = (httpx.HTTPError, OSError, ValueError, AMQCSLError)
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """Whether a response status is worth retrying, i.e. a server error or 429"""
+    return status_code >= 500 or status_code == 429
+
+
+def is_retryable(e: Exception) -> bool:
+    """Whether an upload error is worth retrying with the same session"""
+    match e:
+        case httpx.TransportError():
+            return True
+        case httpx.HTTPStatusError(response=res):
+            return is_retryable_status(res.status_code)
+        case _:
+            return False
+
+
+def read_upload_session(codec: JSONCodec, track: CSLTrack, res: httpx.Response) -> UploadSession:
+    res.raise_for_status()
+    data = read_json(codec, res)
+    match data:
+        case {
+            'sessionId': str(session_id),
+            'key': str(key),
+            'url': str(url),
+        }:
+            return UploadSession(session_id, key, url)
+        case _:
+            logger.error(f'Presigning upload of {track.name} returned unknown json', extra={'return_json': data})
+            raise QueryError('Received unknown json when presigning upload')
+
+
+def upload_request(
+    client: httpxClient,
+    session: UploadSession,
+    audio_path: Path,
+    mime_type: str,
+    file: BinaryIO | AsyncIterable[bytes],
+) -> httpx.Request:
+    # httpx reads file objects in multipart bodies in chunks, so files aren't buffered whole,
+    # but it reads them synchronously, so the async client streams the file through an async iterable instead
+    url = session.url
+    params = {'sessionId': session.session_id, 'key': session.key}
+    if not isinstance(file, AsyncIterable):
+        return client.build_request('POST', url, params=params, files={'file': (audio_path.name, file, mime_type)})
+    boundary = secrets.token_hex(16)
+    filename = audio_path.name.translate({0x22: '%22', 0x5C: '\\\\'})
+    head = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: {mime_type}\r\n\r\n'
+    ).encode()
+    tail = f'\r\n--{boundary}--\r\n'.encode()
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in file:
+            yield chunk
+        yield tail
+
+    headers = {
+        'Content-Type': f'multipart/form-data; boundary={boundary}',
+        # Sent with a length instead of chunked, like httpx does for file objects
+        'Content-Length': str(len(head) + audio_path.stat().st_size + len(tail)),
+    }
+    return client.build_request('POST', url, params=params, headers=headers, content=body())
+
+
 @frozen
 class AddAudioBundle(Bundle[None]):
     track: CSLTrack = field(validator=instance_of(CSLTrack))
@@ -651,33 +1007,39 @@ class AddAudioBundle(Bundle[None]):
         return mime_type
 
     @override
-    def vendor(self, client: httpxClient) -> SingleVendor[None]:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> SingleVendor[None]:
         track = self.track
         logger.info(f'Uploading audio to {track.name}')
-        res = yield client.build_request('POST', f'/api/track/{track.id}/presigned-upload', json={})
-        res.raise_for_status()
-        match res.json():
-            case {
-                'sessionId': str(session_id),
-                'key': str(key),
-                'url': str(url),
-            }:
-                pass
-            case _:
-                logger.error(
-                    f'Presigning upload of {self.track.name} returned unknown json', extra={'return_json': res.json()}
-                )
-                raise QueryError('Received unknown json when presigning upload')
+        res = yield presign_request(client, codec, track)
+        session = read_upload_session(codec, track, res)
         with open(self.audio_path, 'rb') as file:
-            res = yield client.build_request(
-                'POST',
-                url,
-                params={'sessionId': session_id, 'key': key},
-                files={'file': (self.audio_path.name, file, self.mime_type)},
-            )
+            res = yield upload_request(client, session, self.audio_path, self.mime_type, file)
         res.raise_for_status()
 
     @override
     def __rich_repr__(self) -> rich.repr.Result:
         yield 'track', self.track.simp
         yield 'audio_path', self.audio_path.resolve()
+
+
+@define
+class AudioUploadReport:
+    """Summary of a bulk audio upload"""
+
+    #: Tracks whose audio was uploaded
+    uploaded: list[CSLTrack] = field(factory=list[CSLTrack])
+    #: Tracks whose upload failed, with the error
+    failed: list[tuple[CSLTrack, Exception]] = field(factory=list[tuple[CSLTrack, Exception]])
+    #: Tracks skipped since the manifest shows the file was already uploaded
+    skipped: list[CSLTrack] = field(factory=list[CSLTrack])
+    #: Failed tracks whose presign session is kept in the journal, for resuming later
+    pending: list[CSLTrack] = field(factory=list[CSLTrack])
+    #: Total size of the uploaded files
+    bytes_uploaded: int = 0
+    #: Wall time of the whole upload
+    seconds: float = 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        """Upload throughput in MB/s"""
+        return self.bytes_uploaded / 1e6 / self.seconds if self.seconds else 0.0
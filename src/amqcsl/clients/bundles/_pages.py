@@ -2,7 +2,7 @@ import logging
 from abc import ABC, abstractmethod
 from collections.abc import Generator, Iterator, Sequence
 from functools import cached_property
-from typing import TYPE_CHECKING, Generic, Iterable, TypeVar, overload, override
+from typing import TYPE_CHECKING, Any, Generic, Iterable, TypeVar, overload, override
 
 import httpx
 import rich.repr
@@ -13,7 +13,7 @@ from amqcsl.exceptions import QueryError
 from amqcsl.objects._db_types import CSLArtistSample, CSLGroup, CSLList, CSLSongSample, CSLTrack
 from amqcsl.objects._json_types import JSONType, QueryArtist, QuerySong, QueryTrack
 
-from ._core import httpxClient
+from ._core import JSONCodec, build_json_request, default_json_codec, httpxClient
 
 if TYPE_CHECKING:
     from amqcsl import AsyncDBClient, DBClient
@@ -44,8 +44,8 @@ class PageBundle[R, Vd: PageVendor](ABC):
         elif value > self.max_batch_size:
             raise QueryError(f'Batch size {value} is larger than the max batch size of {self.max_batch_size}')
 
-    def vendor(self, client: httpxClient) -> Vd:
-        return self.strategy.vendor(self, client)
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> Vd:
+        return self.strategy.vendor(self, client, codec)
 
     def process_response(self, res: httpx.Response) -> RawPage:
         return self.strategy.process(self, res)
@@ -55,7 +55,7 @@ class PageBundle[R, Vd: PageVendor](ABC):
         yield from map(self.process_item, page)
 
     @abstractmethod
-    def page_request(self, client: httpxClient, skip: int) -> httpx.Request: ...
+    def page_request(self, client: httpxClient, codec: JSONCodec, skip: int) -> httpx.Request: ...
 
     @abstractmethod
     def process_item(self, item: JSONType) -> R: ...
@@ -69,17 +69,26 @@ Vd = TypeVar('Vd', bound=PageVendor, covariant=True)
 
 
 class PageStrategy(ABC, Generic[R, Vd]):
+    """How a PageBundle pages through a query, made per bundle by page_strategy
+    process only writes the shared state for the first page, which is always requested alone,
+    so the pages after it can be processed on executor threads at the same time
+    """
+
     _count: int | None = None
+    _codec: JSONCodec | None = None
 
     @abstractmethod
-    def vendor(self, bundle: PageBundle[R, Vd], client: httpxClient) -> Vd: ...
+    def vendor(self, bundle: PageBundle[R, Vd], client: httpxClient, codec: JSONCodec) -> Vd: ...
 
     def process(self, bundle: PageBundle[R, Vd], res: httpx.Response) -> RawPage:
         res.raise_for_status()
-        match res.json():
+        if self._codec is None:
+            self._codec = default_json_codec()
+        data = self._codec.loads(res.content)
+        match data:
             case {
                 'count': int(count),
-                **data,
+                **page_data,
             }:
                 if self._count is None:
                     if count > bundle.max_query_size:
@@ -90,20 +99,25 @@ class PageStrategy(ABC, Generic[R, Vd]):
                 elif count != self._count:
                     logger.error(f'Count mutated from {self._count} to {count}')
             case _:
-                logger.error('Unexpected query response', extra={'response': res.json()})
+                logger.error('Unexpected query response', extra={'response': data})
                 raise QueryError('Unexpected query response')
-        key, item = data.popitem()
+        key, item = page_data.popitem()
         return count, key, item
 
 
 @define
 class SyncPageStrategy[R](PageStrategy[R, PageSingleVendor], ABC):
+    """Requests pages one at a time, used by a DBClient with a non-concurrent executor or for lazy queries"""
+
     @override
-    def vendor(self, bundle: PageBundle[R, PageSingleVendor], client: httpxClient) -> PageSingleVendor:
+    def vendor(
+        self, bundle: PageBundle[R, PageSingleVendor], client: httpxClient, codec: JSONCodec
+    ) -> PageSingleVendor:
         skip = 0
         self._count = None
+        self._codec = codec
         while True:
-            count, key, page = yield bundle.page_request(client, skip)
+            count, key, page = yield bundle.page_request(client, codec, skip)
             skip += len(page)
             logger.info('Page exhausted')
             if skip >= count:
@@ -114,18 +128,39 @@ class SyncPageStrategy[R](PageStrategy[R, PageSingleVendor], ABC):
 
 @define
 class AsyncPageStrategy[R](PageStrategy[R, PageMultiVendor], ABC):
+    """Requests the first page, then every page after it at once"""
+
     @override
-    def vendor(self, bundle: PageBundle[R, PageMultiVendor], client: httpxClient) -> PageMultiVendor:
+    def vendor(self, bundle: PageBundle[R, PageMultiVendor], client: httpxClient, codec: JSONCodec) -> PageMultiVendor:
+        self._count = None
+        self._codec = codec
         logger.info('Querying first page')
-        ((count, key, page),) = yield [bundle.page_request(client, 0)]
+        ((count, key, page),) = yield [bundle.page_request(client, codec, 0)]
         reqs = [
-            bundle.page_request(client, skip)  #
+            bundle.page_request(client, codec, skip)  #
             for skip in range(bundle.batch_size, count, bundle.batch_size)
         ]
         logger.info(f'Querying {len(reqs)} more pages')
         yield reqs
 
 
+def page_strategy(client: 'DBClient | AsyncDBClient', lazy: bool = False) -> 'PageStrategy[Any, Any]':
+    """Pick how a client pages through a query
+    Clients that send requests concurrently get every page after the first at once,
+    a serial or lazy DBClient query gets them one at a time so stopping early skips the rest
+
+    Args:
+        client: (Async)DBClient
+        lazy: Page one at a time on a concurrent DBClient too, ignored for AsyncDBClient
+
+    Returns:
+        PageStrategy
+    """
+    if client.is_sync() and (lazy or not client.executor.concurrent):
+        return SyncPageStrategy()
+    return AsyncPageStrategy()
+
+
 @frozen
 class IterTracksBundle(PageBundle[CSLTrack, Vd], Generic[Vd]):
     search_term: str = field(validator=instance_of(str))
@@ -153,7 +188,7 @@ class IterTracksBundle(PageBundle[CSLTrack, Vd], Generic[Vd]):
         missing_info: bool = False,
         from_active_list: bool | None = None,
         batch_size: int = 100,
-    ) -> 'IterTracksBundle[PageSingleVendor]': ...
+    ) -> 'IterTracksBundle[PageVendor]': ...
     @overload
     @classmethod
     def from_client(
@@ -190,7 +225,7 @@ class IterTracksBundle(PageBundle[CSLTrack, Vd], Generic[Vd]):
             max_batch_size=client.max_batch_size,
             max_query_size=client.max_query_size,
             batch_size=batch_size,
-            strategy=SyncPageStrategy() if client.is_sync() else AsyncPageStrategy(),
+            strategy=page_strategy(client),
         )
 
     @cached_property
@@ -215,16 +250,16 @@ class IterTracksBundle(PageBundle[CSLTrack, Vd], Generic[Vd]):
         return body
 
     @override
-    def vendor(self, client: httpxClient) -> Vd:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> Vd:
         logger.info(f'Fetching tracks matching search term "{self.search_term}"')
-        return super().vendor(client)
+        return super().vendor(client, codec)
 
     @override
-    def page_request(self, client: httpxClient, skip: int) -> httpx.Request:
+    def page_request(self, client: httpxClient, codec: JSONCodec, skip: int) -> httpx.Request:
         body = self.body
         body['skip'] = skip
         body['take'] = self.batch_size
-        return client.build_request('POST', '/api/tracks', json=body)
+        return build_json_request(client, codec, 'POST', '/api/tracks', body)
 
     @override
     def process_item(self, item: JSONType) -> CSLTrack:
@@ -259,7 +294,7 @@ class IterSongsBundle(PageBundle[CSLSongSample, Vd], Generic[Vd]):
         client: 'DBClient',
         search_term: str,
         batch_size: int = 100,
-    ) -> 'IterSongsBundle[PageSingleVendor]': ...
+    ) -> 'IterSongsBundle[PageVendor]': ...
     @overload
     @classmethod
     def from_client(
@@ -280,7 +315,7 @@ class IterSongsBundle(PageBundle[CSLSongSample, Vd], Generic[Vd]):
             max_batch_size=client.max_batch_size,
             max_query_size=client.max_query_size,
             batch_size=batch_size,
-            strategy=SyncPageStrategy() if client.is_sync() else AsyncPageStrategy(),
+            strategy=page_strategy(client),
         )
 
     @cached_property
@@ -295,12 +330,12 @@ class IterSongsBundle(PageBundle[CSLSongSample, Vd], Generic[Vd]):
         return params
 
     @override
-    def vendor(self, client: httpxClient) -> Vd:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> Vd:
         logger.info(f'Fetching songs matching search term "{self.search_term}"')
-        return super().vendor(client)
+        return super().vendor(client, codec)
 
     @override
-    def page_request(self, client: httpxClient, skip: int) -> httpx.Request:
+    def page_request(self, client: httpxClient, codec: JSONCodec, skip: int) -> httpx.Request:
         params = self.params
         params['skip'] = skip
         params['take'] = self.batch_size
@@ -327,7 +362,8 @@ class IterArtistsBundle(PageBundle[CSLArtistSample, Vd], Generic[Vd]):
         client: 'DBClient',
         search_term: str,
         batch_size: int = 100,
-    ) -> 'IterArtistsBundle[PageSingleVendor]': ...
+        lazy: bool = False,
+    ) -> 'IterArtistsBundle[PageVendor]': ...
     @overload
     @classmethod
     def from_client(
@@ -342,13 +378,14 @@ class IterArtistsBundle(PageBundle[CSLArtistSample, Vd], Generic[Vd]):
         client: 'DBClient | AsyncDBClient',
         search_term: str,
         batch_size: int = 100,
+        lazy: bool = False,
     ) -> 'IterArtistsBundle[PageVendor]':
         return IterArtistsBundle(
             search_term=search_term,
             max_batch_size=client.max_batch_size,
             max_query_size=client.max_query_size,
             batch_size=batch_size,
-            strategy=SyncPageStrategy() if client.is_sync() else AsyncPageStrategy(),
+            strategy=page_strategy(client, lazy),
         )
 
     @cached_property
@@ -363,12 +400,12 @@ class IterArtistsBundle(PageBundle[CSLArtistSample, Vd], Generic[Vd]):
         return params
 
     @override
-    def vendor(self, client: httpxClient) -> Vd:
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> Vd:
         logger.info(f'Fetching artists matching search term "{self.search_term}"')
-        return super().vendor(client)
+        return super().vendor(client, codec)
 
     @override
-    def page_request(self, client: httpxClient, skip: int) -> httpx.Request:
+    def page_request(self, client: httpxClient, codec: JSONCodec, skip: int) -> httpx.Request:
         params = self.params
         params['skip'] = skip
         params['take'] = self.batch_size
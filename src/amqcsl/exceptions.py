@@ -14,3 +14,6 @@ class QuitError(AMQCSLError): ...
 
 
 class InputError(AMQCSLError): ...
+
+
+class SnapshotError(AMQCSLError): ...
@@ -0,0 +1,35 @@
+from amqcsl.clients._audio import AudioManifest, UploadJournal
+
+from ._diff import (
+    FieldChange,
+    RecordDiff,
+    diff_metadata,
+    diff_records,
+    diff_snapshots,
+    diff_tracks,
+    field_changes,
+    record_digest,
+)
+from ._mirror import Mirror, SyncResult
+from ._query import TrackQueryEngine
+from ._search import NameIndex, NameMatch, normalize_name, tokenize_name
+
+__all__ = [
+    'AudioManifest',
+    'FieldChange',
+    'Mirror',
+    'NameIndex',
+    'NameMatch',
+    'RecordDiff',
+    'SyncResult',
+    'TrackQueryEngine',
+    'UploadJournal',
+    'diff_metadata',
+    'diff_records',
+    'diff_snapshots',
+    'diff_tracks',
+    'field_changes',
+    'normalize_name',
+    'record_digest',
+    'tokenize_name',
+]
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Iterable, Iterator, Mapping
+from os import PathLike
+from typing import Any, Literal
+
+import attrs
+from attrs import frozen
+
+from amqcsl.objects._db_types import CSLMetadata, CSLTrack
+from amqcsl.objects._snapshot import dumps_record, load_snapshot
+
+logger = logging.getLogger('amqcsl.local.diff')
+
+type DiffKind = Literal['added', 'removed', 'changed']
+
+
+@frozen
+class FieldChange:
+    """Change of a single field between two versions of a record"""
+
+    #: Dotted path of the field, e.g. name or song.name
+    path: str
+    #: Old value
+    old: Any
+    #: New value
+    new: Any
+
+
+@frozen
+class RecordDiff[T]:
+    """Difference in a record between two collections"""
+
+    #: Whether the record was added, removed or changed
+    kind: DiffKind
+    #: Key of the record, the track id for tracks and metadata
+    key: str
+    #: Old version, None if the record was added
+    old: T | None
+    #: New version, None if the record was removed
+    new: T | None
+    #: Changed fields, empty unless the record was changed
+    changes: tuple[FieldChange, ...] = ()
+
+
+def record_digest(obj: Any) -> bytes:
+    """Hash of an object's contents, equal for equal objects
+    The record encoding doesn't depend on object identity, so shared and duplicated sub-objects hash the same
+
+    Args:
+        obj: Object from amqcsl.objects
+
+    Returns:
+        16 byte digest
+    """
+    return hashlib.blake2b(dumps_record(obj), digest_size=16).digest()
+
+
+def field_changes(old: Any, new: Any, path: str = '') -> Iterator[FieldChange]:
+    """Find the fields that differ between two versions of an object
+    Nested objects are compared field by field, lists are compared as a whole
+
+    Args:
+        old: Old version
+        new: New version
+        path: Path prefix of the fields
+
+    Yields:
+        FieldChange
+    """
+    cls = type(old)
+    if cls is not type(new) or not attrs.has(cls):
+        if old != new:
+            yield FieldChange(path, old, new)
+        return
+    for f in attrs.fields(cls):
+        old_value, new_value = getattr(old, f.name), getattr(new, f.name)
+        if old_value == new_value:
+            continue
+        field_path = f'{path}.{f.name}' if path else f.name
+        yield from field_changes(old_value, new_value, field_path)
+
+
+def diff_records[T](old: Iterable[tuple[str, T]], new: Iterable[tuple[str, T]]) -> Iterator[RecordDiff[T]]:
+    """Diff two keyed collections of records
+    The old collection is indexed by key and content hash, then the new one is streamed against it,
+    so only records whose hashes differ are compared, and only ones with differing fields count as changed.
+    Added and changed records are yielded as they're found, and removed records at the end
+
+    Args:
+        old: Iterable of (key, record)
+        new: Iterable of (key, record)
+
+    Yields:
+        RecordDiff
+    """
+    index = {key: (record_digest(obj), obj) for key, obj in old}
+    logger.info(f'Indexed {len(index)} old records')
+    for key, obj in new:
+        entry = index.pop(key, None)
+        if entry is None:
+            yield RecordDiff('added', key, None, obj)
+            continue
+        digest, old_obj = entry
+        if digest == record_digest(obj) or old_obj == obj:
+            continue
+        changes = tuple(field_changes(old_obj, obj))
+        if changes:
+            yield RecordDiff('changed', key, old_obj, obj, changes)
+    for key, (_, obj) in index.items():
+        yield RecordDiff('removed', key, obj, None)
+
+
+def diff_tracks(old: Iterable[CSLTrack], new: Iterable[CSLTrack]) -> Iterator[RecordDiff[CSLTrack]]:
+    """Diff two collections of tracks, keyed by id
+
+    Args:
+        old: Old tracks
+        new: New tracks
+
+    Yields:
+        RecordDiff
+    """
+    return diff_records(((track.id, track) for track in old), ((track.id, track) for track in new))
+
+
+def diff_metadata(
+    old: Mapping[str, CSLMetadata | None] | Iterable[tuple[str, CSLMetadata | None]],
+    new: Mapping[str, CSLMetadata | None] | Iterable[tuple[str, CSLMetadata | None]],
+) -> Iterator[RecordDiff[CSLMetadata]]:
+    """Diff two collections of metadata, keyed by track id
+    Tracks without metadata count as missing, so metadata being added or cleared shows up as added or removed
+
+    Args:
+        old: {track id: metadata} or iterable of (track id, metadata), e.g. Mirror.iter_metadata
+        new: {track id: metadata} or iterable of (track id, metadata)
+
+    Yields:
+        RecordDiff
+    """
+
+    def present(metas: Mapping[str, CSLMetadata | None] | Iterable[tuple[str, CSLMetadata | None]]):
+        items = metas.items() if isinstance(metas, Mapping) else metas
+        return ((track_id, meta) for track_id, meta in items if meta is not None)
+
+    return diff_records(present(old), present(new))
+
+
+def diff_snapshots(old_path: str | PathLike[str], new_path: str | PathLike[str]) -> Iterator[RecordDiff[Any]]:
+    """Diff two snapshot files of objects with ids, e.g. tracks saved with save_snapshot
+
+    Args:
+        old_path: Path to the old snapshot
+        new_path: Path to the new snapshot
+
+    Yields:
+        RecordDiff
+
+    Raises:
+        SnapshotError: If a snapshot is invalid or from an incompatible version
+    """
+    old = load_snapshot(old_path)
+    new = load_snapshot(new_path)
+    return diff_records(((obj.id, obj) for obj in old), ((obj.id, obj) for obj in new))
@@ -0,0 +1,500 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import sqlite3
+from collections.abc import Awaitable, Iterable, Iterator
+from os import PathLike
+from pathlib import Path
+from types import TracebackType
+from typing import Self, overload
+
+from attrs import define, field
+
+from amqcsl import AsyncDBClient, DBClient
+from amqcsl.exceptions import SnapshotError
+from amqcsl.objects._db_types import (
+    CSLArtistSample,
+    CSLGroup,
+    CSLList,
+    CSLMetadata,
+    CSLSongSample,
+    CSLTrack,
+)
+from amqcsl.objects._snapshot import dumps_record, loads_record, schema_bytes
+
+logger = logging.getLogger('amqcsl.local.mirror')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value BLOB);
+CREATE TABLE IF NOT EXISTS tracks (id TEXT PRIMARY KEY, updated_at TEXT NOT NULL, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS track_groups (
+    track_id TEXT NOT NULL,
+    group_id TEXT NOT NULL,
+    PRIMARY KEY (track_id, group_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS track_groups_group ON track_groups (group_id);
+CREATE TABLE IF NOT EXISTS songs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    disambiguation TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artists (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    original_name TEXT NOT NULL,
+    disambiguation TEXT,
+    type_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS groups (id TEXT PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lists (id TEXT PRIMARY KEY, name TEXT NOT NULL, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS list_tracks (
+    list_id TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    PRIMARY KEY (list_id, track_id)
+) WITHOUT ROWID;
+-- NULL data means the track has no metadata
+CREATE TABLE IF NOT EXISTS metadata (track_id TEXT PRIMARY KEY, data BLOB);
+"""
+
+
+@define
+class SyncResult:
+    """Summary of a mirror sync"""
+
+    #: Tracks that weren't in the mirror
+    added: list[CSLTrack] = field(factory=list[CSLTrack])
+    #: Tracks whose updatedAt changed since the last sync
+    updated: list[CSLTrack] = field(factory=list[CSLTrack])
+    #: Ids of tracks that are no longer in any synced group
+    removed: list[str] = field(factory=list[str])
+    #: Number of tracks that were unchanged, tracks in several synced groups are counted once
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> list[CSLTrack]:
+        return [*self.added, *self.updated]
+
+
+class Mirror:
+    """Local SQLite mirror of the db
+    Syncing crawls groups with a client, only fetching metadata for tracks whose updatedAt changed,
+    and the query methods return the same objects as the clients without any requests
+
+    Metadata edits that don't change a track's updatedAt aren't picked up by a normal sync,
+    sync with refresh_metadata to refetch the metadata of every crawled track
+    """
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self._check_schema()
+
+    def _check_schema(self) -> None:
+        schema = schema_bytes()
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'schema'").fetchone()
+        if row is None:
+            with self._conn:
+                self._conn.execute("INSERT INTO sync_state VALUES ('schema', ?)", (schema,))
+        elif row[0] != schema:
+            raise SnapshotError(f'Mirror {self.path} was made with an incompatible version of amqcsl.objects')
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    # --- Sync ---
+
+    @property
+    def last_sync(self) -> dt.datetime | None:
+        """Time of the last completed sync, or None if the mirror was never synced"""
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'last_sync'").fetchone()
+        return None if row is None else dt.datetime.fromisoformat(row[0])
+
+    def _store_groups(self, groups: Iterable[CSLGroup]) -> None:
+        with self._conn:
+            self._conn.execute('DELETE FROM groups')
+            self._conn.executemany('INSERT INTO groups VALUES (?, ?)', ((g.id, g.name) for g in groups))
+
+    def _store_lists(self, lists: Iterable[CSLList]) -> None:
+        with self._conn:
+            self._conn.execute('DELETE FROM lists')
+            self._conn.executemany('INSERT INTO lists VALUES (?, ?, ?)', ((li.id, li.name, li.count) for li in lists))
+            # Tracks of lists that no longer exist
+            self._conn.execute('DELETE FROM list_tracks WHERE list_id NOT IN (SELECT id FROM lists)')
+
+    def _store_list_tracks(self, csl_list: CSLList, track_ids: Iterable[str]) -> None:
+        with self._conn:
+            self._conn.execute('DELETE FROM list_tracks WHERE list_id = ?', (csl_list.id,))
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO list_tracks VALUES (?, ?)',
+                ((csl_list.id, track_id) for track_id in track_ids),
+            )
+
+    def _store_tracks(
+        self,
+        group: CSLGroup,
+        tracks: Iterable[CSLTrack],
+        result: SyncResult,
+        crawled: dict[str, CSLTrack],
+    ) -> None:
+        """Upsert the tracks of a group, removing tracks of the group that weren't seen
+        crawled holds every track crawled so far in the sync, by id, and is updated with the group's tracks
+        """
+        conn = self._conn
+        stored = dict(
+            conn.execute(
+                'SELECT t.id, t.updated_at FROM tracks t JOIN track_groups g ON g.track_id = t.id WHERE g.group_id = ?',
+                (group.id,),
+            ).fetchall()
+        )
+        seen: set[str] = set()
+        with conn:
+            for track in tracks:
+                seen.add(track.id)
+                # Tracks in several groups are only compared once per sync
+                if track.id in crawled:
+                    continue
+                crawled[track.id] = track
+                updated_at = stored.get(track.id)
+                if updated_at is None:
+                    # Might already be stored from another group
+                    row = conn.execute('SELECT updated_at FROM tracks WHERE id = ?', (track.id,)).fetchone()
+                    updated_at = None if row is None else row[0]
+                if updated_at == track.str_updated_at:
+                    result.unchanged += 1
+                    continue
+                (result.added if updated_at is None else result.updated).append(track)
+                self._write_track(track)
+            removed = stored.keys() - seen
+            for track_id in removed:
+                conn.execute('DELETE FROM track_groups WHERE track_id = ? AND group_id = ?', (track_id, group.id))
+            # Only delete tracks that aren't in any other group
+            for track_id in removed:
+                if conn.execute('SELECT 1 FROM track_groups WHERE track_id = ?', (track_id,)).fetchone() is None:
+                    self._delete_track(track_id)
+                    result.removed.append(track_id)
+
+    def _write_track(self, track: CSLTrack) -> None:
+        conn = self._conn
+        conn.execute(
+            'INSERT OR REPLACE INTO tracks VALUES (?, ?, ?)',
+            (track.id, track.str_updated_at, dumps_record(track)),
+        )
+        conn.execute('DELETE FROM track_groups WHERE track_id = ?', (track.id,))
+        conn.executemany(
+            'INSERT OR IGNORE INTO track_groups VALUES (?, ?)',
+            ((track.id, group.id) for group in track.groups),
+        )
+        if track.song is not None:
+            song = track.song
+            conn.execute(
+                'INSERT OR REPLACE INTO songs VALUES (?, ?, ?, ?)',
+                (song.id, song.name, song.disambiguation, song.str_created_at),
+            )
+        conn.executemany(
+            'INSERT OR REPLACE INTO artists VALUES (?, ?, ?, ?, ?)',
+            (
+                (a.id, a.name, a.original_name, a.disambiguation, a.type_id)
+                for a in (cred.artist for cred in track.artist_credits)
+            ),
+        )
+
+    def _delete_track(self, track_id: str) -> None:
+        conn = self._conn
+        conn.execute('DELETE FROM tracks WHERE id = ?', (track_id,))
+        conn.execute('DELETE FROM metadata WHERE track_id = ?', (track_id,))
+        conn.execute('DELETE FROM list_tracks WHERE track_id = ?', (track_id,))
+
+    def store_metadata(self, track: CSLTrack, meta: CSLMetadata | None) -> None:
+        """Store metadata of a track, e.g. after editing it
+
+        Args:
+            track: CSLTrack
+            meta: Metadata of the track, or None if it has none
+        """
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO metadata VALUES (?, ?)',
+                (track.id, None if meta is None else dumps_record(meta)),
+            )
+
+    def _missing_metadata(self) -> list[CSLTrack]:
+        """Tracks whose metadata was never fetched, e.g. from an interrupted sync"""
+        rows = self._conn.execute(
+            'SELECT data FROM tracks WHERE id NOT IN (SELECT track_id FROM metadata)',
+        ).fetchall()
+        return [loads_record(data) for (data,) in rows]
+
+    def _stale_metadata(self, result: SyncResult, crawled: dict[str, CSLTrack], refresh: bool) -> dict[str, CSLTrack]:
+        """Tracks whose metadata should be fetched, by id"""
+        if refresh:
+            stale = dict(crawled)
+        else:
+            stale = {track.id: track for track in result.changed}
+        for track in self._missing_metadata():
+            stale.setdefault(track.id, track)
+        return stale
+
+    def _finish_sync(self) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES ('last_sync', ?)",
+                (dt.datetime.now(dt.UTC).isoformat(),),
+            )
+
+    @overload
+    def sync(
+        self,
+        client: DBClient,
+        groups: Iterable[CSLGroup] | None = None,
+        *,
+        lists: bool = True,
+        metadata: bool = True,
+        refresh_metadata: bool = False,
+    ) -> SyncResult: ...
+    @overload
+    def sync(
+        self,
+        client: AsyncDBClient,
+        groups: Iterable[CSLGroup] | None = None,
+        *,
+        lists: bool = True,
+        metadata: bool = True,
+        refresh_metadata: bool = False,
+    ) -> Awaitable[SyncResult]: ...
+
+    def sync(
+        self,
+        client: DBClient | AsyncDBClient,
+        groups: Iterable[CSLGroup] | None = None,
+        *,
+        lists: bool = True,
+        metadata: bool = True,
+        refresh_metadata: bool = False,
+    ) -> SyncResult | Awaitable[SyncResult]:
+        """Sync the mirror with the db
+        Tracks are crawled per group, and metadata is only fetched for tracks that
+        are new or whose updatedAt changed since the last sync
+
+        Args:
+            client: (Async)DBClient
+            groups: Groups to crawl, defaults to every group
+            lists: Whether to sync lists and their tracks
+            metadata: Whether to fetch metadata of changed tracks
+            refresh_metadata: Whether to fetch metadata of every crawled track, for picking up
+                metadata edits that didn't change updatedAt
+
+        Returns:
+            SyncResult
+        """
+        match client:
+            case DBClient():
+                return self._sync(client, groups, lists, metadata, refresh_metadata)
+            case AsyncDBClient():
+                return self._async_sync(client, groups, lists, metadata, refresh_metadata)
+
+    def _sync(
+        self,
+        client: DBClient,
+        groups: Iterable[CSLGroup] | None,
+        lists: bool,
+        metadata: bool,
+        refresh_metadata: bool,
+    ) -> SyncResult:
+        result = SyncResult()
+        crawled: dict[str, CSLTrack] = {}
+        self._store_groups(client.groups.values())
+        for group in client.groups.values() if groups is None else groups:
+            logger.info(f'Syncing group {group.name}')
+            tracks = client.iter_tracks(groups=[group], batch_size=client.max_batch_size)
+            self._store_tracks(group, tracks, result, crawled)
+        if lists:
+            self._store_lists(client.lists.values())
+            for csl_list in client.lists.values():
+                logger.info(f'Syncing list {csl_list.name}')
+                tracks = client.iter_tracks(active_list=csl_list, batch_size=client.max_batch_size)
+                self._store_list_tracks(csl_list, (track.id for track in tracks))
+        if metadata or refresh_metadata:
+            stale = self._stale_metadata(result, crawled, refresh_metadata)
+            logger.info(f'Fetching metadata of {len(stale)} tracks')
+            for track in stale.values():
+                self.store_metadata(track, client.get_metadata(track))
+        self._finish_sync()
+        return result
+
+    async def _async_sync(
+        self,
+        client: AsyncDBClient,
+        groups: Iterable[CSLGroup] | None,
+        lists: bool,
+        metadata: bool,
+        refresh_metadata: bool,
+    ) -> SyncResult:
+        result = SyncResult()
+        crawled: dict[str, CSLTrack] = {}
+        await client.refresh_groups()
+        self._store_groups(client.groups.values())
+        for group in client.groups.values() if groups is None else groups:
+            logger.info(f'Syncing group {group.name}')
+            tracks = [track async for track in client.iter_tracks(groups=[group], batch_size=client.max_batch_size)]
+            self._store_tracks(group, tracks, result, crawled)
+        if lists:
+            await client.refresh_lists()
+            self._store_lists(client.lists.values())
+            for csl_list in client.lists.values():
+                logger.info(f'Syncing list {csl_list.name}')
+                tracks = client.iter_tracks(active_list=csl_list, batch_size=client.max_batch_size)
+                self._store_list_tracks(csl_list, [track.id async for track in tracks])
+        if metadata or refresh_metadata:
+            stale = self._stale_metadata(result, crawled, refresh_metadata)
+            logger.info(f'Fetching metadata of {len(stale)} tracks')
+            async for track, meta in client.prefetch_metadata(stale.values(), ordered=False):
+                self.store_metadata(track, meta)
+        self._finish_sync()
+        return result
+
+    # --- Queries ---
+
+    @property
+    def groups(self) -> dict[str, CSLGroup]:
+        """Dictionary of mirrored groups, indexed by name"""
+        rows = self._conn.execute('SELECT id, name FROM groups').fetchall()
+        return {name: CSLGroup(id, name) for id, name in rows}
+
+    @property
+    def lists(self) -> dict[str, CSLList]:
+        """Dictionary of mirrored lists, indexed by name"""
+        rows = self._conn.execute('SELECT id, name, count FROM lists').fetchall()
+        return {name: CSLList(id, name, count) for id, name, count in rows}
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+
+    def get_track(self, track_id: str) -> CSLTrack | None:
+        """Get a mirrored track by id
+
+        Args:
+            track_id: Id of the track
+
+        Returns:
+            CSLTrack, or None if it isn't mirrored
+        """
+        row = self._conn.execute('SELECT data FROM tracks WHERE id = ?', (track_id,)).fetchone()
+        return None if row is None else loads_record(row[0])
+
+    def iter_tracks(
+        self,
+        *,
+        groups: Iterable[CSLGroup] = (),
+        active_list: CSLList | None = None,
+    ) -> Iterator[CSLTrack]:
+        """Iterate over mirrored tracks
+
+        Args:
+            groups: Groups to restrict to, leave empty if no restriction
+            active_list: List to restrict to
+
+        Yields:
+            CSLTrack
+        """
+        query = 'SELECT data FROM tracks t'
+        conditions: list[str] = []
+        params: list[str] = []
+        group_ids = [group.id for group in groups]
+        if group_ids:
+            conditions.append(
+                f'EXISTS (SELECT 1 FROM track_groups g WHERE g.track_id = t.id '
+                f'AND g.group_id IN ({", ".join("?" * len(group_ids))}))'
+            )
+            params.extend(group_ids)
+        if active_list is not None:
+            conditions.append('EXISTS (SELECT 1 FROM list_tracks l WHERE l.track_id = t.id AND l.list_id = ?)')
+            params.append(active_list.id)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        for (data,) in self._conn.execute(query, params):
+            yield loads_record(data)
+
+    def list_track_ids(self, csl_list: CSLList) -> list[str]:
+        """Get the ids of the mirrored tracks of a list
+
+        Args:
+            csl_list: CSLList
+
+        Returns:
+            List of track ids
+        """
+        rows = self._conn.execute('SELECT track_id FROM list_tracks WHERE list_id = ?', (csl_list.id,)).fetchall()
+        return [track_id for (track_id,) in rows]
+
+    def get_metadata(self, track: CSLTrack) -> CSLMetadata | None:
+        """Get mirrored metadata of a track
+
+        Args:
+            track: CSLTrack
+
+        Returns:
+            CSLMetadata, or None if it doesn't have any metadata
+
+        Raises:
+            KeyError: If the track's metadata isn't mirrored
+        """
+        row = self._conn.execute('SELECT data FROM metadata WHERE track_id = ?', (track.id,)).fetchone()
+        if row is None:
+            raise KeyError(f'Metadata of {track.id} is not mirrored')
+        return None if row[0] is None else loads_record(row[0])
+
+    def iter_metadata(self) -> Iterator[tuple[str, CSLMetadata | None]]:
+        """Iterate over mirrored metadata
+
+        Yields:
+            (track id, CSLMetadata or None if the track doesn't have any metadata)
+        """
+        for track_id, data in self._conn.execute('SELECT track_id, data FROM metadata'):
+            yield track_id, None if data is None else loads_record(data)
+
+    def iter_songs(self) -> Iterator[CSLSongSample]:
+        """Iterate over mirrored songs
+
+        Yields:
+            CSLSongSample
+        """
+        for row in self._conn.execute('SELECT id, name, disambiguation, created_at FROM songs'):
+            yield CSLSongSample(*row)
+
+    def iter_artists(self) -> Iterator[CSLArtistSample]:
+        """Iterate over mirrored artists
+
+        Yields:
+            CSLArtistSample
+        """
+        for row in self._conn.execute('SELECT id, name, original_name, disambiguation, type_id FROM artists'):
+            yield CSLArtistSample(*row)
+
+    def get_artist(self, artist_id: str) -> CSLArtistSample | None:
+        """Get a mirrored artist by id
+
+        Args:
+            artist_id: Id of the artist
+
+        Returns:
+            CSLArtistSample, or None if it isn't mirrored
+        """
+        row = self._conn.execute(
+            'SELECT id, name, original_name, disambiguation, type_id FROM artists WHERE id = ?',
+            (artist_id,),
+        ).fetchone()
+        return None if row is None else CSLArtistSample(*row)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterable, Iterator, Mapping
+
+from amqcsl.exceptions import QueryError
+from amqcsl.objects._db_types import CSLGroup, CSLList, CSLTrack
+
+from ._mirror import Mirror
+
+logger = logging.getLogger('amqcsl.local.query')
+
+type Bitmap = int
+
+
+def _iter_bits(bitmap: Bitmap) -> Iterator[int]:
+    """Iterate over the positions of set bits in ascending order"""
+    # Walking the binary string is linear, unlike repeatedly masking off the lowest bit
+    bits = bin(bitmap)[:1:-1]
+    idx = bits.find('1')
+    while idx != -1:
+        yield idx
+        idx = bits.find('1', idx + 1)
+
+
+def _is_missing_info(track: CSLTrack) -> bool:
+    return track.name is None or track.song is None or not track.artist_credits
+
+
+def _search_text(track: CSLTrack) -> str:
+    parts = [
+        track.name,
+        track.original_name,
+        track.original_simple_artist,
+        track.album,
+        track.original_album,
+        track.str_artist_credits,
+        None if track.song is None else track.song.name,
+    ]
+    return '\n'.join(part for part in parts if part).casefold()
+
+
+class TrackQueryEngine:
+    """Evaluates /api/tracks filters over a local set of tracks
+    Group, list and quick filters are precomputed as bitmaps over track positions,
+    so a query is a few integer ANDs plus a scan for the search term, which is cached
+
+    The search term is matched case-insensitively as a substring of the track's names,
+    artists, album and song name, which approximates the server's search.
+    Missing info is approximated as a track without a name, song or artist credits.
+
+    Args:
+        tracks: Tracks to query
+        list_members: {list id: track ids} for active list filters
+        search_cache_size: Number of search term results to cache
+    """
+
+    def __init__(
+        self,
+        tracks: Iterable[CSLTrack],
+        list_members: Mapping[str, Iterable[str]] | None = None,
+        *,
+        search_cache_size: int = 256,
+    ) -> None:
+        self.tracks: list[CSLTrack] = list(tracks)
+        self._positions = {track.id: idx for idx, track in enumerate(self.tracks)}
+        self._all: Bitmap = (1 << len(self.tracks)) - 1
+
+        group_positions: defaultdict[str, list[int]] = defaultdict(list)
+        missing_audio: list[int] = []
+        missing_info: list[int] = []
+        for idx, track in enumerate(self.tracks):
+            for group in track.groups:
+                group_positions[group.id].append(idx)
+            if track.audio_id is None:
+                missing_audio.append(idx)
+            if _is_missing_info(track):
+                missing_info.append(idx)
+        self._groups = {group_id: self._to_bitmap(idxs) for group_id, idxs in group_positions.items()}
+        self._missing_audio = self._to_bitmap(missing_audio)
+        self._missing_info = self._to_bitmap(missing_info)
+        self._lists: dict[str, Bitmap] = {}
+        for list_id, track_ids in (list_members or {}).items():
+            self.set_list_members(list_id, track_ids)
+
+        self._search_texts: list[str] | None = None
+        self._search_cache: OrderedDict[str, Bitmap] = OrderedDict()
+        self._search_cache_size = search_cache_size
+
+    @classmethod
+    def from_mirror(cls, mirror: Mirror) -> TrackQueryEngine:
+        """Build an engine from every track and list in a mirror
+
+        Args:
+            mirror: Mirror
+
+        Returns:
+            TrackQueryEngine
+        """
+        list_members = {csl_list.id: mirror.list_track_ids(csl_list) for csl_list in mirror.lists.values()}
+        return cls(mirror.iter_tracks(), list_members)
+
+    @staticmethod
+    def _to_bitmap(positions: Iterable[int]) -> Bitmap:
+        # Building from a bytearray is much cheaper than OR-ing in one bit at a time
+        positions = list(positions)
+        if not positions:
+            return 0
+        buf = bytearray(max(positions) // 8 + 1)
+        for idx in positions:
+            buf[idx >> 3] |= 1 << (idx & 7)
+        return int.from_bytes(buf, 'little')
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def set_list_members(self, list_id: str, track_ids: Iterable[str]) -> None:
+        """Set the tracks of a list, tracks that aren't in the engine are ignored
+
+        Args:
+            list_id: Id of the list
+            track_ids: Ids of the tracks in the list
+        """
+        positions = self._positions
+        self._lists[list_id] = self._to_bitmap(positions[track_id] for track_id in track_ids if track_id in positions)
+
+    def _search(self, search_term: str) -> Bitmap:
+        term = search_term.casefold().strip()
+        if not term:
+            return self._all
+        cache = self._search_cache
+        bitmap = cache.get(term)
+        if bitmap is not None:
+            cache.move_to_end(term)
+            return bitmap
+        if self._search_texts is None:
+            self._search_texts = [_search_text(track) for track in self.tracks]
+        bitmap = self._to_bitmap(idx for idx, text in enumerate(self._search_texts) if term in text)
+        cache[term] = bitmap
+        if len(cache) > self._search_cache_size:
+            cache.popitem(last=False)
+        return bitmap
+
+    def _bitmap(
+        self,
+        search_term: str,
+        groups: Iterable[CSLGroup],
+        active_list: CSLList | None,
+        missing_audio: bool,
+        missing_info: bool,
+        from_active_list: bool | None,
+    ) -> Bitmap:
+        bitmap = self._all
+        group_ids = [group.id for group in groups]
+        if group_ids:
+            group_bitmap = 0
+            for group_id in group_ids:
+                group_bitmap |= self._groups.get(group_id, 0)
+            bitmap &= group_bitmap
+        if from_active_list is None:
+            from_active_list = active_list is not None
+        if from_active_list:
+            if active_list is None:
+                raise QueryError('from_active_list requires an active_list')
+            list_bitmap = self._lists.get(active_list.id)
+            if list_bitmap is None:
+                raise QueryError(f'Members of list {active_list.name} are not known to the engine')
+            bitmap &= list_bitmap
+        if missing_audio:
+            bitmap &= self._missing_audio
+        if missing_info:
+            bitmap &= self._missing_info
+        if bitmap and search_term:
+            bitmap &= self._search(search_term)
+        return bitmap
+
+    def iter_tracks(
+        self,
+        search_term: str = '',
+        *,
+        groups: Iterable[CSLGroup] = (),
+        active_list: CSLList | None = None,
+        missing_audio: bool = False,
+        missing_info: bool = False,
+        from_active_list: bool | None = None,
+        batch_size: int = 50,
+    ) -> Iterator[CSLTrack]:
+        """Iterate over tracks matching search parameters, same as DBClient.iter_tracks
+
+        Args:
+            search_term: Search term
+            groups: List of groups to restrict to, leave empty if no restriction
+            active_list: List to restrict search by
+            missing_audio: Restrict to songs without audio
+            missing_info: Restrict to songs missing info
+            from_active_list: Restrict to songs from active list, defaults to True if active_list is given and False otherwise
+            batch_size: Unused, for compatibility with DBClient.iter_tracks
+
+        Yields:
+            CSLTrack
+
+        Raises:
+            QueryError: If the members of the active list aren't known
+        """
+        bitmap = self._bitmap(search_term, groups, active_list, missing_audio, missing_info, from_active_list)
+        tracks = self.tracks
+        for idx in _iter_bits(bitmap):
+            yield tracks[idx]
+
+    def count(
+        self,
+        search_term: str = '',
+        *,
+        groups: Iterable[CSLGroup] = (),
+        active_list: CSLList | None = None,
+        missing_audio: bool = False,
+        missing_info: bool = False,
+        from_active_list: bool | None = None,
+    ) -> int:
+        """Count tracks matching search parameters, see iter_tracks
+
+        Returns:
+            Number of matching tracks
+        """
+        bitmap = self._bitmap(search_term, groups, active_list, missing_audio, missing_info, from_active_list)
+        return bitmap.bit_count()
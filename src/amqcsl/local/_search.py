@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from attrs import frozen
+
+from amqcsl.objects._db_types import CSLArtistSample, CSLSong, CSLSongSample, CSLTrack
+
+from ._mirror import Mirror
+
+logger = logging.getLogger('amqcsl.local.search')
+
+type Indexable = CSLArtistSample | CSLSongSample | CSLTrack
+
+_TOKEN = re.compile(r'\w+')
+# Katakana to hiragana, so either script matches the other
+_KANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)} | {0x30FD: 0x309D, 0x30FE: 0x309E}
+# Combining diacritical marks, kana voicing marks are in a different block so they are kept
+_DIACRITICS = re.compile('[\u0300-\u036f]')
+
+# Weights of the fields a match can come from, so name matches outrank credit matches
+_FIELD_WEIGHTS = {
+    'name': 1.0,
+    'original_name': 1.0,
+    'disambiguation': 0.7,
+    'credit': 0.8,
+    'song': 0.8,
+}
+
+
+def normalize_name(text: str) -> str:
+    """Normalize a name for matching
+    Folds width (NFKC), case, katakana into hiragana and latin diacritics
+
+    Args:
+        text: Name to normalize
+
+    Returns:
+        Normalized name
+    """
+    text = unicodedata.normalize('NFKC', text).casefold().translate(_KANA)
+    if not text.isascii():
+        text = unicodedata.normalize('NFC', _DIACRITICS.sub('', unicodedata.normalize('NFD', text)))
+    return text
+
+
+def tokenize_name(text: str) -> list[str]:
+    """Split a name into normalized tokens, dropping punctuation
+
+    Args:
+        text: Name to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return _TOKEN.findall(normalize_name(text))
+
+
+@frozen
+class NameMatch[T]:
+    """Result of a NameIndex search"""
+
+    #: Matched object
+    obj: T
+    #: Match quality in (0, 1], higher is better
+    score: float
+    #: Field the best match came from, e.g. name, original_name or credit
+    field: str
+
+
+@frozen
+class _Field:
+    name: str
+    text: str
+    tokens: frozenset[str]
+    weight: float
+
+
+def _fields(obj: Indexable) -> Iterator[tuple[str, str | None]]:
+    match obj:
+        case CSLArtistSample(name=name, original_name=original_name, disambiguation=disambiguation):
+            yield 'name', name
+            yield 'original_name', original_name
+            yield 'disambiguation', disambiguation
+        case CSLTrack(name=name, original_name=original_name, artist_credits=credits, song=song):
+            yield 'name', name
+            yield 'original_name', original_name
+            for credit in credits:
+                yield 'credit', credit.name
+                yield 'credit', credit.artist.name
+                yield 'credit', credit.artist.original_name
+            if song is not None:
+                yield 'song', song.name
+        case CSLSongSample(name=name, disambiguation=disambiguation):
+            yield 'name', name
+            yield 'disambiguation', disambiguation
+            if isinstance(obj, CSLSong):
+                for credit in obj.artist_credits:
+                    yield 'credit', credit.artist.name
+                    yield 'credit', credit.artist.original_name
+        case _:
+            raise TypeError(f'Cannot index object of type {type(obj).__name__}')
+
+
+def _kind(obj: Indexable) -> type:
+    match obj:
+        case CSLArtistSample():
+            return CSLArtistSample
+        case CSLTrack():
+            return CSLTrack
+        case _:
+            return CSLSongSample
+
+
+class NameIndex:
+    """Inverted index over the names of artists, songs and tracks, for resolving names locally
+    Indexes names, original names, disambiguations and credit names, normalized with normalize_name
+
+    Every query token has to match a token of the object, either exactly or as a prefix,
+    so 'sunny pea' finds Sunny Peace and 'ぱじゃぱ' finds ぱじゃパ!.
+    Tokens are split on whitespace and punctuation, so names without spaces,
+    which includes most Japanese names, only match by prefix.
+    """
+
+    def __init__(self, objs: Iterable[Indexable] = ()) -> None:
+        self._objs: list[Indexable] = []
+        self._fields: list[tuple[_Field, ...]] = []
+        self._keys: dict[tuple[type, str], int] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._sorted_tokens: list[str] | None = None
+        self.update(objs)
+
+    @classmethod
+    def from_objects(cls, objs: Iterable[Indexable]) -> NameIndex:
+        """Build an index from crawled objects, including the artists and songs of tracks
+
+        Args:
+            objs: Artists, songs and tracks
+
+        Returns:
+            NameIndex
+        """
+        index = cls()
+        for obj in objs:
+            index.add(obj)
+            if isinstance(obj, CSLTrack):
+                for credit in obj.artist_credits:
+                    index.add(credit.artist)
+                if obj.song is not None:
+                    index.add(obj.song)
+        return index
+
+    @classmethod
+    def from_mirror(cls, mirror: Mirror) -> NameIndex:
+        """Build an index from every artist, song and track in a mirror
+
+        Args:
+            mirror: Mirror
+
+        Returns:
+            NameIndex
+        """
+        index = cls(mirror.iter_artists())
+        index.update(mirror.iter_songs())
+        index.update(mirror.iter_tracks())
+        return index
+
+    def __len__(self) -> int:
+        return len(self._objs)
+
+    def __contains__(self, obj: object) -> bool:
+        match obj:
+            case CSLArtistSample() | CSLSongSample() | CSLTrack():
+                return (_kind(obj), obj.id) in self._keys
+            case _:
+                return False
+
+    def add(self, obj: Indexable) -> bool:
+        """Add an object to the index, objects already in the index are skipped
+
+        Args:
+            obj: Artist, song or track
+
+        Returns:
+            Whether the object was added
+
+        Raises:
+            TypeError: If the object can't be indexed
+        """
+        key = (_kind(obj), obj.id)
+        if key in self._keys:
+            return False
+        fields = tuple(
+            _Field(name, normalize_name(text), frozenset(tokenize_name(text)), _FIELD_WEIGHTS[name])
+            for name, text in _fields(obj)
+            if text
+        )
+        idx = len(self._objs)
+        self._keys[key] = idx
+        self._objs.append(obj)
+        self._fields.append(fields)
+        postings = self._postings
+        for field in fields:
+            for token in field.tokens:
+                entry = postings.get(token)
+                if entry is None:
+                    postings[token] = {idx}
+                    self._sorted_tokens = None
+                else:
+                    entry.add(idx)
+        return True
+
+    def update(self, objs: Iterable[Indexable]) -> None:
+        """Add several objects to the index
+
+        Args:
+            objs: Artists, songs and tracks
+        """
+        for obj in objs:
+            self.add(obj)
+
+    def _token_matches(self, token: str, prefix: bool) -> set[int]:
+        """Positions of objects with a token equal to, or starting with, token"""
+        matches = set(self._postings.get(token, ()))
+        if not prefix:
+            return matches
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        tokens = self._sorted_tokens
+        i = bisect_left(tokens, token)
+        if i < len(tokens) and tokens[i] == token:
+            i += 1
+        while i < len(tokens) and tokens[i].startswith(token):
+            matches.update(self._postings[tokens[i]])
+            i += 1
+        return matches
+
+    @staticmethod
+    def _score(query: str, query_tokens: list[str], fields: tuple[_Field, ...]) -> tuple[float, str]:
+        best, best_field = 0.0, fields[0].name
+        for field in fields:
+            if field.text == query:
+                score = 1.0
+            elif field.text.startswith(query):
+                score = 0.9
+            else:
+                quality = 0
+                for token in query_tokens:
+                    if token in field.tokens:
+                        quality += 2
+                    elif any(t.startswith(token) for t in field.tokens):
+                        quality += 1
+                score = 0.8 * quality / (2 * len(query_tokens))
+            score *= field.weight
+            if score > best:
+                best, best_field = score, field.name
+        return best, best_field
+
+    def search(
+        self,
+        query: str,
+        *,
+        kind: type | tuple[type, ...] | None = None,
+        prefix: bool = True,
+        limit: int | None = None,
+    ) -> list[NameMatch[Any]]:
+        """Search the index, ranking candidates by match quality
+        Exact matches of a whole field rank first, then prefix matches of a field,
+        then matches by token, and ties are kept in insertion order
+
+        Args:
+            query: Name to search for
+            kind: Only return instances of this type, e.g. CSLArtistSample
+            prefix: Whether query tokens also match as prefixes of tokens
+            limit: Maximum number of results
+
+        Returns:
+            List of NameMatch, best first
+        """
+        query_tokens = list(dict.fromkeys(tokenize_name(query)))
+        if not query_tokens:
+            return []
+        # Rarest tokens first, so the candidate set shrinks as fast as possible
+        token_matches = sorted((self._token_matches(token, prefix) for token in query_tokens), key=len)
+        candidates = token_matches[0]
+        for matches in token_matches[1:]:
+            candidates.intersection_update(matches)
+            if not candidates:
+                return []
+
+        normalized = normalize_name(query).strip()
+        results: list[tuple[float, int, str]] = []
+        for idx in candidates:
+            if kind is not None and not isinstance(self._objs[idx], kind):
+                continue
+            score, field = self._score(normalized, query_tokens, self._fields[idx])
+            results.append((score, idx, field))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        if limit is not None:
+            results = results[:limit]
+        return [NameMatch(self._objs[idx], score, field) for score, idx, field in results]
+
+    def search_artists(self, query: str, *, limit: int | None = None) -> list[CSLArtistSample]:
+        """Search for artists, local counterpart of DBClient.iter_artists
+
+        Args:
+            query: Name to search for
+            limit: Maximum number of results
+
+        Returns:
+            List of artists, best match first
+        """
+        return [match.obj for match in self.search(query, kind=CSLArtistSample, limit=limit)]
+
+    def search_songs(self, query: str, *, limit: int | None = None) -> list[CSLSongSample]:
+        """Search for songs, local counterpart of DBClient.iter_songs
+
+        Args:
+            query: Name to search for
+            limit: Maximum number of results
+
+        Returns:
+            List of songs, best match first
+        """
+        return [match.obj for match in self.search(query, kind=CSLSongSample, limit=limit)]
+
+    def search_tracks(self, query: str, *, limit: int | None = None) -> list[CSLTrack]:
+        """Search for tracks by name or credits
+
+        Args:
+            query: Name to search for
+            limit: Maximum number of results
+
+        Returns:
+            List of tracks, best match first
+        """
+        return [match.obj for match in self.search(query, kind=CSLTrack, limit=limit)]
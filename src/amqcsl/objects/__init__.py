@@ -20,6 +20,8 @@ from ._db_types import (
     TrackPutArtistCredit,
 )
 from ._obj_consts import TrackType
+from ._snapshot import dumps_snapshot, load_snapshot, loads_snapshot, save_snapshot
+from ._store import TrackStore, write_track_store
 
 __all__ = [
     'AlbumTrack',
@@ -41,5 +43,11 @@ __all__ = [
     'Metadata',
     'NewSong',
     'TrackPutArtistCredit',
+    'TrackStore',
     'TrackType',
+    'dumps_snapshot',
+    'load_snapshot',
+    'loads_snapshot',
+    'save_snapshot',
+    'write_track_store',
 ]
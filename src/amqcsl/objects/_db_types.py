@@ -1,5 +1,6 @@
 import datetime as dt
 import logging
+from functools import cached_property
 from operator import attrgetter
 from typing import cast, override
 import rich.repr
@@ -20,6 +21,17 @@ from ._obj_consts import ARTIST_TYPE, EXTRA_METADATA_TYPE, SONG_RELATION_TYPE, T
 
 logger = logging.getLogger('amqcsl.object')
 
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.UTC)
+_MICROSECOND = dt.timedelta(microseconds=1)
+
+
+def _to_timestamp(value: dt.datetime) -> int:
+    """Convert a datetime into integer microseconds since the epoch, treating naive datetimes as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt.UTC)
+    return (value - _EPOCH) // _MICROSECOND
+
+
 # --- DB Mirrors ---
 
 
@@ -30,10 +42,15 @@ class CSLSongSample:
     disambiguation: str | None
     str_created_at: str
 
-    @property
+    @cached_property
     def created_at(self) -> dt.datetime:
         return dt.datetime.fromisoformat(self.str_created_at)
 
+    @cached_property
+    def created_timestamp(self) -> int:
+        """created_at as microseconds since the epoch, for cheap comparisons"""
+        return _to_timestamp(self.created_at)
+
     @classmethod
     def from_json(cls, data: JSONType):
         match data:
@@ -392,19 +409,29 @@ class CSLTrack:
     def type(self) -> TrackType:
         return TRACK_TYPE[self.type_id]
 
-    @property
+    @cached_property
     def created_at(self) -> dt.datetime:
         return dt.datetime.fromisoformat(self.str_created_at)
 
-    @property
+    @cached_property
     def updated_at(self) -> dt.datetime:
         return dt.datetime.fromisoformat(self.str_updated_at)
 
-    @property
+    @cached_property
+    def created_timestamp(self) -> int:
+        """created_at as microseconds since the epoch, for cheap comparisons"""
+        return _to_timestamp(self.created_at)
+
+    @cached_property
+    def updated_timestamp(self) -> int:
+        """updated_at as microseconds since the epoch, for cheap comparisons"""
+        return _to_timestamp(self.updated_at)
+
+    @cached_property
     def str_artist_credits(self) -> str:
         return ''.join([f'{credit.name}{credit.join_phrase}' for credit in self.artist_credits])
 
-    @property
+    @cached_property
     def simp(self) -> SimpleCSLTrack:
         return SimpleCSLTrack(self.id, self.name, self.original_simple_artist)
 
@@ -0,0 +1,477 @@
+import gc
+import json
+import logging
+import struct
+from collections.abc import Callable, Iterable
+from operator import attrgetter
+from os import PathLike
+from typing import Any, get_args
+
+from attrs import fields
+
+from amqcsl.exceptions import SnapshotError
+
+from ._db_types import (
+    AlbumTrack,
+    ArtistCredit,
+    CSLArtist,
+    CSLArtistSample,
+    CSLExtraMetadata,
+    CSLGroup,
+    CSLList,
+    CSLMetadata,
+    CSLSong,
+    CSLSongArtistCredit,
+    CSLSongRelation,
+    CSLSongSample,
+    CSLTrack,
+    CSLTrackArtistCredit,
+    CSLTrackLink,
+    ExtraMetadata,
+    NewSong,
+    SimpleCSLTrack,
+    TrackPutArtistCredit,
+)
+
+logger = logging.getLogger('amqcsl.object')
+
+# Snapshot layout:
+#   MAGIC | version (u16) | schema | scalar pool | row counts | tables | roots
+# schema is JSON of [class name, field names] for every class code, so snapshots
+# from an older layout of the objects fail loudly instead of building garbage objects.
+# Every scalar (None, bools, ints, floats and strings) is stored once in the pool,
+# and every object is a row in the table of its class, stored as one column per field.
+# Columns are little endian u32 arrays of pool indices, object ids (0 for None),
+# or offsets into a column of list items, so nothing in a snapshot depends on the interpreter that wrote it.
+# Classes only hold classes with lower codes, so tables are decoded in code order with one map over
+# the columns of each table, which keeps most of the work in struct and builtins instead of per value code
+MAGIC = b'AMQCSLSNAP'
+VERSION = 3
+_HEADER = struct.Struct(f'<{len(MAGIC)}sH')
+_U32 = struct.Struct('<I')
+# Number of strings, ints and floats, and the length of the utf-8 string data
+_POOL_HEADER = struct.Struct('<4I')
+
+# Column kinds
+_SCALAR = 0
+_OBJECT = 1
+_LIST = 2
+
+# Scalars at the start of every pool, strings, ints and floats follow them
+_CONSTANTS = (None, False, True)
+
+# Records are stored individually as JSON arrays [class code, *field values], see dumps_record
+RECORD_VERSION = 2
+
+# Append only, codes are indices into this tuple
+_CLASSES: tuple[type, ...] = (
+    CSLSongSample,
+    CSLArtistSample,
+    CSLExtraMetadata,
+    CSLSongArtistCredit,
+    CSLSongRelation,
+    CSLTrackArtistCredit,
+    CSLTrackLink,
+    CSLList,
+    CSLGroup,
+    CSLArtist,
+    CSLSong,
+    SimpleCSLTrack,
+    CSLTrack,
+    CSLMetadata,
+    ArtistCredit,
+    ExtraMetadata,
+    NewSong,
+    TrackPutArtistCredit,
+    AlbumTrack,
+)
+_CODES = {cls: code for code, cls in enumerate(_CLASSES)}
+# Objects shared between many records, stored once and shared on load
+_INTERNED = frozenset({CSLArtistSample, CSLGroup, CSLSongSample})
+
+
+def _schema() -> list[list[Any]]:
+    return [[cls.__name__, [f.name for f in fields(cls)]] for cls in _CLASSES]
+
+
+def _nested_classes(tp: Any) -> set[type]:
+    """Snapshotted classes that values of a field type may contain"""
+    rtn: set[type] = {tp} if tp in _CODES else set()
+    for arg in get_args(tp):
+        rtn |= _nested_classes(arg)
+    return rtn
+
+
+# Positions of fields that may hold objects, plain fields are passed through as is
+_NESTED_FIELDS = tuple(tuple(i for i, f in enumerate(fields(cls)) if _nested_classes(f.type)) for cls in _CLASSES)
+if any(
+    _CODES[nested] >= code
+    for code, cls in enumerate(_CLASSES)
+    for f in fields(cls)
+    for nested in _nested_classes(f.type)
+):
+    raise RuntimeError('Snapshotted classes may only hold classes listed before them')
+
+
+def _field_getter(cls: type) -> Callable[[Any], tuple[Any, ...]]:
+    names = [f.name for f in fields(cls)]
+    if len(names) == 1:
+        getter = attrgetter(names[0])
+        return lambda value: (getter(value),)
+    return attrgetter(*names)
+
+
+# Getters of all field values as a tuple, indexed by class code
+_GETTERS = tuple(_field_getter(cls) for cls in _CLASSES)
+
+
+# --- Snapshots ---
+
+# While writing, objects in field values are replaced by (class code, row), since tuples never appear otherwise
+type _Column = tuple[int, Any]
+
+
+def _pack_u32(values: list[int]) -> bytes:
+    return struct.pack(f'<{len(values)}I', *values)
+
+
+class _SnapshotWriter:
+    def __init__(self) -> None:
+        self.rows: list[list[list[Any]]] = [[] for _ in _CLASSES]
+        self.interned: dict[Any, tuple[int, int]] = {}
+        self.strs: dict[str, int] = {}
+        self.ints: dict[int, int] = {}
+        # Keyed by float.hex, so -0.0 and nan round trip
+        self.floats: dict[str, int] = {}
+
+    def add(self, value: Any) -> Any:
+        """Add the objects in a value as rows, replacing them with (class code, row)"""
+        cls = type(value)
+        code = _CODES.get(cls)
+        if code is None:
+            if cls is list:
+                return [self.add(item) for item in value]
+            return value
+        interned = cls in _INTERNED
+        if interned:
+            ref = self.interned.get(value)
+            if ref is not None:
+                return ref
+        row = list(_GETTERS[code](value))
+        for i in _NESTED_FIELDS[code]:
+            if row[i] is not None:
+                row[i] = self.add(row[i])
+        rows = self.rows[code]
+        ref = code, len(rows)
+        rows.append(row)
+        if interned:
+            self.interned[value] = ref
+        return ref
+
+    def column(self, values: list[Any]) -> _Column:
+        """Classify the values of a column, adding its scalars to the pool"""
+        kinds = {type(value) for value in values} - {type(None)}
+        if kinds == {list}:
+            offsets = [0]
+            items: list[Any] = []
+            for value in values:
+                items += value
+                offsets.append(len(items))
+            return _LIST, (offsets, self.column(items))
+        elif kinds == {tuple}:
+            return _OBJECT, values
+        for value in values:
+            match value:
+                case str():
+                    self.strs.setdefault(value, len(self.strs))
+                case bool() | None:
+                    pass
+                case int():
+                    self.ints.setdefault(value, len(self.ints))
+                case float():
+                    self.floats.setdefault(value.hex(), len(self.floats))
+                case _:
+                    raise SnapshotError(f'Cannot snapshot value of type {type(value).__name__}')
+        return _SCALAR, values
+
+    def dumps(self, roots: list[Any]) -> bytes:
+        tables = [[self.column(list(column)) for column in zip(*rows)] for rows in self.rows]
+        root_column = self.column(roots)
+
+        counts = [len(rows) for rows in self.rows]
+        bases = [1 + sum(counts[:code]) for code in range(len(counts))]
+        strs, ints, floats = self.strs, self.ints, self.floats
+        str_base = len(_CONSTANTS)
+        int_base = str_base + len(strs)
+        float_base = int_base + len(ints)
+
+        def scalar_index(value: Any) -> int:
+            if type(value) is str:
+                return str_base + strs[value]
+            elif value is None:
+                return 0
+            elif type(value) is bool:
+                return 2 if value else 1
+            elif type(value) is int:
+                return int_base + ints[value]
+            return float_base + floats[value.hex()]
+
+        out: list[bytes] = []
+
+        def write(column: _Column) -> None:
+            kind, payload = column
+            out.append(bytes((kind,)))
+            if kind == _SCALAR:
+                out.append(_pack_u32([scalar_index(value) for value in payload]))
+            elif kind == _OBJECT:
+                out.append(_pack_u32([0 if ref is None else bases[ref[0]] + ref[1] for ref in payload]))
+            else:
+                offsets, items = payload
+                out.append(_pack_u32(offsets))
+                write(items)
+
+        text = ''.join(strs).encode('utf-8', 'surrogatepass')
+        try:
+            ints_data = struct.pack(f'<{len(ints)}q', *ints)
+        except struct.error as e:
+            raise SnapshotError(f'Cannot snapshot int: {e}') from e
+        out += [
+            _POOL_HEADER.pack(len(strs), len(ints), len(floats), len(text)),
+            _pack_u32([len(value) for value in strs]),
+            text,
+            ints_data,
+            struct.pack(f'<{len(floats)}d', *map(float.fromhex, floats)),
+            _pack_u32(counts),
+        ]
+        for table in tables:
+            for column in table:
+                write(column)
+        out.append(_U32.pack(len(roots)))
+        write(root_column)
+        schema = _dumps(_schema())
+        return b''.join([_HEADER.pack(MAGIC, VERSION), _U32.pack(len(schema)), schema, *out])
+
+
+class _SnapshotReader:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = _HEADER.size
+
+    def take(self, size: int) -> bytes:
+        end = self.pos + size
+        if end > len(self.data):
+            raise SnapshotError('Snapshot is corrupted')
+        value = self.data[self.pos : end]
+        self.pos = end
+        return value
+
+    def unpack(self, fmt: str, count: int, size: int) -> tuple[Any, ...]:
+        return struct.unpack(f'<{count}{fmt}', self.take(count * size))
+
+    def pool(self) -> list[Any]:
+        num_strs, num_ints, num_floats, text_size = struct.unpack(_POOL_HEADER.format, self.take(_POOL_HEADER.size))
+        lengths = self.unpack('I', num_strs, 4)
+        text = self.take(text_size).decode('utf-8', 'surrogatepass')
+        pool = list(_CONSTANTS)
+        start = 0
+        for length in lengths:
+            end = start + length
+            pool.append(text[start:end])
+            start = end
+        pool += self.unpack('q', num_ints, 8)
+        pool += self.unpack('d', num_floats, 8)
+        return pool
+
+    def column(self, count: int, pool: list[Any], objects: list[Any]) -> list[Any]:
+        (kind,) = self.take(1)
+        if kind == _SCALAR:
+            return list(map(pool.__getitem__, self.unpack('I', count, 4)))
+        elif kind == _OBJECT:
+            return list(map(objects.__getitem__, self.unpack('I', count, 4)))
+        elif kind == _LIST:
+            offsets = self.unpack('I', count + 1, 4)
+            items = self.column(offsets[-1], pool, objects)
+            return [items[start:end] for start, end in zip(offsets, offsets[1:])]
+        raise SnapshotError('Snapshot is corrupted')
+
+
+def dumps_snapshot(objs: Iterable[Any]) -> bytes:
+    """Serialize objects into the snapshot format
+
+    Args:
+        objs: Iterable of objects from amqcsl.objects
+
+    Returns:
+        Snapshot bytes
+
+    Raises:
+        SnapshotError: If an object can't be snapshotted
+    """
+    writer = _SnapshotWriter()
+    roots = [writer.add(obj) for obj in objs]
+    return writer.dumps(roots)
+
+
+def loads_snapshot(data: bytes) -> list[Any]:
+    """Deserialize objects from the snapshot format, skipping from_json validation
+
+    Args:
+        data: Snapshot bytes, from dumps_snapshot
+
+    Returns:
+        List of objects, in the order they were saved
+
+    Raises:
+        SnapshotError: If the snapshot is invalid or from an incompatible version
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError('Snapshot is too short')
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError('Not an amqcsl snapshot')
+    if version != VERSION:
+        raise SnapshotError(f'Snapshot version {version} is not supported, expected {VERSION}')
+    reader = _SnapshotReader(data)
+    # Decoding allocates many objects and no cycles, so skip the gc passes it would trigger
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        (schema_size,) = _U32.unpack(reader.take(_U32.size))
+        schema = json.loads(reader.take(schema_size))
+        if schema != _schema()[: len(schema)]:
+            raise SnapshotError('Snapshot was saved with an incompatible version of amqcsl.objects')
+        pool = reader.pool()
+        counts = reader.unpack('I', len(schema), 4)
+        objects: list[Any] = [None]
+        for code, count in enumerate(counts):
+            if not count:
+                continue
+            cls = _CLASSES[code]
+            columns = [reader.column(count, pool, objects) for _ in fields(cls)]
+            objects += map(cls, *columns)
+        (num_roots,) = _U32.unpack(reader.take(_U32.size))
+        return reader.column(num_roots, pool, objects)
+    except (ValueError, IndexError, struct.error) as e:
+        raise SnapshotError('Snapshot is corrupted') from e
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+# --- Records ---
+
+
+def _encode_record(value: Any) -> Any:
+    cls = type(value)
+    code = _CODES.get(cls)
+    if code is None:
+        match value:
+            case None | bool() | int() | float() | str():
+                return value
+            case list():
+                return [_encode_record(item) for item in value]  # type: ignore[reportUnknownVariableType]
+            case _:
+                raise SnapshotError(f'Cannot snapshot object of type {cls.__name__}')
+    encoded = [code, *_GETTERS[code](value)]
+    for i in _NESTED_FIELDS[code]:
+        if encoded[i + 1] is not None:
+            encoded[i + 1] = _encode_record(encoded[i + 1])
+    return encoded
+
+
+def _decode_record(value: list[Any]) -> Any:
+    # Objects are lists starting with their code, so a nested field holding a list of objects
+    # is either empty or starts with a list
+    code = value[0]
+    args = value[1:]
+    for i in _NESTED_FIELDS[code]:
+        item = args[i]
+        if item is None:
+            continue
+        elif not item or type(item[0]) is list:
+            args[i] = [_decode_record(v) for v in item]
+        else:
+            args[i] = _decode_record(item)
+    return _CLASSES[code](*args)
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False, check_circular=False)
+
+
+def _dumps(value: Any) -> bytes:
+    try:
+        return _ENCODER.encode(value).encode('utf-8')
+    except (ValueError, TypeError) as e:
+        raise SnapshotError(f'Cannot snapshot value: {e}') from e
+
+
+def schema_bytes() -> bytes:
+    """Schema of the record format, for stores of individual records to check against"""
+    return _dumps([RECORD_VERSION, _schema()])
+
+
+def dumps_record(obj: Any) -> bytes:
+    """Serialize a single object as a JSON array, for storing records individually
+    Equal objects give equal bytes however they share their sub-objects
+
+    Args:
+        obj: Object from amqcsl.objects
+
+    Returns:
+        Record bytes
+
+    Raises:
+        SnapshotError: If the object can't be snapshotted
+    """
+    return _dumps(_encode_record(obj))
+
+
+def loads_record(data: bytes) -> Any:
+    """Deserialize a single object from dumps_record
+
+    Args:
+        data: Record bytes
+
+    Returns:
+        Object from amqcsl.objects
+
+    Raises:
+        SnapshotError: If the record is corrupted
+    """
+    try:
+        return _decode_record(json.loads(data))
+    except (ValueError, TypeError, IndexError) as e:
+        raise SnapshotError('Record is corrupted') from e
+
+
+def save_snapshot(path: str | PathLike[str], objs: Iterable[Any]) -> None:
+    """Save objects to a snapshot file
+
+    Args:
+        path: Path to the snapshot file
+        objs: Iterable of objects from amqcsl.objects
+
+    Raises:
+        SnapshotError: If an object can't be snapshotted
+    """
+    data = dumps_snapshot(objs)
+    logger.info(f'Writing {len(data)} byte snapshot to {path}')
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def load_snapshot(path: str | PathLike[str]) -> list[Any]:
+    """Load objects from a snapshot file
+
+    Args:
+        path: Path to the snapshot file
+
+    Returns:
+        List of objects, in the order they were saved
+
+    Raises:
+        SnapshotError: If the snapshot is invalid or from an incompatible version
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    return loads_snapshot(data)
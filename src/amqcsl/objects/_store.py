@@ -0,0 +1,485 @@
+import logging
+import mmap
+import struct
+import zlib
+from collections.abc import Iterable, Iterator
+from os import PathLike
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+
+from amqcsl.exceptions import SnapshotError
+
+from ._db_types import CSLArtistSample, CSLGroup, CSLSongSample, CSLTrack, CSLTrackArtistCredit
+
+logger = logging.getLogger('amqcsl.object')
+
+# Store layout:
+#   header | tracks | artists | songs | groups | credits | track groups | 3 id indices | string heap
+# Every region other than the heap is an array of fixed size records, so record i of a region
+# is at offset + i * size. Strings are (offset, length) pairs into the heap, with NULL_LEN for None.
+# The id indices are open addressing hash tables (crc32, linear probing) of record index + 1,
+# with 0 marking an empty slot.
+MAGIC = b'AMQCSLSTOR'
+VERSION = 1
+
+NULL_IDX = 0xFFFFFFFF
+NULL_LEN = 0xFFFFFFFF
+NULL_INT = -(2**31)
+
+_HEADER = struct.Struct(f'<{len(MAGIC)}sH6I10Q')
+_TRACK = struct.Struct('<12I5iI4I4I2?i4I')
+_ARTIST = struct.Struct('<8Ii')
+_SONG = struct.Struct('<8I')
+_GROUP = struct.Struct('<4I')
+_CREDIT = struct.Struct('<I4Ii')
+_TRACK_GROUP = struct.Struct('<I')
+_SLOT = struct.Struct('<I')
+
+
+def _hash_id(id: str) -> int:
+    return zlib.crc32(id.encode('utf-8'))
+
+
+def _table_size(count: int) -> int:
+    size = 8
+    while size < 2 * count:
+        size *= 2
+    return size
+
+
+class _Heap:
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.offsets: dict[str, tuple[int, int]] = {}
+
+    def add(self, value: str | None) -> tuple[int, int]:
+        if value is None:
+            return 0, NULL_LEN
+        ref = self.offsets.get(value)
+        if ref is None:
+            encoded = value.encode('utf-8')
+            ref = len(self.data), len(encoded)
+            self.data += encoded
+            self.offsets[value] = ref
+        return ref
+
+
+def _build_index(ids: list[str]) -> bytes:
+    size = _table_size(len(ids))
+    slots = [0] * size
+    mask = size - 1
+    for idx, id in enumerate(ids):
+        slot = _hash_id(id) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = idx + 1
+    return struct.pack(f'<{size}I', *slots)
+
+
+def write_track_store(
+    path: str | PathLike[str],
+    tracks: Iterable[CSLTrack],
+    artists: Iterable[CSLArtistSample] = (),
+    songs: Iterable[CSLSongSample] = (),
+) -> None:
+    """Write a read-only track store, to be opened with TrackStore.open
+    Artists, songs and groups referenced by the tracks are always included
+
+    Args:
+        path: Path to write the store to
+        tracks: Tracks to store
+        artists: Extra artists to store
+        songs: Extra songs to store
+    """
+    heap = _Heap()
+    artist_idx: dict[str, int] = {}
+    artist_records: list[bytes] = []
+    song_idx: dict[str, int] = {}
+    song_records: list[bytes] = []
+    group_idx: dict[str, int] = {}
+    group_records: list[bytes] = []
+    credit_records: list[bytes] = []
+    track_group_records: list[bytes] = []
+    track_records: list[bytes] = []
+    track_ids: list[str] = []
+
+    def add_artist(artist: CSLArtistSample) -> int:
+        idx = artist_idx.get(artist.id)
+        if idx is None:
+            idx = artist_idx[artist.id] = len(artist_records)
+            artist_records.append(
+                _ARTIST.pack(
+                    *heap.add(artist.id),
+                    *heap.add(artist.name),
+                    *heap.add(artist.original_name),
+                    *heap.add(artist.disambiguation),
+                    artist.type_id,
+                )
+            )
+        return idx
+
+    def add_song(song: CSLSongSample) -> int:
+        idx = song_idx.get(song.id)
+        if idx is None:
+            idx = song_idx[song.id] = len(song_records)
+            song_records.append(
+                _SONG.pack(
+                    *heap.add(song.id),
+                    *heap.add(song.name),
+                    *heap.add(song.disambiguation),
+                    *heap.add(song.str_created_at),
+                )
+            )
+        return idx
+
+    def add_group(group: CSLGroup) -> int:
+        idx = group_idx.get(group.id)
+        if idx is None:
+            idx = group_idx[group.id] = len(group_records)
+            group_records.append(_GROUP.pack(*heap.add(group.id), *heap.add(group.name)))
+        return idx
+
+    for artist in artists:
+        add_artist(artist)
+    for song in songs:
+        add_song(song)
+    for track in tracks:
+        credits_start = len(credit_records)
+        for cred in track.artist_credits:
+            credit_records.append(
+                _CREDIT.pack(
+                    add_artist(cred.artist),
+                    *heap.add(cred.name),
+                    *heap.add(cred.join_phrase),
+                    cred.position,
+                )
+            )
+        groups_start = len(track_group_records)
+        for group in track.groups:
+            track_group_records.append(_TRACK_GROUP.pack(add_group(group)))
+        track_records.append(
+            _TRACK.pack(
+                *heap.add(track.id),
+                *heap.add(track.name),
+                *heap.add(track.original_name),
+                *heap.add(track.original_simple_artist),
+                *heap.add(track.original_album),
+                *heap.add(track.album),
+                track.track_number,
+                track.track_total,
+                track.disc_number,
+                track.disc_total,
+                NULL_INT if track.year is None else track.year,
+                NULL_IDX if track.song is None else add_song(track.song),
+                credits_start,
+                len(track.artist_credits),
+                groups_start,
+                len(track.groups),
+                *heap.add(track.audio_id),
+                *heap.add(track.audio_name),
+                track.disabled,
+                track.in_list,
+                track.type_id,
+                *heap.add(track.str_created_at),
+                *heap.add(track.str_updated_at),
+            )
+        )
+        track_ids.append(track.id)
+
+    regions = [
+        b''.join(track_records),
+        b''.join(artist_records),
+        b''.join(song_records),
+        b''.join(group_records),
+        b''.join(credit_records),
+        b''.join(track_group_records),
+        _build_index(track_ids),
+        _build_index(list(artist_idx)),
+        _build_index(list(song_idx)),
+        bytes(heap.data),
+    ]
+    offsets: list[int] = []
+    offset = _HEADER.size
+    for region in regions:
+        offsets.append(offset)
+        offset += len(region)
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(track_records),
+        len(artist_records),
+        len(song_records),
+        len(group_records),
+        len(credit_records),
+        len(track_group_records),
+        *offsets,
+    )
+    logger.info(f'Writing track store with {len(track_records)} tracks to {path}')
+    with open(path, 'wb') as file:
+        file.write(header)
+        for region in regions:
+            file.write(region)
+
+
+class TrackStore:
+    """Memory-mapped read-only store of tracks, songs and artists
+    Records are decoded lazily, so opening a store is cheap and the pages are
+    shared between every process that opens the same file
+    """
+
+    def __init__(self, path: Path, mm: mmap.mmap) -> None:
+        self.path = path
+        self._mm = mm
+        if len(mm) < _HEADER.size:
+            raise SnapshotError('Track store is too short')
+        (
+            magic,
+            version,
+            self._num_tracks,
+            self._num_artists,
+            self._num_songs,
+            self._num_groups,
+            _,
+            _,
+            self._tracks_offset,
+            self._artists_offset,
+            self._songs_offset,
+            self._groups_offset,
+            self._credits_offset,
+            self._track_groups_offset,
+            self._track_index_offset,
+            self._artist_index_offset,
+            self._song_index_offset,
+            self._heap_offset,
+        ) = _HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise SnapshotError('Not an amqcsl track store')
+        if version != VERSION:
+            raise SnapshotError(f'Track store version {version} is not supported, expected {VERSION}')
+        self._group_cache: dict[int, CSLGroup] = {}
+
+    @classmethod
+    def open(cls, path: str | PathLike[str]) -> Self:
+        """Open a track store written by write_track_store
+
+        Args:
+            path: Path to the store
+
+        Returns:
+            TrackStore
+
+        Raises:
+            SnapshotError: If the file isn't a valid track store
+        """
+        path = Path(path)
+        with open(path, 'rb') as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(path, mm)
+        except Exception:
+            mm.close()
+            raise
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Workers reopen the file instead of copying it
+        return (type(self).open, (self.path,))
+
+    def __len__(self) -> int:
+        return self._num_tracks
+
+    # --- Decoding ---
+
+    def _str(self, offset: int, length: int) -> str | None:
+        if length == NULL_LEN:
+            return None
+        start = self._heap_offset + offset
+        return str(self._mm[start : start + length], 'utf-8')
+
+    def _find(self, id: str, index_offset: int, count: int, region_offset: int, size: int) -> int | None:
+        table_size = _table_size(count)
+        mask = table_size - 1
+        slot = _hash_id(id) & mask
+        encoded = id.encode('utf-8')
+        mm = self._mm
+        heap_offset = self._heap_offset
+        while True:
+            (entry,) = _SLOT.unpack_from(mm, index_offset + slot * _SLOT.size)
+            if not entry:
+                return None
+            # Every record starts with its id
+            offset, length = struct.unpack_from('<2I', mm, region_offset + (entry - 1) * size)
+            if length == len(encoded) and mm[heap_offset + offset : heap_offset + offset + length] == encoded:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def _artist(self, idx: int) -> CSLArtistSample:
+        fields = _ARTIST.unpack_from(self._mm, self._artists_offset + idx * _ARTIST.size)
+        return CSLArtistSample(
+            id=self._str(fields[0], fields[1]),  # type: ignore[reportArgumentType]
+            name=self._str(fields[2], fields[3]),  # type: ignore[reportArgumentType]
+            original_name=self._str(fields[4], fields[5]),  # type: ignore[reportArgumentType]
+            disambiguation=self._str(fields[6], fields[7]),
+            type_id=fields[8],
+        )
+
+    def _song(self, idx: int) -> CSLSongSample:
+        fields = _SONG.unpack_from(self._mm, self._songs_offset + idx * _SONG.size)
+        return CSLSongSample(
+            id=self._str(fields[0], fields[1]),  # type: ignore[reportArgumentType]
+            name=self._str(fields[2], fields[3]),  # type: ignore[reportArgumentType]
+            disambiguation=self._str(fields[4], fields[5]),
+            str_created_at=self._str(fields[6], fields[7]),  # type: ignore[reportArgumentType]
+        )
+
+    def _group(self, idx: int) -> CSLGroup:
+        group = self._group_cache.get(idx)
+        if group is None:
+            fields = _GROUP.unpack_from(self._mm, self._groups_offset + idx * _GROUP.size)
+            group = self._group_cache[idx] = CSLGroup(
+                id=self._str(fields[0], fields[1]),  # type: ignore[reportArgumentType]
+                name=self._str(fields[2], fields[3]),  # type: ignore[reportArgumentType]
+            )
+        return group
+
+    def _credit(self, idx: int) -> CSLTrackArtistCredit:
+        fields = _CREDIT.unpack_from(self._mm, self._credits_offset + idx * _CREDIT.size)
+        return CSLTrackArtistCredit(
+            artist=self._artist(fields[0]),
+            name=self._str(fields[1], fields[2]),  # type: ignore[reportArgumentType]
+            join_phrase=self._str(fields[3], fields[4]),  # type: ignore[reportArgumentType]
+            position=fields[5],
+        )
+
+    def _track(self, idx: int) -> CSLTrack:
+        f = _TRACK.unpack_from(self._mm, self._tracks_offset + idx * _TRACK.size)
+        s = self._str
+        group_offset = self._track_groups_offset
+        groups = [
+            self._group(_TRACK_GROUP.unpack_from(self._mm, group_offset + i * _TRACK_GROUP.size)[0])
+            for i in range(f[20], f[20] + f[21])
+        ]
+        return CSLTrack(
+            id=s(f[0], f[1]),  # type: ignore[reportArgumentType]
+            name=s(f[2], f[3]),
+            original_name=s(f[4], f[5]),  # type: ignore[reportArgumentType]
+            original_simple_artist=s(f[6], f[7]),  # type: ignore[reportArgumentType]
+            original_album=s(f[8], f[9]),
+            album=s(f[10], f[11]),  # type: ignore[reportArgumentType]
+            track_number=f[12],
+            track_total=f[13],
+            disc_number=f[14],
+            disc_total=f[15],
+            year=None if f[16] == NULL_INT else f[16],
+            song=None if f[17] == NULL_IDX else self._song(f[17]),
+            artist_credits=[self._credit(i) for i in range(f[18], f[18] + f[19])],
+            groups=groups,
+            audio_id=s(f[22], f[23]),
+            audio_name=s(f[24], f[25]),
+            disabled=f[26],
+            in_list=f[27],
+            type_id=f[28],
+            str_created_at=s(f[29], f[30]),  # type: ignore[reportArgumentType]
+            str_updated_at=s(f[31], f[32]),  # type: ignore[reportArgumentType]
+        )
+
+    # --- Lookup ---
+
+    def get_track(self, id: str) -> CSLTrack | None:
+        """Get a track by id
+
+        Args:
+            id: Track id
+
+        Returns:
+            CSLTrack, or None if it isn't in the store
+        """
+        idx = self._find(id, self._track_index_offset, self._num_tracks, self._tracks_offset, _TRACK.size)
+        return None if idx is None else self._track(idx)
+
+    def get_artist(self, id: str) -> CSLArtistSample | None:
+        """Get an artist by id
+
+        Args:
+            id: Artist id
+
+        Returns:
+            CSLArtistSample, or None if it isn't in the store
+        """
+        idx = self._find(id, self._artist_index_offset, self._num_artists, self._artists_offset, _ARTIST.size)
+        return None if idx is None else self._artist(idx)
+
+    def get_song(self, id: str) -> CSLSongSample | None:
+        """Get a song by id
+
+        Args:
+            id: Song id
+
+        Returns:
+            CSLSongSample, or None if it isn't in the store
+        """
+        idx = self._find(id, self._song_index_offset, self._num_songs, self._songs_offset, _SONG.size)
+        return None if idx is None else self._song(idx)
+
+    def __contains__(self, id: object) -> bool:
+        if not isinstance(id, str):
+            return False
+        return self._find(id, self._track_index_offset, self._num_tracks, self._tracks_offset, _TRACK.size) is not None
+
+    def __getitem__(self, idx: int) -> CSLTrack:
+        if not -self._num_tracks <= idx < self._num_tracks:
+            raise IndexError('Track index out of range')
+        return self._track(idx % self._num_tracks)
+
+    def __iter__(self) -> Iterator[CSLTrack]:
+        return self.iter_tracks()
+
+    def iter_tracks(self) -> Iterator[CSLTrack]:
+        """Iterate over tracks in the order they were written
+
+        Yields:
+            CSLTrack
+        """
+        for idx in range(self._num_tracks):
+            yield self._track(idx)
+
+    def iter_artists(self) -> Iterator[CSLArtistSample]:
+        """Iterate over artists in the store
+
+        Yields:
+            CSLArtistSample
+        """
+        for idx in range(self._num_artists):
+            yield self._artist(idx)
+
+    def iter_songs(self) -> Iterator[CSLSongSample]:
+        """Iterate over songs in the store
+
+        Yields:
+            CSLSongSample
+        """
+        for idx in range(self._num_songs):
+            yield self._song(idx)
+
+    def iter_groups(self) -> Iterator[CSLGroup]:
+        """Iterate over groups in the store
+
+        Yields:
+            CSLGroup
+        """
+        for idx in range(self._num_groups):
+            yield self._group(idx)
@@ -1,3 +1,3 @@
-from . import character
+from . import character, runner
 
-__all__ = ['character']
+__all__ = ['character', 'runner']
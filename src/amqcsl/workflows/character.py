@@ -1,19 +1,31 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import re
+import time
+import unicodedata
 from collections import defaultdict
-from collections.abc import AsyncIterator, Awaitable, Callable, Generator, Iterable, Mapping, Sequence
+from collections.abc import Awaitable, Callable, Generator, Iterable, Iterator, Mapping, Sequence
+from contextlib import aclosing
 from itertools import chain
-from typing import Self, overload, override
+from os import PathLike
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self, overload, override
 
+import httpx
 import rich.repr
 from attrs import define, field, frozen
 from attrs.validators import instance_of, optional
 
 from amqcsl import AsyncDBClient, DBClient
+from amqcsl._json_files import read_json_file, write_json_file
+from amqcsl.clients._driver import adrive, drive
 from amqcsl.clients.bundles._core import (
     Bundle,
+    JSONCodec,
     MultiVendor,
     httpxClient,
 )
@@ -22,8 +34,12 @@ from amqcsl.clients.bundles._misc import (
     TrackDeleteMetadataBundle,
 )
 from amqcsl.exceptions import AMQCSLError
+from amqcsl.local import tokenize_name
 from amqcsl.objects._db_types import (
+    CSLArtist,
     CSLArtistSample,
+    CSLExtraMetadata,
+    CSLGroup,
     CSLMetadata,
     CSLTrack,
     ExtraMetadata,
@@ -37,6 +53,15 @@ __all__ = [
     'CharacterDict',
     'ArtistDict',
     'ArtistToMeta',
+    'CompiledArtistToMeta',
+    'compile_artist_to_meta',
+    'ArtistCache',
+    'UnknownArtistReport',
+    'PipelineStats',
+    'run_pipeline',
+    'CharacterEdit',
+    'CharacterDiff',
+    'diff_character_metadata',
     'compact_make_artist_to_meta',
     'make_artist_to_meta',
     'queue_character_metadata',
@@ -106,18 +131,230 @@ type ArtistDict = Mapping[ArtistKey, str]
 type ArtistToMeta = Mapping[CSLArtistSample, Sequence[ExtraMetadata]]
 
 
+class CompiledArtistToMeta(Mapping[CSLArtistSample, Sequence[ExtraMetadata]]):
+    """ArtistToMeta compiled for comparing many tracks, see compile_artist_to_meta
+    Artists are looked up by id instead of by hashing every field,
+    metadata is interned and frozen, and the union of metadata for each combination of credited artists is cached,
+    so comparing a track is a couple of set operations
+
+    Args:
+        artist_to_meta: ArtistToMeta to compile
+    """
+
+    def __init__(self, artist_to_meta: ArtistToMeta) -> None:
+        #: {(is_artist, type, value): interned ExtraMetadata}, doubles as a precomputed ExtraMetadata.simplify
+        self._interned: dict[tuple[bool, str, str], ExtraMetadata] = {}
+        self._artists: dict[str, CSLArtistSample] = {}
+        self._metas: dict[str, frozenset[ExtraMetadata]] = {}
+        self._ordered: dict[str, tuple[ExtraMetadata, ...]] = {}
+        self._unions: dict[tuple[str, ...], frozenset[ExtraMetadata]] = {}
+        for artist, metas in artist_to_meta.items():
+            interned = tuple(self._intern(meta) for meta in metas)
+            self._artists[artist.id] = artist
+            self._ordered[artist.id] = interned
+            self._metas[artist.id] = frozenset(interned)
+
+    def _intern(self, meta: ExtraMetadata) -> ExtraMetadata:
+        return self._interned.setdefault((meta.is_artist, meta.type, meta.value), meta)
+
+    @override
+    def __getitem__(self, artist: CSLArtistSample) -> tuple[ExtraMetadata, ...]:
+        return self._ordered[artist.id]
+
+    @override
+    def __iter__(self) -> Iterator[CSLArtistSample]:
+        return iter(self._artists.values())
+
+    @override
+    def __len__(self) -> int:
+        return len(self._artists)
+
+    @override
+    def __contains__(self, artist: object) -> bool:
+        return isinstance(artist, CSLArtistSample) and artist.id in self._artists
+
+    def simplify(self, meta: CSLExtraMetadata) -> ExtraMetadata:
+        """Same as ExtraMetadata.simplify, returning the interned metadata if there is one
+
+        Args:
+            meta: Existing metadata of a track
+
+        Returns:
+            ExtraMetadata
+        """
+        interned = self._interned.get((meta.type == 'Artist', meta.key, meta.value))
+        return ExtraMetadata.simplify(meta) if interned is None else interned
+
+    def track_metas(self, track: CSLTrack) -> tuple[frozenset[ExtraMetadata], list[CSLArtistSample]]:
+        """Get the metadata of every artist credited on a track
+
+        Args:
+            track: CSLTrack
+
+        Returns:
+            (metadata, credited artists that aren't in the mapping)
+        """
+        artist_ids = tuple(cred.artist.id for cred in track.artist_credits)
+        unknown = [cred.artist for cred in track.artist_credits if cred.artist.id not in self._metas]
+        metas = self._unions.get(artist_ids)
+        if metas is None:
+            metas = frozenset().union(*(self._metas.get(artist_id, ()) for artist_id in artist_ids))
+            self._unions[artist_ids] = metas
+        return metas, unknown
+
+
+def compile_artist_to_meta(artist_to_meta: ArtistToMeta) -> CompiledArtistToMeta:
+    """Compile an ArtistToMeta for comparing many tracks, e.g. a whole group
+
+    Args:
+        artist_to_meta: ArtistToMeta
+
+    Returns:
+        CompiledArtistToMeta, usable anywhere an ArtistToMeta is
+    """
+    if isinstance(artist_to_meta, CompiledArtistToMeta):
+        return artist_to_meta
+    return CompiledArtistToMeta(artist_to_meta)
+
+
+class ArtistCache:
+    """On-disk cache of resolved artist keys, so repeated runs don't search for the same artists
+    Entries younger than ttl are used without any requests,
+    older ones are revalidated with a lookup of the artist by id and searched for again if it no longer matches
+
+    Args:
+        path: Path to the cache file
+        ttl: Seconds an entry is trusted without revalidating
+    """
+
+    def __init__(self, path: str | PathLike[str], *, ttl: float = 7 * 24 * 60 * 60) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        #: {json [name, original_name, disambiguation]: {'artist': artist fields, 'resolved_at': timestamp}}
+        self.entries: dict[str, dict[str, Any]] = read_json_file(self.path) or {}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.save()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _key(artist_key: ArtistKey) -> str:
+        artist_name = ArtistName.from_key(artist_key)
+        return json.dumps([artist_name.name, artist_name.original_name, artist_name.disambiguation], ensure_ascii=False)
+
+    def save(self) -> None:
+        """Write the cache to disk"""
+        write_json_file(self.path, self.entries)
+
+    def add(self, artist_key: ArtistKey, artist: CSLArtistSample) -> None:
+        """Record the artist an artist key resolved to
+
+        Args:
+            artist_key: ArtistKey
+            artist: Artist it resolved to
+        """
+        self.entries[self._key(artist_key)] = {
+            'artist': {
+                'id': artist.id,
+                'name': artist.name,
+                'original_name': artist.original_name,
+                'disambiguation': artist.disambiguation,
+                'type_id': artist.type_id,
+            },
+            'resolved_at': time.time(),
+        }
+
+    def update(self, resolved: Iterable[tuple[ArtistKey, CSLArtistSample]]) -> None:
+        """Record several resolved artist keys
+
+        Args:
+            resolved: Iterable of (artist key, artist)
+        """
+        for artist_key, artist in resolved:
+            self.add(artist_key, artist)
+
+    def discard(self, artist_key: ArtistKey) -> None:
+        """Remove an artist key from the cache
+
+        Args:
+            artist_key: ArtistKey
+        """
+        self.entries.pop(self._key(artist_key), None)
+
+    def partition(
+        self, artist_keys: Iterable[ArtistKey]
+    ) -> tuple[dict[ArtistKey, CSLArtistSample], dict[ArtistKey, CSLArtistSample]]:
+        """Look up artist keys in the cache
+
+        Args:
+            artist_keys: Iterable of artist keys
+
+        Returns:
+            ({key: artist} of fresh entries, {key: artist} of entries that need revalidating),
+            keys that aren't cached are in neither
+        """
+        fresh: dict[ArtistKey, CSLArtistSample] = {}
+        expired: dict[ArtistKey, CSLArtistSample] = {}
+        now = time.time()
+        for artist_key in artist_keys:
+            entry = self.entries.get(self._key(artist_key))
+            if entry is None:
+                continue
+            artist = CSLArtistSample(**entry['artist'])
+            if now - entry['resolved_at'] > self.ttl:
+                expired[artist_key] = artist
+            else:
+                fresh[artist_key] = artist
+        if fresh or expired:
+            logger.info(f'Found {len(fresh)} fresh and {len(expired)} expired artists in cache')
+        return fresh, expired
+
+    def revalidate(self, artist_key: ArtistKey, artist: CSLArtistSample | None) -> CSLArtistSample | None:
+        """Revalidate an expired entry against the artist fetched by its id
+
+        Args:
+            artist_key: ArtistKey
+            artist: Artist fetched by id, or None if it no longer exists
+
+        Returns:
+            The artist if it still matches the key, otherwise None and the entry is removed
+        """
+        if artist is None or not ArtistName.from_key(artist_key).match(artist):
+            logger.info(f'Cached artist for {ArtistName.from_key(artist_key)} is no longer valid')
+            self.discard(artist_key)
+            return None
+        # Drop the detailed fields of CSLArtist, since artists are compared with the samples in track credits
+        sample = CSLArtistSample(artist.id, artist.name, artist.original_name, artist.disambiguation, artist.type_id)
+        self.add(artist_key, sample)
+        return sample
+
+
 # --- Helpers ---
 
 
 def _conv_artists(
     artist_keys: Iterable[ArtistKey],
     search_phrases: Sequence[str],
+    resolved: Mapping[ArtistKey, CSLArtistSample] | None = None,
 ) -> Generator[Iterable[str], dict[str, Iterable[CSLArtistSample]], dict[ArtistKey, CSLArtistSample]]:
     """Converts an iterable of ArtistKey into {ArtistKey: T}
+    Keys without exact matches in the phrase searches are searched for by name,
+    and only names whose own search has no exact match fall back to normalized names, see _loose_match_artist
 
     Args:
         artist_keys: Iterable of artist keys
         search_phrases: List of search phrases to be passed to iter_artists
+        resolved: {ArtistKey: artist} already known, e.g. from an ArtistCache, these keys aren't searched for
 
     Yields:
         [search_phrase]
@@ -135,13 +372,30 @@ def _conv_artists(
     seen: dict[CSLArtistSample, ArtistKey] = {}
     not_found: defaultdict[str, list[ArtistKey]] = defaultdict(list)
 
+    remaining: list[ArtistKey] = []
+    for key in artist_keys:
+        artist = None if resolved is None else resolved.get(key)
+        if artist is None:
+            remaining.append(key)
+        elif artist in seen:
+            raise AMQCSLError(
+                f'Names {ArtistName.from_key(key)} and {ArtistName.from_key(seen[artist])} both match {artist}'
+            )
+        else:
+            rtn[key] = artist
+            seen[artist] = key
+    if not remaining:
+        search_phrases = ()
+
     if search_phrases:
         logger.info('Searching phrases for artists')
     search_results = yield search_phrases
-    artists = {*chain.from_iterable(search_results.values())}
-    for key in artist_keys:
+    phrase_artists = list(chain.from_iterable(search_results.values()))
+    index = _ArtistIndex(phrase_artists)
+    # Only exact matches here, normalized names are only tried once a name's own search finds nothing exact
+    for key in remaining:
         artist_name = ArtistName.from_key(key)
-        artist = _match_artist(artist_name, artists)
+        artist = _match_artist(artist_name, index)
         if artist is None:
             not_found[artist_name.name].append(key)
         elif artist in seen:
@@ -153,27 +407,164 @@ def _conv_artists(
     if not_found:
         logger.info('Searching for artists by name directly')
     search_results = yield not_found
+    name_artists = {name: list(search_results[name]) for name in not_found}
+    loose: list[ArtistKey] = []
     for name, keys in not_found.items():
-        artists = {*search_results[name]}
+        name_index = _ArtistIndex(name_artists[name])
         for key in keys:
             artist_name = ArtistName.from_key(key)
-            artist = _match_artist(artist_name, artists)
+            artist = _match_artist(artist_name, name_index)
             if artist is None:
-                raise AMQCSLError(f'Could not find artist {artist_name}')
+                loose.append(key)
             elif artist in seen:
                 raise AMQCSLError(f'Names {artist_name} and {ArtistName.from_key(seen[artist])} both match {artist}')
             else:
                 rtn[key] = artist
                 seen[artist] = key
+    if not loose:
+        return rtn
+    # Searches can return artists under other spellings, so every searched artist is a candidate
+    loose_index = _ArtistIndex(chain(phrase_artists, chain.from_iterable(name_artists.values())))
+    for key in loose:
+        artist_name = ArtistName.from_key(key)
+        artist = _loose_match_artist(artist_name, loose_index)
+        if artist is None:
+            raise AMQCSLError(f'Could not find artist {artist_name}')
+        elif artist in seen:
+            raise AMQCSLError(f'Names {artist_name} and {ArtistName.from_key(seen[artist])} both match {artist}')
+        else:
+            logger.info(f'Matched {artist_name} to {artist.name} by normalized name')
+            rtn[key] = artist
+            seen[artist] = key
     return rtn
 
 
-def _match_artist(artist_name: ArtistName, artists: set[CSLArtistSample]) -> CSLArtistSample | None:
+# Hepburn and kunrei-shiki spellings of the same syllables, mapped onto one spelling
+_ROMANIZATION = re.compile('tsu|shi|chi|sh|ch|ji|j|fu|di|du|m(?=[bpm])')
+_ROMANIZATION_TABLE = {
+    'tsu': 'tu',
+    'shi': 'si',
+    'chi': 'ti',
+    'sh': 'sy',
+    'ch': 'ty',
+    'ji': 'zi',
+    'j': 'zy',
+    'fu': 'hu',
+    'di': 'zi',
+    'du': 'zu',
+    'm': 'n',
+}
+_LONG_VOWEL = re.compile(r'ou|([aeiou])\1+')
+_NON_WORD = re.compile(r'\W+')
+
+
+def _compact_name(text: str) -> str:
+    """Fold width and case of a name and drop whitespace and punctuation"""
+    return _NON_WORD.sub('', unicodedata.normalize('NFKC', text).casefold())
+
+
+def _spelling_name(text: str) -> str:
+    """Fold a name further than _compact_name, with normalize_name and then romanization variants, see _romanized_name"""
+    return _romanized_name(''.join(tokenize_name(text)))
+
+
+def _romanized_name(compact: str) -> str:
+    """Fold romanization variants of a compact name, e.g. Sakurakouji, Sakurakoji and Sakurakōzi"""
+    folded = _ROMANIZATION.sub(lambda m: _ROMANIZATION_TABLE[m[0]], compact)
+    return _LONG_VOWEL.sub(lambda m: m[0][0], folded)
+
+
+class _ArtistIndex:
+    """Hash index over a set of artists, for resolving ArtistName in constant time
+    Artists are indexed by every combination of fields an ArtistName can leave as a wildcard,
+    so a lookup returns the same artists as filtering with ArtistName.match
+
+    Normalized names and spelling variants are indexed too, lazily since they're only needed for names without exact matches
+    """
+
+    def __init__(self, artists: Iterable[CSLArtistSample]) -> None:
+        self.by_name: defaultdict[str, list[CSLArtistSample]] = defaultdict(list)
+        self.by_original_name: defaultdict[tuple[str, str | None], list[CSLArtistSample]] = defaultdict(list)
+        self.by_disambiguation: defaultdict[tuple[str, str | None], list[CSLArtistSample]] = defaultdict(list)
+        self.by_all: defaultdict[tuple[str, str | None, str | None], list[CSLArtistSample]] = defaultdict(list)
+        for artist in dict.fromkeys(artists):
+            name, orig_name, disam = artist.name, artist.original_name, artist.disambiguation
+            self.by_name[name].append(artist)
+            self.by_original_name[name, orig_name].append(artist)
+            self.by_disambiguation[name, disam].append(artist)
+            self.by_all[name, orig_name, disam].append(artist)
+        self._loose: dict[str, dict[CSLArtistSample, int]] | None = None
+
+    def lookup(self, artist_name: ArtistName) -> list[CSLArtistSample]:
+        """Get the artists matching an ArtistName
+
+        Args:
+            artist_name: ArtistName
+
+        Returns:
+            List of matching artists
+        """
+        name, orig_name, disam = artist_name.name, artist_name.original_name, artist_name.disambiguation
+        match orig_name, disam:
+            case None, None:
+                matches = self.by_name.get(name)
+            case _, None:
+                matches = self.by_original_name.get((name, orig_name))
+            case None, _:
+                matches = self.by_disambiguation.get((name, disam))
+            case _:
+                matches = self.by_all.get((name, orig_name, disam))
+        return matches or []
+
+    def _build_loose(self) -> dict[str, dict[CSLArtistSample, int]]:
+        loose: defaultdict[str, dict[CSLArtistSample, int]] = defaultdict(dict)
+        for artist in chain.from_iterable(self.by_name.values()):
+            # Lower ranks are closer matches, names rank above original names
+            for field_rank, text in ((0, artist.name), (2, artist.original_name)):
+                for rank, key in ((field_rank, _compact_name(text)), (field_rank + 1, f'~{_spelling_name(text)}')):
+                    if key.strip('~'):
+                        entry = loose[key]
+                        entry[artist] = min(rank, entry.get(artist, rank))
+        return loose
+
+    def loose_lookup(self, artist_name: ArtistName) -> list[tuple[int, CSLArtistSample]]:
+        """Get the artists whose normalized name or original name matches an ArtistName
+        Even ranks compare names with case, width, whitespace and punctuation folded, see _compact_name,
+        and odd ranks are spelling variants, also folding kana, diacritics, romanization and long vowels
+
+        Args:
+            artist_name: ArtistName
+
+        Returns:
+            List of (rank, artist), closest matches first and ties ordered by id
+        """
+        if self._loose is None:
+            self._loose = self._build_loose()
+        matches: dict[CSLArtistSample, int] = {}
+        for key in (_compact_name(artist_name.name), f'~{_spelling_name(artist_name.name)}'):
+            for artist, rank in self._loose.get(key, {}).items():
+                matches[artist] = min(rank, matches.get(artist, rank))
+
+        def fields_match(query: str | None, value: str | None) -> bool:
+            return query is None or (value is not None and _compact_name(query) == _compact_name(value))
+
+        return sorted(
+            (
+                (rank, artist)
+                for artist, rank in matches.items()
+                if fields_match(artist_name.original_name, artist.original_name)
+                and fields_match(artist_name.disambiguation, artist.disambiguation)
+            ),
+            key=lambda item: (item[0], item[1].id),
+        )
+
+
+def _match_artist(artist_name: ArtistName, index: _ArtistIndex) -> CSLArtistSample | None:
     """Match an ArtistName with an artist
 
     Args:
         artist_name: ArtistName
-        artists: Set of artists
+        index: Index of the artists to match against
 
     Returns:
         CSLArtistSample if an artist matches, otherwise None
@@ -181,7 +572,7 @@ def _match_artist(artist_name: ArtistName, artists: set[CSLArtistSample]) -> CSL
     Raises:
         AMQCSLError: If multiple artists match
     """
-    match [artist for artist in artists if artist_name.match(artist)]:
+    match index.lookup(artist_name):
         case []:
             return None
         case [artist]:
@@ -192,44 +583,235 @@ def _match_artist(artist_name: ArtistName, artists: set[CSLArtistSample]) -> CSL
             raise AMQCSLError(f'{len(matching_artists)} artists found for {artist_name}')
 
 
+def _loose_match_artist(artist_name: ArtistName, index: _ArtistIndex) -> CSLArtistSample | None:
+    """Match an ArtistName with an artist by normalized name, for names whose own search has no exact match
+    Only case, width, whitespace and punctuation differences are matched, since spelling variants
+    can be different artists, e.g. Yuki and Yuuki, so those are only reported as candidates
+
+    Args:
+        artist_name: ArtistName
+        index: Index of the artists to match against
+
+    Returns:
+        CSLArtistSample if exactly one artist is the closest match, None if no artist is close
+
+    Raises:
+        AMQCSLError: If several artists are equally close, or only spelling variants match
+    """
+    candidates = index.loose_lookup(artist_name)
+    normalized = [(rank, artist) for rank, artist in candidates if rank % 2 == 0]
+    if normalized:
+        best_rank = normalized[0][0]
+        best = [artist for rank, artist in normalized if rank == best_rank]
+        if len(best) == 1:
+            return best[0]
+        for artist in best:
+            logger.error(artist)
+        raise AMQCSLError(f'{len(best)} artists loosely match {artist_name}')
+    if candidates:
+        for _, artist in candidates:
+            logger.error(artist)
+        names = ', '.join(dict.fromkeys(artist.name for _, artist in candidates))
+        raise AMQCSLError(f'Could not find artist {artist_name}, did you mean {names}?')
+    return None
+
+
+class _PendingNames:
+    """Artist names that haven't matched a searched artist yet, for stopping searches early"""
+
+    def __init__(self, artist_keys: Iterable[ArtistKey]) -> None:
+        self.names: set[tuple[str, str | None, str | None]] = set()
+        for key in artist_keys:
+            artist_name = ArtistName.from_key(key)
+            self.names.add((artist_name.name, artist_name.original_name, artist_name.disambiguation))
+
+    def __bool__(self) -> bool:
+        return bool(self.names)
+
+    def discard_matches(self, artist: CSLArtistSample) -> None:
+        """Discard the names an artist matches
+
+        Args:
+            artist: Searched artist
+        """
+        if not self.names:
+            return
+        name, orig_name, disam = artist.name, artist.original_name, artist.disambiguation
+        # None is a wildcard in ArtistName, so these are all the names that can match the artist
+        for key in ((name, None, None), (name, orig_name, None), (name, None, disam), (name, orig_name, disam)):
+            self.names.discard(key)
+
+
+def _sync_search_artists(
+    client: DBClient,
+    phrases: Iterable[str],
+    pending: _PendingNames | None = None,
+) -> dict[str, list[CSLArtistSample]]:
+    """Search for artists with each phrase, running the searches on client.executor
+
+    Args:
+        client: DBClient
+        phrases: Search phrases
+        pending: Names still unmatched, searching stops once all of them match
+
+    Returns:
+        {phrase: artists}, with the artists found so far if searching stopped early
+    """
+    results: dict[str, list[CSLArtistSample]] = {phrase: [] for phrase in phrases}
+
+    def search(item: tuple[str, list[CSLArtistSample]]) -> None:
+        phrase, artists = item
+        if pending is not None and not pending:
+            return
+        # Lazy paging, otherwise a concurrent executor requests every page before the first is read
+        for artist in client.iter_artists(phrase, lazy=pending is not None):
+            artists.append(artist)
+            if pending is None:
+                continue
+            pending.discard_matches(artist)
+            if not pending:
+                logger.info('All artists matched, skipping remaining searches')
+                return
+
+    client.executor.map(search, results.items())
+    return results
+
+
+async def _async_search_artists(
+    client: AsyncDBClient,
+    phrases: Iterable[str],
+    max_searches: int | None = None,
+    pending: _PendingNames | None = None,
+) -> dict[str, list[CSLArtistSample]]:
+    """Search for artists with several phrases at once
+    Each search pages through the client's request limit, and max_searches bounds how many are paged at once,
+    so a long search doesn't hold up the others but many searches don't pile up waiting on requests
+
+    Args:
+        client: AsyncDBClient
+        phrases: Search phrases
+        max_searches: Maximum number of searches at once, defaults to client.max_request_count
+        pending: Names still unmatched, remaining searches are cancelled once all of them match
+
+    Returns:
+        {phrase: artists}, with the artists found so far if searching stopped early
+
+    Raises:
+        ValueError: If max_searches isn't positive
+    """
+    limit = client.max_request_count if max_searches is None else max_searches
+    if limit <= 0:
+        raise ValueError('max_searches must be positive')
+    results: dict[str, list[CSLArtistSample]] = {phrase: [] for phrase in phrases}
+    if not results:
+        return results
+    todo = iter(results.items())
+    tasks: list[asyncio.Task[None]] = []
+
+    async def search() -> None:
+        for phrase, artists in todo:
+            async with aclosing(client.iter_artists(phrase)) as it:
+                async for artist in it:
+                    artists.append(artist)
+                    if pending is None:
+                        continue
+                    pending.discard_matches(artist)
+                    if not pending:
+                        logger.info('All artists matched, cancelling remaining searches')
+                        current = asyncio.current_task()
+                        for task in tasks:
+                            if task is not current:
+                                task.cancel()
+                        return
+
+    async with asyncio.TaskGroup() as tg:
+        tasks.extend(tg.create_task(search()) for _ in range(min(limit, len(results))))
+    return results
+
+
 def _sync_conv_artists(
     client: DBClient,
     artist_keys: Iterable[ArtistKey],
     search_phrases: Sequence[str] = (),
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
 ) -> dict[ArtistKey, CSLArtistSample]:
-    g = _conv_artists(artist_keys, search_phrases)
-    phrase_to_artists = None
-    while True:
-        try:
-            res = g.send(phrase_to_artists)  # type: ignore[reportArgumentType]
-        except StopIteration as e:
-            return e.value
-        phrase_to_artists = {phrase: client.iter_artists(phrase) for phrase in res}
+    artist_keys = list(artist_keys)
+    resolved: dict[ArtistKey, CSLArtistSample] = {}
+    if cache is not None:
+        resolved, expired = cache.partition(artist_keys)
+
+        def get_artist(artist: CSLArtistSample) -> CSLArtist | None:
+            try:
+                return client.get_artist(artist)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise
+                return None
+
+        full_artists = client.executor.map(get_artist, expired.values())
+        for key, full_artist in zip(expired, full_artists):
+            if (artist := cache.revalidate(key, full_artist)) is not None:
+                resolved[key] = artist
+
+    # Only the phrase searches can stop early, the searches by name are needed to match their own keys
+    pending = _PendingNames(key for key in artist_keys if key not in resolved) if stop_early else None
+
+    def search(phrases: Iterable[str]) -> dict[str, list[CSLArtistSample]]:
+        nonlocal pending
+        results = _sync_search_artists(client, phrases, pending)
+        pending = None
+        return results
+
+    rtn = drive(_conv_artists(artist_keys, search_phrases, resolved), search)
+
+    if cache is not None:
+        cache.update((key, artist) for key, artist in rtn.items() if key not in resolved)
+        cache.save()
+    return rtn
 
 
 async def _async_conv_artists(
     client: AsyncDBClient,
     artist_keys: Iterable[ArtistKey],
     search_phrases: Sequence[str] = (),
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> dict[ArtistKey, CSLArtistSample]:
-    g = _conv_artists(artist_keys, search_phrases)
-    phrase_to_artists = None
-    while True:
-        try:
-            res = g.send(phrase_to_artists)  # type: ignore[reportArgumentType]
-        except StopIteration as e:
-            return e.value
-
-        # Semaphore since pagination can take a while, and this prevents issues with timeouts
-        sem = asyncio.Semaphore(5)
-
-        async def drain(it: AsyncIterator[CSLArtistSample]) -> list[CSLArtistSample]:
-            async with sem:
-                return [item async for item in it]
+    artist_keys = list(artist_keys)
+    resolved: dict[ArtistKey, CSLArtistSample] = {}
+    if cache is not None:
+        resolved, expired = cache.partition(artist_keys)
 
-        async with asyncio.TaskGroup() as tg:
-            tasks = {phrase: tg.create_task(drain(client.iter_artists(phrase))) for phrase in res}
-        phrase_to_artists = {phrase: task.result() for phrase, task in tasks.items()}
+        async def get_artist(artist: CSLArtistSample) -> CSLArtist | None:
+            try:
+                return await client.get_artist(artist)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise
+                return None
+
+        full_artists = await client.executor.map(get_artist, expired.values())
+        for key, full_artist in zip(expired, full_artists):
+            if (artist := cache.revalidate(key, full_artist)) is not None:
+                resolved[key] = artist
+
+    # Only the phrase searches can stop early, the searches by name are needed to match their own keys
+    pending = _PendingNames(key for key in artist_keys if key not in resolved) if stop_early else None
+
+    async def search(phrases: Iterable[str]) -> dict[str, list[CSLArtistSample]]:
+        nonlocal pending
+        results = await _async_search_artists(client, phrases, max_searches, pending)
+        pending = None
+        return results
+
+    rtn = await adrive(_conv_artists(artist_keys, search_phrases, resolved), search)
+
+    if cache is not None:
+        cache.update((key, artist) for key, artist in rtn.items() if key not in resolved)
+        cache.save()
+    return rtn
 
 
 # --- Exports ---
@@ -241,6 +823,10 @@ def compact_make_artist_to_meta(
     artists: ArtistDict,
     search_phrases: Sequence[str] = (),
     sep: str = ', ',
+    *,
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> ArtistToMeta: ...
 @overload
 def compact_make_artist_to_meta(
@@ -248,6 +834,10 @@ def compact_make_artist_to_meta(
     artists: ArtistDict,
     search_phrases: Sequence[str] = (),
     sep: str = ', ',
+    *,
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> Awaitable[ArtistToMeta]: ...
 
 
@@ -256,6 +846,10 @@ def compact_make_artist_to_meta(
     artists: ArtistDict,
     search_phrases: Sequence[str] = (),
     sep: str = ', ',
+    *,
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> ArtistToMeta | Awaitable[ArtistToMeta]:
     """Make the artist to metadata dict with a compact artist dict
 
@@ -264,13 +858,17 @@ def compact_make_artist_to_meta(
         artists: ArtistDict, values should be character names separated by sep
         search_phrases: List of search phrases to be passed to iter_artists
         sep: Separator for artist values
+        cache: ArtistCache to resolve artists from, skipping the searches for cached artists
+        stop_early: Stop the search_phrases searches once every artist has a match,
+            which skips the ambiguity checks against the results that weren't searched
+        max_searches: Maximum number of searches at once with an AsyncDBClient, defaults to client.max_request_count
 
     Returns:
         ArtistToMeta
     """
     match client:
         case DBClient():
-            artist_objs = _sync_conv_artists(client, artists, search_phrases)
+            artist_objs = _sync_conv_artists(client, artists, search_phrases, cache, stop_early)
             return {
                 artist_objs[k]: [ExtraMetadata(True, 'Character', c) for c in v.split(sep)]  #
                 for k, v in artists.items()
@@ -278,7 +876,9 @@ def compact_make_artist_to_meta(
         case AsyncDBClient():
 
             async def rtn():
-                artist_objs = await _async_conv_artists(client, artists, search_phrases)
+                artist_objs = await _async_conv_artists(
+                    client, artists, search_phrases, cache, stop_early, max_searches
+                )
                 return {
                     artist_objs[k]: [ExtraMetadata(True, 'Character', c) for c in v.split(sep)]  #
                     for k, v in artists.items()
@@ -294,6 +894,10 @@ def make_artist_to_meta(
     artists: ArtistDict,
     search_phrases: Sequence[str] = (),
     sep: str = ' ',
+    *,
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> ArtistToMeta: ...
 @overload
 def make_artist_to_meta(
@@ -302,6 +906,10 @@ def make_artist_to_meta(
     artists: ArtistDict,
     search_phrases: Sequence[str] = (),
     sep: str = ' ',
+    *,
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> Awaitable[ArtistToMeta]: ...
 
 
@@ -311,6 +919,10 @@ def make_artist_to_meta(
     artists: ArtistDict,
     search_phrases: Sequence[str] = (),
     sep: str = ' ',
+    *,
+    cache: ArtistCache | None = None,
+    stop_early: bool = False,
+    max_searches: int | None = None,
 ) -> ArtistToMeta | Awaitable[ArtistToMeta]:
     """Make the artist to metadata dict
 
@@ -320,6 +932,10 @@ def make_artist_to_meta(
         artists: ArtistDict, values should be keys of characters separated by sep
         search_phrases: List of search phrases to be passed to iter_artists
         sep: Separator for artist values
+        cache: ArtistCache to resolve artists from, skipping the searches for cached artists
+        stop_early: Stop the search_phrases searches once every artist has a match,
+            which skips the ambiguity checks against the results that weren't searched
+        max_searches: Maximum number of searches at once with an AsyncDBClient, defaults to client.max_request_count
 
     Returns:
         ArtistToMeta
@@ -327,12 +943,14 @@ def make_artist_to_meta(
     metas = {k: ExtraMetadata(True, 'Character', v) for k, v in characters.items()}
     match client:
         case DBClient():
-            artist_objs = _sync_conv_artists(client, artists, search_phrases)
+            artist_objs = _sync_conv_artists(client, artists, search_phrases, cache, stop_early)
             return {artist_objs[k]: [metas[c] for c in v.split(sep)] for k, v in artists.items()}
         case AsyncDBClient():
 
             async def rtn():
-                artist_objs = await _async_conv_artists(client, artists, search_phrases)
+                artist_objs = await _async_conv_artists(
+                    client, artists, search_phrases, cache, stop_early, max_searches
+                )
                 return {artist_objs[k]: [metas[c] for c in v.split(sep)] for k, v in artists.items()}
 
             return rtn()
@@ -355,6 +973,65 @@ def prompt_artist_handler(
     return False
 
 
+@define
+class UnknownArtistReport:
+    """Unknown artist handler that records tracks with unknown artists instead of prompting
+    Doesn't block, so whole groups can be processed unattended, with one review of every case at the end
+    """
+
+    #: (track, unknown artists) for each track with unknown artists, in the order they were handled
+    cases: list[tuple[CSLTrack, list[CSLArtistSample]]] = field(factory=list)
+
+    def __call__(
+        self,
+        track: CSLTrack,
+        artist_to_meta: ArtistToMeta,
+        unknown_artists: Sequence[CSLArtistSample],
+    ) -> bool:
+        self.cases.append((track, list(unknown_artists)))
+        return False
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    @property
+    def tracks(self) -> list[CSLTrack]:
+        """Tracks with unknown artists"""
+        return [track for track, _ in self.cases]
+
+    def by_artist(self) -> dict[CSLArtistSample, list[CSLTrack]]:
+        """Group the tracks by unknown artist
+
+        Returns:
+            {artist: tracks it's credited on}, artists on the most tracks first
+        """
+        rtn: defaultdict[CSLArtistSample, list[CSLTrack]] = defaultdict(list)
+        for track, unknown_artists in self.cases:
+            for artist in unknown_artists:
+                rtn[artist].append(track)
+        return dict(sorted(rtn.items(), key=lambda item: -len(item[1])))
+
+    def review(self, msg: str = 'Continue?') -> bool:
+        """Show every unknown artist with the tracks they're on, and prompt once
+
+        Args:
+            msg: Message to prompt user with
+
+        Returns:
+            User's choice, True without prompting if there were no unknown artists
+
+        Raises:
+            QuitError: If the user chooses to quit
+        """
+        if not self.cases:
+            return True
+        summary = {
+            str(ArtistName(artist.name, artist.original_name, artist.disambiguation)): [track.name for track in tracks]
+            for artist, tracks in self.by_artist().items()
+        }
+        return prompt(summary, msg=f'{len(summary)} unknown artists on {len(self.cases)} tracks. {msg}')
+
+
 @define
 class QueueCharacterMetadataBundle(Bundle[None]):
     track: CSLTrack = field(validator=instance_of(CSLTrack))
@@ -367,13 +1044,21 @@ class QueueCharacterMetadataBundle(Bundle[None]):
 
     def __attrs_post_init__(self) -> None:
         # Add character metadata if not already exists
-        metas: set[ExtraMetadata] = set()
-        for cred in self.track.artist_credits:
-            new_metas = self.artist_to_meta.get(cred.artist)
-            if new_metas is None:
-                self.unknown_artists.append(cred.artist)
-            else:
-                metas.update(new_metas)
+        artist_to_meta = self.artist_to_meta
+        metas: set[ExtraMetadata] | frozenset[ExtraMetadata]
+        if isinstance(artist_to_meta, CompiledArtistToMeta):
+            metas, unknown_artists = artist_to_meta.track_metas(self.track)
+            self.unknown_artists.extend(unknown_artists)
+            simplify = artist_to_meta.simplify
+        else:
+            metas = set()
+            for cred in self.track.artist_credits:
+                new_metas = artist_to_meta.get(cred.artist)
+                if new_metas is None:
+                    self.unknown_artists.append(cred.artist)
+                else:
+                    metas.update(new_metas)
+            simplify = ExtraMetadata.simplify
         bundle = TrackAddMetadataBundle(self.track, metas, existing_meta=self.meta)
         self.bundles.append(bundle)
         if self.unknown_artists:
@@ -384,15 +1069,16 @@ class QueueCharacterMetadataBundle(Bundle[None]):
         if self.meta is None:
             return
         # Remove existing character metadata
-        curr = {ExtraMetadata.simplify(m): m for m in self.meta.extra_metas if m.key == 'Character'}
+        curr = {simplify(m): m for m in self.meta.extra_metas if m.key == 'Character'}
         unknown_metas = curr.keys() - metas
         for m in unknown_metas:
             bundle = TrackDeleteMetadataBundle(self.track, curr[m])
             self.bundles.append(bundle)
 
     @override
-    def vendor(self, client: httpxClient) -> MultiVendor[None]:
-        vendors = [bundle.vendor(client) for bundle in self.bundles]
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> MultiVendor[None]:
+        # Skip adds with nothing to add, since their vendors return without a request
+        vendors = [bundle.vendor(client, codec) for bundle in self.bundles if bundle]
         reqs = [next(vd) for vd in vendors]
         resps = yield reqs
         for res, vd in zip(resps, vendors):
@@ -422,10 +1108,329 @@ def queue_character_metadata(
         track: Track to be edited
         artist_to_meta: {artist: [metas]}
         meta: Existing metadata of the track
+        unknown_artist_handler: Called with the track, artist_to_meta and the unknown artists
+            if the track has artists missing from artist_to_meta,
+            existing character metadata is only removed if it returns True.
+            Defaults to prompting, use UnknownArtistReport to collect them without blocking
     """
+    bundle = _character_bundle(track, artist_to_meta, meta, unknown_artist_handler)
+    if bundle is not None:
+        client.enqueue(bundle)
+
+
+@frozen
+class CharacterEdit:
+    """Character metadata changes on one track, see diff_character_metadata"""
+
+    #: Track to edit
+    track: CSLTrack
+    #: Character metadata to add
+    add: tuple[ExtraMetadata, ...]
+    #: Existing character metadata to remove
+    remove: tuple[CSLExtraMetadata, ...]
+
+
+def _diff_track(
+    artist_to_meta: CompiledArtistToMeta,
+    track: CSLTrack,
+    meta: CSLMetadata | None,
+    unknown_artist_handler: UnknownArtistHandler,
+) -> CharacterEdit | None:
+    """Compare a track's character metadata against artist_to_meta, same as QueueCharacterMetadataBundle"""
     if track.type == 'OffVocal':
-        return
+        return None
+    metas, unknown_artists = artist_to_meta.track_metas(track)
+    if meta is None:
+        add, curr = metas, {}
+    else:
+        simplify = artist_to_meta.simplify
+        existing = {simplify(m): m for m in meta.extra_metas}
+        add = metas - existing.keys()
+        curr = {simple: m for simple, m in existing.items() if m.key == 'Character'}
+    remove: tuple[CSLExtraMetadata, ...] = ()
+    if not unknown_artists or unknown_artist_handler(track, artist_to_meta, unknown_artists):
+        remove = tuple(m for simple, m in curr.items() if simple not in metas)
+    if not add and not remove:
+        return None
+    return CharacterEdit(track, tuple(sorted(add, key=lambda m: (m.type, m.value))), remove)
+
+
+@define
+class CharacterEditsBundle(Bundle[None]):
+    """Character metadata edits on several tracks, with every request sent at once"""
+
+    edits: tuple[CharacterEdit, ...] = field(converter=tuple)  # type: ignore[reportUnknownArgumentType]
+
+    @override
+    def vendor(self, client: httpxClient, codec: JSONCodec) -> MultiVendor[None]:
+        bundles: list[Bundle[None]] = []
+        for edit in self.edits:
+            if edit.add:
+                bundles.append(TrackAddMetadataBundle(edit.track, edit.add))
+            bundles.extend(TrackDeleteMetadataBundle(edit.track, m) for m in edit.remove)
+        # Every edit is a single request, so one step sends everything
+        vendors = [bundle.vendor(client, codec) for bundle in bundles]
+        reqs = [next(vd) for vd in vendors]
+        resps = yield reqs
+        for res, vd in zip(resps, vendors):
+            try:
+                vd.send(res)
+            except StopIteration:
+                pass
+
+    @override
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield 'tracks', len(self.edits)
+        yield 'add', sum(len(edit.add) for edit in self.edits)
+        yield 'remove', sum(len(edit.remove) for edit in self.edits)
+
+
+@define
+class CharacterDiff:
+    """Character metadata changes on a set of tracks, see diff_character_metadata"""
+
+    #: Edits of the tracks that need changes
+    edits: list[CharacterEdit] = field(factory=list)
+    #: Number of tracks compared
+    tracks: int = 0
+    #: Tracks with artists missing from artist_to_meta
+    report: UnknownArtistReport = field(factory=UnknownArtistReport)
+
+    def __len__(self) -> int:
+        return len(self.edits)
+
+    def bundles(self, chunk_size: int = 50) -> list[CharacterEditsBundle]:
+        """Compact the edits into bundles of several tracks each
+
+        Args:
+            chunk_size: Number of tracks per bundle
+
+        Returns:
+            List of CharacterEditsBundle
+        """
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        edits = self.edits
+        return [CharacterEditsBundle(edits[i : i + chunk_size]) for i in range(0, len(edits), chunk_size)]
+
+    def enqueue(self, client: DBClient | AsyncDBClient, chunk_size: int = 50) -> None:
+        """Add the edits to a client's queue, to be sent with client.commit
+
+        Args:
+            client: (Async)DBClient
+            chunk_size: Number of tracks per bundle
+        """
+        for bundle in self.bundles(chunk_size):
+            client.enqueue(bundle)
+
+
+def diff_character_metadata(
+    tracks: Iterable[tuple[CSLTrack, CSLMetadata | None]],
+    artist_to_meta: ArtistToMeta,
+    *,
+    report: UnknownArtistReport | None = None,
+) -> CharacterDiff:
+    """Compare the character metadata of a whole set of tracks against artist_to_meta in one pass
+    Makes the same changes as queue_character_metadata on each track,
+    but against a compiled artist_to_meta and without building a bundle per track
+
+    Args:
+        tracks: Iterable of (track, existing metadata), e.g. from iter_tracks_with_metadata or a Mirror
+        artist_to_meta: {artist: [metas]}, compiled with compile_artist_to_meta if it isn't already
+        report: UnknownArtistReport to collect unknown artists into, defaults to a new one in the returned diff
+
+    Returns:
+        CharacterDiff
+    """
+    compiled = compile_artist_to_meta(artist_to_meta)
+    diff = CharacterDiff() if report is None else CharacterDiff(report=report)
+    edits = diff.edits
+    for track, meta in tracks:
+        diff.tracks += 1
+        edit = _diff_track(compiled, track, meta, diff.report)
+        if edit is not None:
+            edits.append(edit)
+    logger.info(f'Found edits on {len(edits)} of {diff.tracks} tracks')
+    return diff
+
+
+@define
+class PipelineStats:
+    """Progress of a run_pipeline run"""
+
+    #: Tracks with metadata fetched and compared
+    tracks: int = 0
+    #: Tracks whose character metadata was edited
+    written: int = 0
+    #: (track, exception) for each edit that failed
+    failed: list[tuple[CSLTrack, Exception]] = field(factory=list)
+    #: Tracks with artists missing from artist_to_meta
+    report: UnknownArtistReport = field(factory=UnknownArtistReport)
+    #: perf_counter at the start of the run
+    started: float = field(factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the start of the run"""
+        return time.perf_counter() - self.started
+
+    @property
+    def tracks_per_s(self) -> float:
+        """Tracks compared per second"""
+        elapsed = self.elapsed
+        return self.tracks / elapsed if elapsed else 0.0
+
+    @property
+    def writes_per_s(self) -> float:
+        """Edits sent per second"""
+        elapsed = self.elapsed
+        return self.written / elapsed if elapsed else 0.0
+
+
+type ProgressCallback = Callable[[PipelineStats], None]
+
+#: Errors that fail a single edit in run_pipeline instead of the whole run
+_WRITE_ERRORS = (AMQCSLError, httpx.HTTPError, OSError, ValueError)
+
+
+def _character_bundle(
+    track: CSLTrack,
+    artist_to_meta: ArtistToMeta,
+    meta: CSLMetadata | None,
+    unknown_artist_handler: UnknownArtistHandler,
+) -> QueueCharacterMetadataBundle | None:
+    """Make the bundle editing a track's character metadata, or None if nothing needs changing"""
+    if track.type == 'OffVocal':
+        return None
     bundle = QueueCharacterMetadataBundle(track, artist_to_meta, meta, unknown_artist_handler)
     if not any(bundle.bundles):
-        return
-    client.enqueue(bundle)
+        return None
+    return bundle
+
+
+@overload
+def run_pipeline(
+    client: DBClient,
+    group: CSLGroup,
+    artist_to_meta: ArtistToMeta,
+    *,
+    report: UnknownArtistReport | None = None,
+    batch_size: int = 100,
+    max_in_flight: int | None = None,
+    max_pages: int | None = None,
+    max_writes: int | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> PipelineStats: ...
+@overload
+def run_pipeline(
+    client: AsyncDBClient,
+    group: CSLGroup,
+    artist_to_meta: ArtistToMeta,
+    *,
+    report: UnknownArtistReport | None = None,
+    batch_size: int = 100,
+    max_in_flight: int | None = None,
+    max_pages: int | None = None,
+    max_writes: int | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> Awaitable[PipelineStats]: ...
+
+
+def run_pipeline(
+    client: DBClient | AsyncDBClient,
+    group: CSLGroup,
+    artist_to_meta: ArtistToMeta,
+    *,
+    report: UnknownArtistReport | None = None,
+    batch_size: int = 100,
+    max_in_flight: int | None = None,
+    max_pages: int | None = None,
+    max_writes: int | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> PipelineStats | Awaitable[PipelineStats]:
+    """Set the character metadata of every track in a group, streaming tracks through fetching, comparing and writing
+    Edits are sent as soon as they're found instead of being queued until a commit,
+    and the stages are connected by bounded queues, so memory stays constant however large the group is.
+    Unknown artists are collected into a report instead of prompting, see UnknownArtistReport
+
+    Args:
+        client: (Async)DBClient
+        group: Group to edit
+        artist_to_meta: {artist: [metas]}, compiled with compile_artist_to_meta if it isn't already
+        report: UnknownArtistReport to collect unknown artists into, defaults to a new one in the returned stats
+        batch_size: How many tracks to query at once (page size)
+        max_in_flight: Maximum number of tracks with pending metadata fetches, see prefetch_metadata
+        max_pages: Maximum number of pages requested at once with an AsyncDBClient, see iter_tracks
+        max_writes: Maximum number of edits in flight with an AsyncDBClient, defaults to client.max_request_count
+        on_progress: Called with the stats after each track is compared and each edit is sent
+
+    Returns:
+        PipelineStats
+    """
+    stats = PipelineStats() if report is None else PipelineStats(report=report)
+    compiled = compile_artist_to_meta(artist_to_meta)
+
+    def progress() -> None:
+        if on_progress is not None:
+            on_progress(stats)
+
+    def write_done(edit: CharacterEdit, exc: Exception | None) -> None:
+        if exc is None:
+            stats.written += 1
+        else:
+            logger.error(f'Editing {edit.track.name} failed: {exc!r}')
+            stats.failed.append((edit.track, exc))
+        progress()
+
+    match client:
+        case DBClient():
+            for track, meta in client.iter_tracks_with_metadata(groups=[group], batch_size=batch_size):
+                edit = _diff_track(compiled, track, meta, stats.report)
+                stats.tracks += 1
+                progress()
+                if edit is None:
+                    continue
+                try:
+                    client.process(CharacterEditsBundle((edit,)))
+                except _WRITE_ERRORS as e:
+                    write_done(edit, e)
+                else:
+                    write_done(edit, None)
+            logger.info(f'Compared {stats.tracks} tracks and wrote {stats.written} in {stats.elapsed:.1f}s')
+            return stats
+        case AsyncDBClient():
+            writers = client.max_request_count if max_writes is None else max_writes
+            if writers <= 0:
+                raise ValueError('max_writes must be positive')
+
+            async def write(queue: asyncio.Queue[CharacterEdit | None]) -> None:
+                while (edit := await queue.get()) is not None:
+                    try:
+                        await client.process(CharacterEditsBundle((edit,)))
+                    except _WRITE_ERRORS as e:
+                        write_done(edit, e)
+                    else:
+                        write_done(edit, None)
+
+            async def rtn() -> PipelineStats:
+                # Bounded, so fetching pauses while writes are behind instead of queuing every edit
+                queue: asyncio.Queue[CharacterEdit | None] = asyncio.Queue(2 * writers)
+                async with asyncio.TaskGroup() as tg:
+                    for _ in range(writers):
+                        tg.create_task(write(queue))
+                    tracks = client.iter_tracks_with_metadata(
+                        groups=[group], batch_size=batch_size, max_in_flight=max_in_flight, max_pages=max_pages
+                    )
+                    async for track, meta in tracks:
+                        edit = _diff_track(compiled, track, meta, stats.report)
+                        stats.tracks += 1
+                        progress()
+                        if edit is not None:
+                            await queue.put(edit)
+                    # If fetching fails instead, the task group cancels the writers
+                    for _ in range(writers):
+                        await queue.put(None)
+                logger.info(f'Compared {stats.tracks} tracks and wrote {stats.written} in {stats.elapsed:.1f}s')
+                return stats
+
+            return rtn()
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterator, Mapping, Sequence
+
+import httpx
+from attrs import define, field, frozen
+
+from amqcsl import AsyncDBClient
+from amqcsl.exceptions import AMQCSLError
+from amqcsl.objects._db_types import CSLGroup
+
+from .character import (
+    ArtistCache,
+    ArtistDict,
+    ArtistToMeta,
+    CharacterDict,
+    PipelineStats,
+    compact_make_artist_to_meta,
+    make_artist_to_meta,
+    run_pipeline,
+)
+
+__all__ = [
+    'CharacterConfig',
+    'GroupConfig',
+    'GroupResult',
+    'RunnerReport',
+    'run_groups',
+]
+
+logger = logging.getLogger('amqcsl.workflows.runner')
+
+
+@frozen
+class CharacterConfig:
+    """Character dicts of a group, turned into an ArtistToMeta when the group runs"""
+
+    #: ArtistDict, compact (see compact_make_artist_to_meta) if characters is None
+    artists: ArtistDict
+    #: CharacterDict, or None if artists is compact
+    characters: CharacterDict | None = None
+    #: Search phrases to be passed to iter_artists
+    search_phrases: Sequence[str] = ()
+    #: Separator for artist values, defaults to the default of make_artist_to_meta or compact_make_artist_to_meta
+    sep: str | None = None
+
+
+type GroupConfig = CharacterConfig | ArtistToMeta
+
+
+@define
+class GroupResult:
+    """Outcome of one group in run_groups"""
+
+    #: Group
+    group: CSLGroup
+    #: Progress of the group's pipeline, None until it starts
+    stats: PipelineStats | None = None
+    #: Exception that stopped the group, if any
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the group finished without errors or failed edits"""
+        return self.error is None and self.stats is not None and not self.stats.failed
+
+    def summary(self) -> str:
+        """One line summary of the group"""
+        if self.error is not None:
+            return f'{self.group.name}: stopped by {self.error!r}'
+        if self.stats is None:
+            return f'{self.group.name}: not started'
+        stats = self.stats
+        return (
+            f'{self.group.name}: {stats.tracks} tracks, {stats.written} edited, {len(stats.failed)} failed, '
+            f'{len(stats.report)} with unknown artists, {stats.elapsed:.1f}s'
+        )
+
+
+@define
+class RunnerReport:
+    """Results of run_groups, in the order the groups were given"""
+
+    #: {group id: GroupResult}
+    results: dict[str, GroupResult] = field(factory=dict)
+
+    def __iter__(self) -> Iterator[GroupResult]:
+        return iter(self.results.values())
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @property
+    def failed(self) -> list[GroupResult]:
+        """Groups that stopped with an error or had failed edits"""
+        return [result for result in self if not result.ok]
+
+    def summary(self) -> str:
+        """Summary of every group, with errors at the end"""
+        lines = [result.summary() for result in self]
+        failed = self.failed
+        lines.append(f'{len(self) - len(failed)} of {len(self)} groups succeeded')
+        for result in failed:
+            if result.stats is not None:
+                for track, e in result.stats.failed:
+                    lines.append(f'{result.group.name}: editing {track.name} failed: {e!r}')
+        return '\n'.join(lines)
+
+
+#: Errors that stop a single group in run_groups instead of every group
+_GROUP_ERRORS = (AMQCSLError, httpx.HTTPError, OSError, ValueError)
+
+type GroupProgressCallback = Callable[[CSLGroup, PipelineStats], None]
+
+
+async def _artist_to_meta(
+    client: AsyncDBClient,
+    config: GroupConfig,
+    cache: ArtistCache | None,
+    max_searches: int,
+) -> ArtistToMeta:
+    if not isinstance(config, CharacterConfig):
+        return config
+    kwargs = {} if config.sep is None else {'sep': config.sep}
+    if config.characters is None:
+        return await compact_make_artist_to_meta(
+            client, config.artists, config.search_phrases, cache=cache, max_searches=max_searches, **kwargs
+        )
+    return await make_artist_to_meta(
+        client,
+        config.characters,
+        config.artists,
+        config.search_phrases,
+        cache=cache,
+        max_searches=max_searches,
+        **kwargs,
+    )
+
+
+async def run_groups(
+    client: AsyncDBClient,
+    configs: Mapping[CSLGroup, GroupConfig],
+    *,
+    max_groups: int = 4,
+    cache: ArtistCache | None = None,
+    batch_size: int = 100,
+    on_progress: GroupProgressCallback | None = None,
+) -> RunnerReport:
+    """Set the character metadata of several groups concurrently over one client, see run_pipeline
+    At most max_groups groups run at once, and each one is limited to an equal share of client.max_request_count
+    for each of its artist searches, page requests, metadata fetches and edits,
+    so a large group can't starve the others of requests.
+    A group that errors is recorded in the report without stopping the rest
+
+    Args:
+        client: AsyncDBClient
+        configs: {group: CharacterConfig or an already made ArtistToMeta}
+        max_groups: Maximum number of groups running at once
+        cache: ArtistCache shared by every group when resolving artists
+        batch_size: How many tracks to query at once (page size)
+        on_progress: Called with the group and its stats after each track is compared and each edit is sent
+
+    Returns:
+        RunnerReport
+
+    Raises:
+        ValueError: If max_groups isn't positive
+    """
+    if max_groups <= 0:
+        raise ValueError('max_groups must be positive')
+    report = RunnerReport({group.id: GroupResult(group) for group in configs})
+    if not configs:
+        return report
+    workers = min(max_groups, len(configs))
+    share = max(1, client.max_request_count // workers)
+    todo = iter(configs.items())
+
+    async def run(group: CSLGroup, config: GroupConfig) -> None:
+        result = report.results[group.id]
+
+        def progress(stats: PipelineStats) -> None:
+            result.stats = stats
+            if on_progress is not None:
+                on_progress(group, stats)
+
+        logger.info(f'Starting {group.name}')
+        try:
+            artist_to_meta = await _artist_to_meta(client, config, cache, share)
+            result.stats = await run_pipeline(
+                client,
+                group,
+                artist_to_meta,
+                batch_size=batch_size,
+                max_in_flight=share,
+                max_pages=share,
+                max_writes=share,
+                on_progress=progress,
+            )
+        except* _GROUP_ERRORS as group_errors:
+            # Errors from run_pipeline's stages come wrapped in an ExceptionGroup
+            errors = group_errors.exceptions
+            result.error = errors[0] if len(errors) == 1 else group_errors
+            logger.error(f'{group.name} failed: {result.error!r}')
+        else:
+            logger.info(result.summary())
+
+    async def worker() -> None:
+        for group, config in todo:
+            await run(group, config)
+
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(workers):
+            tg.create_task(worker())
+    return report
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import attrs
+import pytest
+from helpers import load
+
+from amqcsl.local import FieldChange, diff_metadata, diff_snapshots, diff_tracks, record_digest
+from amqcsl.objects import CSLGroup, CSLMetadata, CSLTrack, dumps_snapshot, loads_snapshot, save_snapshot
+
+
+@pytest.fixture
+def tracks() -> list[CSLTrack]:
+    return [CSLTrack.from_json(item) for item in load('idolypride/tracks')]
+
+
+def test_diff_tracks(tracks: list[CSLTrack]):
+    assert list(diff_tracks(tracks, tracks)) == []
+
+    renamed = attrs.evolve(tracks[1], name='Top of the Tops!')
+    assert tracks[0].song is not None
+    resung = attrs.evolve(tracks[0], song=attrs.evolve(tracks[0].song, name='Blue sky'))
+    new = [resung, renamed, *tracks[3:]]
+    diffs = list(diff_tracks(tracks, new))
+    assert [(diff.kind, diff.key) for diff in diffs] == [
+        ('changed', tracks[0].id),
+        ('changed', tracks[1].id),
+        ('removed', tracks[2].id),
+    ]
+    assert diffs[0].changes == (FieldChange('song.name', 'Blue sky summer', 'Blue sky'),)
+    assert diffs[1].changes == (FieldChange('name', 'Top of the Tops', 'Top of the Tops!'),)
+    assert diffs[2].old == tracks[2] and diffs[2].new is None
+
+    (added,) = diff_tracks(tracks[1:], tracks)
+    assert added.kind == 'added' and added.new == tracks[0]
+
+
+def test_diff_tracks_shared_objects(tracks: list[CSLTrack]):
+    track = tracks[0]
+    credit = track.artist_credits[0]
+    # The same artist credited twice, as one shared object and as two equal copies
+    shared = attrs.evolve(track, artist_credits=[credit, attrs.evolve(credit, position=1)])
+    copied = attrs.evolve(
+        track,
+        artist_credits=[
+            attrs.evolve(credit, artist=attrs.evolve(credit.artist)),
+            attrs.evolve(credit, artist=attrs.evolve(credit.artist), position=1),
+        ],
+    )
+    assert shared == copied
+    assert record_digest(shared) == record_digest(copied)
+    assert list(diff_tracks([shared], [copied])) == []
+
+    # Groups whose fields share one string against groups with two equal strings
+    name = 'mock-id-group'
+    one_string = CSLGroup(name, name)
+    two_strings = CSLGroup(name, ''.join(['mock-id-', 'group']))
+    assert record_digest(one_string) == record_digest(two_strings)
+
+    # Reloaded copies share their interned objects while parsed ones don't
+    assert list(diff_tracks(tracks, loads_snapshot(dumps_snapshot(tracks)))) == []
+
+
+def test_diff_metadata():
+    meta = CSLMetadata.from_json(load('sunshine/metadata/sukiforyou'))
+    changed = attrs.evolve(meta, override=not meta.override)
+    diffs = list(diff_metadata({'a': meta, 'b': meta, 'c': None}, [('a', changed), ('b', None), ('c', meta)]))
+    assert [(diff.kind, diff.key) for diff in diffs] == [('changed', 'a'), ('added', 'c'), ('removed', 'b')]
+    assert diffs[0].changes == (FieldChange('override', meta.override, changed.override),)
+
+
+def test_diff_snapshots(tmp_path: Path, tracks: list[CSLTrack]):
+    save_snapshot(tmp_path / 'old.snap', tracks)
+    save_snapshot(tmp_path / 'new.snap', tracks[:-1])
+    (removed,) = diff_snapshots(tmp_path / 'old.snap', tmp_path / 'new.snap')
+    assert removed.kind == 'removed'
+    assert removed.old == tracks[-1]
@@ -0,0 +1,119 @@
+import json
+from pathlib import Path
+
+import attrs
+import pytest
+from helpers import load
+from httpx import Request, Response
+from respx import Router
+
+from amqcsl import AsyncDBClient, DBClient
+from amqcsl.local import Mirror
+from amqcsl.objects import CSLMetadata, CSLTrack
+
+
+@pytest.fixture
+def mirror(tmp_path: Path):
+    with Mirror(tmp_path / 'mirror.db') as mirror:
+        yield mirror
+
+
+@pytest.fixture
+def idolypride_tracks() -> list[dict[str, object]]:
+    return load('idolypride/tracks')
+
+
+@pytest.fixture
+def tracks_router(router: Router, idolypride_tracks: list[dict[str, object]]) -> Router:
+    def tracks_route(req: Request):
+        body = json.loads(req.content)
+        if body['groupFilters'] == ['mock-id-group-idolypride']:
+            tracks = idolypride_tracks
+        elif body['activeListId'] == 'mock-id-list-meihayasaka':
+            tracks = idolypride_tracks[:3]
+        else:
+            tracks = []
+        return Response(200, json={'tracks': tracks, 'count': len(tracks)})
+
+    router.post('/api/tracks', name='tracks').mock(side_effect=tracks_route)
+    meta = load('sunshine/metadata/sukiforyou')
+    router.get(url__regex=r'/api/track/([^/]+)/metadata', name='get_meta') % Response(200, json=meta)
+    return router
+
+
+def test_mirror_sync(
+    tracks_router: Router,
+    client: DBClient,
+    mirror: Mirror,
+    idolypride_tracks: list[dict[str, object]],
+):
+    group = client.groups['IDOLY PRIDE']
+    result = mirror.sync(client, [group])
+    expected = [CSLTrack.from_json(data) for data in idolypride_tracks]
+    assert result.added == expected
+    assert tracks_router.routes['get_meta'].call_count == len(expected)
+    assert mirror.last_sync is not None
+
+    assert sorted(mirror.iter_tracks(groups=[group]), key=lambda t: t.id) == sorted(expected, key=lambda t: t.id)
+    assert {t.id for t in mirror.iter_tracks(active_list=mirror.lists['MeiHayasaka'])} == {t.id for t in expected[:3]}
+    assert mirror.get_track(expected[0].id) == expected[0]
+    assert mirror.get_metadata(expected[0]) == CSLMetadata.from_json(load('sunshine/metadata/sukiforyou'))
+    assert mirror.groups == client.groups
+    artist = expected[0].artist_credits[0].artist
+    assert mirror.get_artist(artist.id) == artist
+
+    # Only the changed track is refetched
+    idolypride_tracks[0] = {**idolypride_tracks[0], 'updatedAt': '2026-01-01T00:00:00.000000Z'}
+    removed = idolypride_tracks.pop()
+    result = mirror.sync(client, [group])
+    assert [track.id for track in result.updated] == [idolypride_tracks[0]['id']]
+    assert result.removed == [removed['id']]
+    assert result.unchanged == len(idolypride_tracks) - 1
+    assert tracks_router.routes['get_meta'].call_count == len(expected) + 1
+    assert len(mirror) == len(idolypride_tracks)
+
+
+@pytest.mark.asyncio
+async def test_mirror_async_sync(
+    tracks_router: Router,
+    aclient: AsyncDBClient,
+    mirror: Mirror,
+    idolypride_tracks: list[dict[str, object]],
+):
+    group = aclient.groups['IDOLY PRIDE']
+    result = await mirror.sync(aclient, [group], lists=False)
+    assert {track.id for track in result.added} == {track['id'] for track in idolypride_tracks}
+    assert tracks_router.routes['get_meta'].call_count == len(idolypride_tracks)
+    result = await mirror.sync(aclient, [group], lists=False)
+    assert not result.changed
+    assert tracks_router.routes['get_meta'].call_count == len(idolypride_tracks)
+
+
+def test_mirror_sync_overlapping_groups(
+    tracks_router: Router,
+    client: DBClient,
+    mirror: Mirror,
+    idolypride_tracks: list[dict[str, object]],
+):
+    # Both groups return the same tracks
+    group = client.groups['IDOLY PRIDE']
+    other_group = attrs.evolve(group, name='IDOLY PRIDE (copy)')
+    result = mirror.sync(client, [group, other_group])
+    assert len(result.added) == len(idolypride_tracks)
+    result = mirror.sync(client, [group, other_group])
+    assert result.unchanged == len(idolypride_tracks)
+    meta_route = tracks_router.routes['get_meta']
+    assert meta_route.call_count == len(idolypride_tracks)
+
+    # Metadata edits don't change updatedAt, so they're only picked up when refreshing
+    result = mirror.sync(client, [group], refresh_metadata=True)
+    assert not result.changed
+    assert meta_route.call_count == 2 * len(idolypride_tracks)
+
+    # Deleted lists don't leave their tracks behind
+    mei_list = mirror.lists['MeiHayasaka']
+    assert len(list(mirror.iter_tracks(active_list=mei_list))) == 3
+    del client.lists['MeiHayasaka']
+    mirror.sync(client, [group], metadata=False)
+    assert 'MeiHayasaka' not in mirror.lists
+    assert not list(mirror.iter_tracks(active_list=mei_list))
@@ -0,0 +1,45 @@
+import pytest
+from helpers import load
+
+from amqcsl.exceptions import QueryError
+from amqcsl.local import TrackQueryEngine
+from amqcsl.objects import CSLGroup, CSLList, CSLTrack
+
+
+@pytest.fixture
+def tracks() -> list[CSLTrack]:
+    data = [*load('idolypride/tracks'), *load('sunshine/tracks'), *load('superstar/aspire')]
+    return [CSLTrack.from_json(item) for item in data]
+
+
+@pytest.fixture
+def engine(tracks: list[CSLTrack]) -> TrackQueryEngine:
+    return TrackQueryEngine(tracks, {'mock-id-list-yousoro': [tracks[8].id, 'mock-id-track-missing']})
+
+
+def test_query_groups(engine: TrackQueryEngine, tracks: list[CSLTrack]):
+    idoly_pride = CSLGroup('mock-id-group-idolypride', 'IDOLY PRIDE')
+    sunshine = CSLGroup('mock-id-group-lovelivesunshine', 'Love Live! Sunshine!!')
+    assert list(engine.iter_tracks(groups=[idoly_pride])) == tracks[:8]
+    assert list(engine.iter_tracks(groups=[idoly_pride, sunshine])) == tracks[:10]
+    assert list(engine.iter_tracks()) == tracks
+    assert engine.count(groups=[CSLGroup('mock-id-group-missing', 'Missing')]) == 0
+
+
+def test_query_filters(engine: TrackQueryEngine, tracks: list[CSLTrack]):
+    expected = [track for track in tracks if track.audio_id is None]
+    assert expected
+    assert list(engine.iter_tracks(missing_audio=True)) == expected
+    assert tracks[10] in engine.iter_tracks(missing_info=True)
+
+    yousoro = CSLList('mock-id-list-yousoro', 'yousoro', 2)
+    assert list(engine.iter_tracks(active_list=yousoro)) == [tracks[8]]
+    assert engine.count(active_list=yousoro, from_active_list=False) == len(tracks)
+    with pytest.raises(QueryError):
+        list(engine.iter_tracks(active_list=CSLList('mock-id-list-bocchi', 'bocchi', 5)))
+
+
+def test_query_search(engine: TrackQueryEngine, tracks: list[CSLTrack]):
+    assert {track.id for track in engine.iter_tracks('suki FOR you')} == {track.id for track in tracks[8:10]}
+    assert [track.id for track in engine.iter_tracks('Blue sky')] == ['mock-id-track-blueskysummer']
+    assert engine.count('LizNoir') == engine.count('liznoir') > 0
@@ -0,0 +1,50 @@
+import pytest
+from helpers import load
+
+from amqcsl.local import NameIndex, normalize_name, tokenize_name
+from amqcsl.objects import CSLArtistSample, CSLSongSample, CSLTrack
+
+
+@pytest.fixture
+def index() -> NameIndex:
+    data = [*load('idolypride/tracks'), *load('sunshine/tracks'), *load('superstar/aspire')]
+    return NameIndex.from_objects(CSLTrack.from_json(item) for item in data)
+
+
+def test_normalize_name():
+    assert normalize_name('ＬｉｚＮｏｉｒ') == 'liznoir'
+    assert normalize_name('パジャマ') == normalize_name('ぱじゃま')
+    assert normalize_name('Pokémon') == 'pokemon'
+    assert normalize_name('ガ') == 'が'
+    assert tokenize_name('SUKI for you, DREAM for you!') == ['suki', 'for', 'you', 'dream', 'for', 'you']
+
+
+def test_name_index_from_objects(index: NameIndex):
+    artist = CSLArtistSample('mock-id-artist-liznoir', 'LizNoir', 'LizNoir', 'Idoly Pride', 2)
+    assert artist in index
+    assert len(index.search_artists('liella')) == 1
+    assert len(index.search_songs('suki')) == 1
+    assert len(index.search_tracks('suki')) == 2
+
+
+def test_name_index_search(index: NameIndex):
+    (match, *_) = index.search('ＬｉｚＮｏｉｒ')
+    assert match.obj.name == 'LizNoir'
+    assert match.score == 1
+    assert match.field == 'name'
+
+    (pajapa,) = index.search_artists('ぱじゃぱ')
+    assert pajapa.original_name == 'ぱじゃパ!'
+    assert [artist.name for artist in index.search_artists('サニー')] == ['Sunny Peace']
+    assert index.search_artists('サニー', limit=0) == []
+    assert index.search('sunny pea', prefix=False) == []
+
+    matches = index.search('sunny peace')
+    assert matches[0].score >= matches[-1].score
+    assert {type(match.obj) for match in matches} == {CSLArtistSample, CSLSongSample, CSLTrack}
+    # Credit matches rank below name matches
+    (by_name, by_credit) = index.search('aqours')
+    assert isinstance(by_name.obj, CSLArtistSample)
+    assert by_credit.field == 'credit'
+    assert by_credit.score < by_name.score
+    assert index.search('!!') == []
@@ -1,11 +1,18 @@
+import json
+import threading
+from collections.abc import Callable, Iterable
 from pathlib import Path
 
+import attrs
+import pytest
 from helpers import load
-from httpx import Response
+from httpx import ReadTimeout, Request, Response
 from respx import Router
 
-from amqcsl import DBClient
-from amqcsl.objects import AlbumTrack, CSLArtist, CSLMetadata, CSLSong, ExtraMetadata
+from amqcsl import DBClient, SerialExecutor, ThreadExecutor
+from amqcsl.clients.bundles import STDLIB_JSON_CODEC, JSONCodec
+from amqcsl.local import AudioManifest
+from amqcsl.objects import AlbumTrack, CSLArtist, CSLMetadata, CSLSong, CSLTrack, ExtraMetadata
 from amqcsl.objects._db_types import ArtistCredit, CSLArtistSample
 
 
@@ -81,6 +88,69 @@ def test_track_with_pages(router: Router, client: DBClient):
     assert second_page.call_count == 1
 
 
+def test_track_with_pages_executors(router: Router, tmp_path: Path, mock_id: str):
+    expected = load('idolypride/tracks')
+
+    def tracks_route(req: Request):
+        body = json.loads(req.content)
+        page = expected[body['skip'] : body['skip'] + body['take']]
+        return Response(200, json={'tracks': page, 'count': len(expected)})
+
+    route = router.post('/api/tracks', name='tracks').mock(side_effect=tracks_route)
+    session_path = tmp_path / 'amq_session.txt'
+    session_path.write_text(mock_id)
+    for executor in (SerialExecutor(), ThreadExecutor(max_workers=2)):
+        with DBClient(session_path=session_path, executor=executor) as client:
+            group = client.groups['IDOLY PRIDE']
+            tracks = [track.id for track in client.iter_tracks(groups=[group], batch_size=3)]
+        assert tracks == [track['id'] for track in expected]
+    assert route.call_count == 6
+
+
+def test_client_executor_ownership(router: Router, tmp_path: Path, mock_id: str):
+    class RecordingExecutor:
+        concurrent = False
+
+        def __init__(self) -> None:
+            self.closed = False
+
+        def map[T, R](self, func: Callable[[T], R], items: Iterable[T]) -> list[R]:
+            return [func(item) for item in items]
+
+        def close(self) -> None:
+            self.closed = True
+
+    session_path = tmp_path / 'amq_session.txt'
+    session_path.write_text(mock_id)
+    # Executors passed in belong to the caller, so the client leaves them open
+    executor = RecordingExecutor()
+    with DBClient(session_path=session_path, executor=executor) as client:
+        assert client.executor is executor
+    assert not executor.closed
+
+    with pytest.raises(TypeError):
+        DBClient(executor=object())  # type: ignore[reportArgumentType]
+
+
+def test_thread_executor_nested():
+    executor = ThreadExecutor(max_workers=2)
+    threads: set[str] = set()
+
+    def double(x: int) -> int:
+        threads.add(threading.current_thread().name)
+        return 2 * x
+
+    def outer(xs: list[int]) -> list[int]:
+        return executor.map(double, xs)
+
+    # Every outer item occupies a worker, so the inner maps would deadlock if they waited on the pool
+    assert executor.map(outer, [[1, 2], [3, 4], [5, 6]]) == [[2, 4], [6, 8], [10, 12]]
+    assert threads and all(name.startswith('amqcsl') for name in threads)
+    executor.close()
+    assert executor.map(double, [1, 2]) == [2, 4]
+    executor.close()
+
+
 def test_track_search(router: Router, client: DBClient):
     expected = load('idolypride/tracks')
     target_track_id = 'mock-id-track-blueskysummer'
@@ -220,6 +290,24 @@ def test_get_no_metadata(router: Router, client: DBClient):
     assert meta_route.call_count == 1
 
 
+def test_iter_tracks_with_metadata(router: Router, client: DBClient):
+    expected_tracks = load('sunshine/tracks')
+    expected_meta = load('sunshine/metadata/sukiforyou')
+    router.post(
+        '/api/tracks',
+        name='iter_tracks',
+        json__searchTerm='SUKI for you',
+    ) % Response(200, json={'tracks': expected_tracks, 'count': len(expected_tracks)})
+    meta_route = router.get(url__regex=r'/api/track/([^/]+)/metadata', name='get_meta') % Response(
+        200, json=expected_meta
+    )
+
+    pairs = list(client.iter_tracks_with_metadata('SUKI for you'))
+    assert [track.id for track, _ in pairs] == [track['id'] for track in expected_tracks]
+    assert all(meta == CSLMetadata.from_json(expected_meta) for _, meta in pairs)
+    assert meta_route.call_count == len(expected_tracks)
+
+
 def test_create_list(router: Router, client: DBClient, cookies: dict[str, str]):
     lists_route = router.get('/api/lists', name='lists', cookies=cookies)
     lists = load('lists')
@@ -288,6 +376,67 @@ def test_list_edit(router: Router, client: DBClient):
     assert route.call_count == 1
 
 
+def test_list_edit_chunked(router: Router, client: DBClient):
+    tracks_json = load('idolypride/tracks')
+    tracks = [CSLTrack.from_json(track) for track in tracks_json]
+    _ = router.post(
+        '/api/tracks',
+        name='list_tracks',
+        json__activeListId='mock-id-list-meihayasaka',
+    ) % Response(200, json={'tracks': tracks_json[:3], 'count': 3})
+    failed: list[str] = []
+
+    def list_route(req: Request) -> Response:
+        body = json.loads(req.content)
+        if tracks[5].id in body['addSongIds'] and not failed:
+            failed.append(tracks[5].id)
+            return Response(500)
+        return Response(200)
+
+    route = router.put('/api/list/mock-id-list-meihayasaka', name='list_edit')
+    route.side_effect = list_route
+    mei_list = client.lists['MeiHayasaka']
+    result = client.list_edit_chunked(
+        mei_list,
+        add=tracks[2:6],
+        remove=[tracks[0], tracks[7]],
+        chunk_size=2,
+        retry_delay=0,
+    )
+    assert result.ok
+    assert result.skipped == 2
+    assert [chunk.items for chunk in result.added] == [tuple(tracks[3:5]), (tracks[5],)]
+    assert [chunk.attempts for chunk in result.added] == [1, 2]
+    assert [chunk.items for chunk in result.removed] == [(tracks[0],)]
+    assert route.call_count == 4
+
+
+def test_list_edit_chunked_errors(router: Router, client: DBClient):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')]
+    timed_out: list[str] = []
+
+    def list_route(req: Request) -> Response:
+        body = json.loads(req.content)
+        if tracks[0].id in body['addSongIds'] and not timed_out:
+            timed_out.append(tracks[0].id)
+            raise ReadTimeout('timed out', request=req)
+        if tracks[3].id in body['addSongIds']:
+            raise ReadTimeout('timed out', request=req)
+        if tracks[2].id in body['addSongIds']:
+            return Response(400)
+        return Response(200)
+
+    route = router.put('/api/list/mock-id-list-meihayasaka', name='list_edit')
+    route.side_effect = list_route
+    mei_list = client.lists['MeiHayasaka']
+    result = client.list_edit_chunked(mei_list, add=tracks[:4], diff=False, chunk_size=1, retry_delay=0)
+    assert not result.ok
+    assert [chunk.attempts for chunk in result.added] == [2, 1, 1, 3]
+    assert [chunk.status_code for chunk in result.added] == [200, 200, 400, None]
+    assert isinstance(result.added[3].error, ReadTimeout)
+    assert route.call_count == 7
+
+
 def test_add_group(router: Router, client: DBClient):
     route = router.post(
         '/api/group',
@@ -336,6 +485,21 @@ def test_track_add_metadata(router: Router, client: DBClient):
     assert route.call_count == 1
 
 
+def test_track_add_metadata_batch(router: Router, client: DBClient):
+    tracks = [CSLTrack.from_json(track) for track in load('sunshine/tracks')]
+    meta = CSLMetadata.from_json(load('sunshine/metadata/sukiforyou'))
+    route = router.post(url__regex=r'/api/track/([^/]+)/metadata', name='post_meta') % Response(200)
+    client.track_add_metadata_batch(
+        [
+            (tracks[0], [ExtraMetadata.simplify(meta.extra_metas[0])]),
+            (tracks[1], [ExtraMetadata(True, 'Character', 'You Watanabe')]),
+        ],
+        existing_metas={tracks[0].id: meta},
+    )
+    assert route.call_count == 1
+    assert route.calls.last.request.url.path == f'/api/track/{tracks[1].id}/metadata'
+
+
 def test_track_add_metadata_artist_credit(router: Router, client: DBClient):
     target_id = 'mock-id-track-sukiforyou-you'
     track_json = next(
@@ -468,6 +632,17 @@ def test_track_edit(router: Router, client: DBClient):
     assert route.call_count == 1
 
 
+def test_tracks_edit(router: Router, client: DBClient):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')[:5]]
+    route = router.put(url__regex=r'/api/track/([^/]+)', name='put_track', json__type=2)
+    route.side_effect = lambda req: Response(500 if req.url.path.endswith(tracks[2].id) else 200)
+    results = client.tracks_edit(tracks, type='Instrumental', chunk_size=2)
+    assert route.call_count == 3
+    assert [result.items for result in results] == [tuple(tracks[:2]), tuple(tracks[2:4]), tuple(tracks[4:])]
+    assert [result.ok for result in results] == [True, False, True]
+    assert json.loads(route.calls[0].request.content)['batchSongIds'] == [tracks[0].id, tracks[1].id]
+
+
 def test_add_album(router: Router, client: DBClient):
     album_name = 'Love Live! Sunshine!! Duo & Trio Collection CD Vol. 2 Winter Vacation'
     original_album_name = 'Duo & Trio Collection CD Vol. 2 Winter Vacation'
@@ -526,3 +701,89 @@ def test_add_audio(router: Router, client: DBClient, tmp_path: Path):
     client.add_audio(track, audio_path)
     assert presign_route.call_count == 1
     assert upload_route.call_count == 1
+
+
+def test_json_codec(router: Router, tmp_path: Path, mock_id: str):
+    calls = {'loads': 0, 'dumps': 0}
+
+    def loads(content: bytes):
+        calls['loads'] += 1
+        return STDLIB_JSON_CODEC.loads(content)
+
+    def dumps(obj: object) -> bytes:
+        calls['dumps'] += 1
+        return STDLIB_JSON_CODEC.dumps(obj)
+
+    expected = load('idolypride/tracks')
+    route = router.post(
+        '/api/tracks',
+        name='tracks',
+        json__groupFilters__0='mock-id-group-idolypride',
+    ) % Response(200, json={'tracks': expected, 'count': len(expected)})
+    session_path = tmp_path / 'amq_session.txt'
+    session_path.write_text(mock_id)
+    codec = JSONCodec('counting', loads, dumps)
+    with DBClient(session_path=session_path, json_codec=codec) as client:
+        assert calls == {'loads': 1, 'dumps': 0}
+        group = client.groups['IDOLY PRIDE']
+        tracks = [track.id for track in client.iter_tracks(groups=[group])]
+    assert tracks == [track['id'] for track in expected]
+    assert route.call_count == 1
+    assert calls == {'loads': 3, 'dumps': 1}
+
+
+def test_add_audio_many(router: Router, client: DBClient, tmp_path: Path):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')[:4]]
+    paths = [tmp_path / f'audio{i}.mp3' for i in range(len(tracks))]
+    for path in paths:
+        path.write_bytes(b'abcde')
+
+    def presign(req: Request) -> Response:
+        if tracks[1].id in req.url.path:
+            return Response(500)
+        if tracks[2].id in req.url.path:
+            # A file going missing mid-run fails its track, not the run
+            paths[3].unlink()
+        track_id = req.url.path.split('/')[3]
+        return Response(200, json={'sessionId': track_id, 'key': 'mock-key', 'url': 'https://mock-url'})
+
+    presign_route = router.post(url__regex=r'/api/track/([^/]+)/presigned-upload', name='presign')
+    presign_route.side_effect = presign
+    upload_route = router.post('https://mock-url', name='upload') % Response(200)
+
+    report = client.add_audio_many(zip(tracks, paths))
+    assert presign_route.call_count == 3
+    assert upload_route.call_count == 2
+    assert [track.id for track in report.uploaded] == [tracks[0].id, tracks[2].id]
+    assert [track for track, _ in report.failed] == [tracks[1], tracks[3]]
+    assert isinstance(report.failed[1][1], FileNotFoundError)
+    assert report.bytes_uploaded == 10
+    assert report.mb_per_s > 0
+
+
+def test_add_audio_many_manifest(router: Router, client: DBClient, tmp_path: Path):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')[:2]]
+    assert all(track.audio_id is not None for track in tracks)
+    paths = [tmp_path / f'audio{i}.mp3' for i in range(len(tracks))]
+    for i, path in enumerate(paths):
+        path.write_bytes(b'abcde' * (i + 1))
+    presign_route = router.post(url__regex=r'/api/track/([^/]+)/presigned-upload', name='presign') % Response(
+        200, json={'sessionId': 'mock-sessionid', 'key': 'mock-key', 'url': 'https://mock-url'}
+    )
+    upload_route = router.post('https://mock-url', name='upload') % Response(200)
+
+    with AudioManifest(tmp_path / 'manifest.json') as manifest:
+        report = client.add_audio_many(zip(tracks, paths), manifest=manifest)
+    assert len(report.uploaded) == 2
+    assert upload_route.call_count == 2
+
+    paths[1].write_bytes(b'changed')
+    renamed = attrs.evolve(tracks[0], audio_name='mock-audio-other.webm')
+    manifest = AudioManifest(tmp_path / 'manifest.json')
+    report = client.add_audio_many(zip(tracks, paths), manifest=manifest)
+    assert report.skipped == [tracks[0]]
+    assert report.uploaded == [tracks[1]]
+    # Audio replaced on the db since the upload gets uploaded again
+    report = client.add_audio_many([(renamed, paths[0])], manifest=manifest)
+    assert report.uploaded == [renamed]
+    assert presign_route.call_count == 4
@@ -1,12 +1,24 @@
+import asyncio
+import json
 from pathlib import Path
 
 import pytest
 from helpers import load
-from httpx import Response
+from httpx import ConnectError, ReadTimeout, Request, Response
 from respx import Router
 
-from amqcsl import AsyncDBClient
-from amqcsl.objects import AlbumTrack, ArtistCredit, CSLArtist, CSLArtistSample, CSLMetadata, CSLSong, ExtraMetadata
+from amqcsl import AsyncDBClient, AsyncioExecutor
+from amqcsl.local import UploadJournal
+from amqcsl.objects import (
+    AlbumTrack,
+    ArtistCredit,
+    CSLArtist,
+    CSLArtistSample,
+    CSLMetadata,
+    CSLSong,
+    CSLTrack,
+    ExtraMetadata,
+)
 
 
 @pytest.mark.asyncio
@@ -86,6 +98,33 @@ async def test_track_with_pages(router: Router, aclient: AsyncDBClient):
     assert second_page.call_count == 1
 
 
+@pytest.mark.asyncio
+async def test_track_with_pages_executor(router: Router, tmp_path: Path, mock_id: str):
+    expected = load('idolypride/tracks')
+    running = 0
+    max_running = 0
+
+    async def tracks_route(req: Request):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        body = json.loads(req.content)
+        page = expected[body['skip'] : body['skip'] + body['take']]
+        return Response(200, json={'tracks': page, 'count': len(expected)})
+
+    route = router.post('/api/tracks', name='tracks').mock(side_effect=tracks_route)
+    session_path = tmp_path / 'amq_session.txt'
+    session_path.write_text(mock_id)
+    async with AsyncDBClient(session_path=session_path, executor=AsyncioExecutor(limit=2)) as client:
+        group = client.groups['IDOLY PRIDE']
+        tracks = [track.id async for track in client.iter_tracks(groups=[group], batch_size=1)]
+    assert tracks == [track['id'] for track in expected]
+    assert route.call_count == len(expected)
+    assert max_running == 2
+
+
 @pytest.mark.asyncio
 async def test_track_search(router: Router, aclient: AsyncDBClient):
     expected = load('idolypride/tracks')
@@ -302,6 +341,69 @@ async def test_list_edit(router: Router, aclient: AsyncDBClient):
     assert route.call_count == 1
 
 
+@pytest.mark.asyncio
+async def test_list_edit_chunked(router: Router, aclient: AsyncDBClient):
+    tracks_json = load('idolypride/tracks')
+    tracks = [CSLTrack.from_json(track) for track in tracks_json]
+    _ = router.post(
+        '/api/tracks',
+        name='list_tracks',
+        json__activeListId='mock-id-list-meihayasaka',
+    ) % Response(200, json={'tracks': tracks_json[:3], 'count': 3})
+    failed: list[str] = []
+
+    def list_route(req: Request) -> Response:
+        body = json.loads(req.content)
+        if tracks[5].id in body['addSongIds'] and not failed:
+            failed.append(tracks[5].id)
+            return Response(500)
+        return Response(200)
+
+    route = router.put('/api/list/mock-id-list-meihayasaka', name='list_edit')
+    route.side_effect = list_route
+    mei_list = aclient.lists['MeiHayasaka']
+    result = await aclient.list_edit_chunked(
+        mei_list,
+        add=tracks[2:6],
+        remove=[tracks[0], tracks[7]],
+        chunk_size=2,
+        retry_delay=0,
+    )
+    assert result.ok
+    assert result.skipped == 2
+    assert [chunk.items for chunk in result.added] == [tuple(tracks[3:5]), (tracks[5],)]
+    assert [chunk.attempts for chunk in result.added] == [1, 2]
+    assert [chunk.items for chunk in result.removed] == [(tracks[0],)]
+    assert route.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_list_edit_chunked_errors(router: Router, aclient: AsyncDBClient):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')]
+    timed_out: list[str] = []
+
+    def list_route(req: Request) -> Response:
+        body = json.loads(req.content)
+        if tracks[0].id in body['addSongIds'] and not timed_out:
+            timed_out.append(tracks[0].id)
+            raise ReadTimeout('timed out', request=req)
+        if tracks[3].id in body['addSongIds']:
+            raise ReadTimeout('timed out', request=req)
+        if tracks[2].id in body['addSongIds']:
+            return Response(400)
+        return Response(200)
+
+    route = router.put('/api/list/mock-id-list-meihayasaka', name='list_edit')
+    route.side_effect = list_route
+    mei_list = aclient.lists['MeiHayasaka']
+    result = await aclient.list_edit_chunked(mei_list, add=tracks[:4], diff=False, chunk_size=1, retry_delay=0)
+    assert not result.ok
+    assert [chunk.attempts for chunk in result.added] == [2, 1, 1, 3]
+    assert [chunk.status_code for chunk in result.added] == [200, 200, 400, None]
+    assert isinstance(result.added[3].error, ReadTimeout)
+    assert route.call_count == 7
+
+
 @pytest.mark.asyncio
 async def test_add_group(router: Router, aclient: AsyncDBClient):
     route = router.post(
@@ -352,6 +454,22 @@ async def test_track_add_metadata(router: Router, aclient: AsyncDBClient):
     assert route.call_count == 1
 
 
+@pytest.mark.asyncio
+async def test_track_add_metadata_batch(router: Router, aclient: AsyncDBClient):
+    tracks = [CSLTrack.from_json(track) for track in load('sunshine/tracks')]
+    meta = CSLMetadata.from_json(load('sunshine/metadata/sukiforyou'))
+    route = router.post(url__regex=r'/api/track/([^/]+)/metadata', name='post_meta') % Response(200)
+    await aclient.track_add_metadata_batch(
+        [
+            (tracks[0], [ExtraMetadata.simplify(meta.extra_metas[0])]),
+            (tracks[1], [ExtraMetadata(True, 'Character', 'You Watanabe')]),
+        ],
+        existing_metas={tracks[0].id: meta},
+    )
+    assert route.call_count == 1
+    assert route.calls.last.request.url.path == f'/api/track/{tracks[1].id}/metadata'
+
+
 @pytest.mark.asyncio
 async def test_track_add_metadata_artist_credit(router: Router, aclient: AsyncDBClient):
     target_id = 'mock-id-track-sukiforyou-you'
@@ -488,6 +606,18 @@ async def test_track_edit(router: Router, aclient: AsyncDBClient):
     assert route.call_count == 1
 
 
+@pytest.mark.asyncio
+async def test_tracks_edit(router: Router, aclient: AsyncDBClient):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')[:5]]
+    route = router.put(url__regex=r'/api/track/([^/]+)', name='put_track', json__type=2)
+    route.side_effect = lambda req: Response(500 if req.url.path.endswith(tracks[2].id) else 200)
+    results = await aclient.tracks_edit(tracks, type='Instrumental', chunk_size=2)
+    assert route.call_count == 3
+    assert [result.items for result in results] == [tuple(tracks[:2]), tuple(tracks[2:4]), tuple(tracks[4:])]
+    assert [result.ok for result in results] == [True, False, True]
+    assert json.loads(route.calls[0].request.content)['batchSongIds'] == [tracks[0].id, tracks[1].id]
+
+
 @pytest.mark.asyncio
 async def test_add_album(router: Router, aclient: AsyncDBClient):
     album_name = 'Love Live! Sunshine!! Duo & Trio Collection CD Vol. 2 Winter Vacation'
@@ -548,3 +678,160 @@ async def test_add_audio(router: Router, aclient: AsyncDBClient, tmp_path: Path)
     await aclient.add_audio(track, audio_path)
     assert presign_route.call_count == 1
     assert upload_route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_iter_tracks_with_metadata(router: Router, aclient: AsyncDBClient):
+    expected_tracks = load('idolypride/tracks')
+    expected_meta = load('sunshine/metadata/sukiforyou')
+    router.post(
+        '/api/tracks',
+        name='tracks',
+        json__groupFilters__0='mock-id-group-idolypride',
+    ) % Response(200, json={'tracks': expected_tracks, 'count': len(expected_tracks)})
+    meta_route = router.get(url__regex=r'/api/track/([^/]+)/metadata', name='get_meta')
+    meta_route.side_effect = lambda req: (
+        Response(404, json=load('errors/no_meta'))
+        if req.url.path.endswith(f'{expected_tracks[0]["id"]}/metadata')
+        else Response(200, json=expected_meta)
+    )
+    idoly_pride_group = aclient.groups['IDOLY PRIDE']
+
+    pairs = [pair async for pair in aclient.iter_tracks_with_metadata(groups=[idoly_pride_group], max_in_flight=3)]
+    assert [track.id for track, _ in pairs] == [track['id'] for track in expected_tracks]
+    assert pairs[0][1] is None
+    assert all(meta == CSLMetadata.from_json(expected_meta) for _, meta in pairs[1:])
+    assert meta_route.call_count == len(expected_tracks)
+
+    tracks = [track for track, _ in pairs]
+    unordered = [pair async for pair in aclient.prefetch_metadata(tracks, ordered=False, max_in_flight=2)]
+    assert sorted(unordered, key=lambda pair: pair[0].id) == sorted(pairs, key=lambda pair: pair[0].id)
+
+    # Stopping early cancels and awaits the remaining fetches, and closes the source
+    closed = False
+
+    async def source():
+        nonlocal closed
+        try:
+            for track in tracks:
+                yield track
+        finally:
+            closed = True
+
+    fetched = aclient.prefetch_metadata(source())
+    async for track, _ in fetched:
+        assert track == tracks[0]
+        break
+    await fetched.aclose()
+    assert closed
+    assert {task for task in asyncio.all_tasks() if task is not asyncio.current_task()} == set()
+
+
+@pytest.mark.asyncio
+async def test_add_audio_many(router: Router, aclient: AsyncDBClient, tmp_path: Path):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')[:4]]
+    paths = [tmp_path / f'audio{i}.mp3' for i in range(len(tracks))]
+    for path in paths:
+        path.write_bytes(b'abcde')
+
+    def presign(req: Request) -> Response:
+        if tracks[1].id in req.url.path:
+            return Response(500)
+        track_id = req.url.path.split('/')[3]
+        return Response(200, json={'sessionId': track_id, 'key': 'mock-key', 'url': 'https://mock-url'})
+
+    presign_route = router.post(url__regex=r'/api/track/([^/]+)/presigned-upload', name='presign')
+    presign_route.side_effect = presign
+    upload_route = router.post('https://mock-url', name='upload') % Response(200)
+
+    report = await aclient.add_audio_many(zip(tracks, paths), max_uploads=2, max_bytes_in_flight=3)
+    req = upload_route.calls.last.request
+    assert int(req.headers['Content-Length']) == len(req.content)
+    assert b'filename="audio' in req.content
+    assert b'\r\n\r\nabcde\r\n--' in req.content
+    assert presign_route.call_count == 4
+    assert upload_route.call_count == 3
+    assert {track.id for track in report.uploaded} == {tracks[0].id, tracks[2].id, tracks[3].id}
+    assert [track for track, _ in report.failed] == [tracks[1]]
+    assert report.bytes_uploaded == 15
+    assert report.mb_per_s > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'limits',
+    [
+        {'max_uploads': 0},
+        {'max_bytes_in_flight': 0},
+        {'presign_ahead': 0},
+        {'presign_ahead': -1},
+        {'upload_retries': -1},
+    ],
+)
+async def test_add_audio_many_limits(aclient: AsyncDBClient, tmp_path: Path, limits: dict[str, int]):
+    track = CSLTrack.from_json(load('idolypride/tracks')[0])
+    path = tmp_path / 'audio.mp3'
+    path.write_bytes(b'abcde')
+    with pytest.raises(ValueError):
+        await aclient.add_audio_many([(track, path)], **limits)
+
+
+@pytest.mark.asyncio
+async def test_add_audio_many_resume(
+    router: Router,
+    aclient: AsyncDBClient,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    tracks = [CSLTrack.from_json(track) for track in load('idolypride/tracks')[:2]]
+    paths = [tmp_path / f'audio{i}.flac' for i in range(len(tracks))]
+    for path in paths:
+        path.write_bytes(b'abcde')
+
+    def presign(req: Request) -> Response:
+        track_id = req.url.path.split('/')[3]
+        return Response(200, json={'sessionId': track_id, 'key': 'mock-key', 'url': 'https://mock-url'})
+
+    attempts: dict[str, int] = {}
+
+    def upload(req: Request) -> Response:
+        session_id = req.url.params['sessionId']
+        attempts[session_id] = attempts.get(session_id, 0) + 1
+        if session_id == tracks[0].id and attempts[session_id] == 1:
+            raise ConnectError('Connection dropped')
+        if session_id == tracks[1].id:
+            return Response(503)
+        return Response(200)
+
+    presign_route = router.post(url__regex=r'/api/track/([^/]+)/presigned-upload', name='presign')
+    presign_route.side_effect = presign
+    upload_route = router.post('https://mock-url', name='upload')
+    upload_route.side_effect = upload
+
+    journal = UploadJournal(tmp_path / 'journal.json')
+    saves = 0
+    save = journal.save
+
+    def count_saves() -> None:
+        nonlocal saves
+        saves += 1
+        save()
+
+    monkeypatch.setattr(journal, 'save', count_saves)
+    report = await aclient.add_audio_many(zip(tracks, paths), journal=journal, upload_retries=1, retry_delay=0)
+    assert report.uploaded == [tracks[0]]
+    assert report.pending == [tracks[1]]
+    assert attempts == {tracks[0].id: 2, tracks[1].id: 2}
+    assert presign_route.call_count == 2
+    # Presigns and uploads are written in batches, not once each
+    assert saves == 1
+
+    # The next run reuses the journaled session instead of presigning again
+    upload_route.side_effect = None
+    upload_route.return_value = Response(200)
+    journal = UploadJournal(tmp_path / 'journal.json')
+    assert journal.pending() == [tracks[1].id]
+    report = await aclient.add_audio_many([(tracks[1], paths[1])], journal=journal)
+    assert report.uploaded == [tracks[1]]
+    assert presign_route.call_count == 2
+    assert journal.pending() == []
@@ -0,0 +1,108 @@
+import datetime as dt
+import json
+import pickle
+import struct
+from pathlib import Path
+
+import pytest
+from helpers import load
+
+from amqcsl.exceptions import SnapshotError
+from amqcsl.objects import (
+    CSLArtist,
+    CSLMetadata,
+    CSLSong,
+    CSLTrack,
+    TrackStore,
+    dumps_snapshot,
+    load_snapshot,
+    loads_snapshot,
+    save_snapshot,
+    write_track_store,
+)
+
+
+def test_track_cached_properties():
+    tracks = [CSLTrack.from_json(data) for data in load('idolypride/tracks')]
+    for track in tracks:
+        assert track.updated_at is track.updated_at
+        assert track.updated_at == dt.datetime.fromisoformat(track.str_updated_at)
+        assert track.updated_timestamp == int(track.updated_at.timestamp() * 1_000_000)
+        assert track.created_timestamp == int(track.created_at.timestamp() * 1_000_000)
+        assert track.simp is track.simp
+        assert track.str_artist_credits is track.str_artist_credits
+    assert sorted(tracks, key=lambda track: track.updated_at) == sorted(
+        tracks, key=lambda track: track.updated_timestamp
+    )
+
+
+def test_cached_properties_do_not_affect_equality():
+    data = load('idolypride/songs/blueskysummer')
+    song = CSLSong.from_json(data)
+    _ = song.created_at, song.created_timestamp
+    assert song == CSLSong.from_json(data)
+
+
+def test_snapshot_roundtrip(tmp_path: Path):
+    tracks = [CSLTrack.from_json(data) for data in load('idolypride/tracks')]
+    artists = [CSLArtist.from_json(load('sunshine/artists/shukasaitou'))]
+    metas = [CSLMetadata.from_json(load('sunshine/metadata/sukiforyou'))]
+    objs = [*tracks, *artists, *metas]
+    path = tmp_path / 'tracks.snap'
+    save_snapshot(path, objs)
+    loaded = load_snapshot(path)
+    assert loaded == objs
+    assert [type(obj) for obj in loaded] == [type(obj) for obj in objs]
+
+
+def test_snapshot_interning():
+    tracks = [CSLTrack.from_json(data) for data in load('idolypride/tracks')]
+    loaded: list[CSLTrack] = loads_snapshot(dumps_snapshot(tracks))
+    groups = {id(group) for track in loaded for group in track.groups}
+    assert len(groups) == len({group for track in tracks for group in track.groups})
+    artists = {id(cred.artist) for track in loaded for cred in track.artist_credits}
+    assert len(artists) == len({cred.artist for track in tracks for cred in track.artist_credits})
+
+
+def test_snapshot_invalid():
+    with pytest.raises(SnapshotError):
+        loads_snapshot(b'not a snapshot')
+    data = bytearray(dumps_snapshot([]))
+    data[len(b'AMQCSLSNAP')] += 1
+    with pytest.raises(SnapshotError):
+        loads_snapshot(bytes(data))
+    with pytest.raises(SnapshotError):
+        dumps_snapshot([object()])
+    valid = dumps_snapshot([CSLTrack.from_json(data) for data in load('idolypride/tracks')])
+    with pytest.raises(SnapshotError, match='corrupted'):
+        loads_snapshot(valid[:-10])
+
+
+def test_snapshot_is_portable():
+    tracks = [CSLTrack.from_json(data) for data in load('idolypride/tracks')]
+    data = dumps_snapshot(tracks)
+    # Little endian fixed width fields and a JSON schema, so it doesn't depend on the interpreter that wrote it
+    start = len(b'AMQCSLSNAP') + 2
+    (schema_size,) = struct.unpack_from('<I', data, start)
+    schema = json.loads(data[start + 4 : start + 4 + schema_size])
+    assert schema[0][0] == 'CSLSongSample'
+    # Equal objects give equal snapshots
+    assert dumps_snapshot(loads_snapshot(data)) == data
+
+
+def test_track_store(tmp_path: Path):
+    tracks = [CSLTrack.from_json(data) for data in load('idolypride/tracks')]
+    path = tmp_path / 'tracks.store'
+    write_track_store(path, tracks)
+    with TrackStore.open(path) as store:
+        assert len(store) == len(tracks)
+        assert list(store) == tracks
+        for track in tracks:
+            assert store.get_track(track.id) == track
+            assert track.id in store
+            for cred in track.artist_credits:
+                assert store.get_artist(cred.artist.id) == cred.artist
+            if track.song is not None:
+                assert store.get_song(track.song.id) == track.song
+        assert store.get_track('mock-id-track-missing') is None
+        assert pickle.loads(pickle.dumps(store))[-1] == tracks[-1]
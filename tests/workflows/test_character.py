@@ -1,15 +1,20 @@
 import json
 from collections.abc import Sequence
+from pathlib import Path
 
+import attrs
 import pytest
 from attrs import define, field
 from helpers import load
-from httpx import Request, Response
+from httpx import HTTPStatusError, Request, Response
 from respx import Route, Router
 
-from amqcsl import AsyncDBClient, DBClient
-from amqcsl.objects import CSLArtistSample, CSLTrack
+from amqcsl import AsyncDBClient, DBClient, SerialExecutor
+from amqcsl.exceptions import AMQCSLError
+from amqcsl.objects import CSLArtistSample, CSLGroup, CSLTrack
+from amqcsl.objects._db_types import CSLExtraMetadata, CSLMetadata, ExtraMetadata
 from amqcsl.workflows import character as cm
+from amqcsl.workflows import runner
 
 compact_characters: cm.ArtistDict = {
     ('Liella!', 'Love Live! Superstar!! (11 members)'): (
@@ -291,3 +296,440 @@ async def test_artist_to_meta_async(router: Router, aclient: AsyncDBClient):
 
     assert route.call_count == 11
     assert liella_route.call_count == 2
+
+
+def test_match_artist_index():
+    artists = [
+        CSLArtistSample('a', 'Liella!', 'Liella!', None, 2),
+        CSLArtistSample('b', 'Liella!', 'Liella!', 'Love Live! Superstar!! (11 members)', 2),
+        CSLArtistSample('c', 'Liella!', 'リエラ', 'Love Live! Superstar!! (11 members)', 2),
+        CSLArtistSample('d', 'Liyuu', 'リーユウ', None, 1),
+    ]
+    index = cm._ArtistIndex(artists + artists[:2])
+    keys = [
+        cm.ArtistName('Liella!'),
+        cm.ArtistName('Liella!', 'Liella!'),
+        cm.ArtistName('Liella!', disambiguation='Love Live! Superstar!! (11 members)'),
+        cm.ArtistName('Liella!', 'リエラ', 'Love Live! Superstar!! (11 members)'),
+        cm.ArtistName('Liyuu'),
+        cm.ArtistName('Liyuu', 'Liyuu'),
+        cm.ArtistName('Sayuri Date'),
+    ]
+    for key in keys:
+        assert index.lookup(key) == [artist for artist in artists if key.match(artist)]
+
+    assert cm._match_artist(cm.ArtistName('Liyuu'), index) == artists[3]
+    assert cm._match_artist(cm.ArtistName('Sayuri Date'), index) is None
+    with pytest.raises(AMQCSLError, match='3 artists found'):
+        cm._match_artist(cm.ArtistName('Liella!'), index)
+
+
+def test_loose_match_artist():
+    artists = [
+        CSLArtistSample('a', 'Wakana Ookuma', '大熊和奏', None, 1),
+        CSLArtistSample('b', 'Sayuri Date', '伊達さゆり', None, 1),
+        CSLArtistSample('c', 'Kinako Sakurakouji', 'Sakurakoji Kinako', None, 1),
+        CSLArtistSample('d', 'Rin', 'りん', 'Band A', 1),
+        CSLArtistSample('e', 'RIN', 'RIN', 'Band B', 1),
+    ]
+    index = cm._ArtistIndex(artists)
+
+    def match(artist_name: cm.ArtistName):
+        return cm._loose_match_artist(artist_name, index)
+
+    assert match(cm.ArtistName('ｓａｙｕｒｉ　ＤＡＴＥ')) == artists[1]
+    assert match(cm.ArtistName('Sayuri-Date')) == artists[1]
+    assert match(cm.ArtistName('wakana ookuma', '大熊和奏')) == artists[0]
+    assert match(cm.ArtistName('Wakana Ookuma', 'Someone Else')) is None
+    assert match(cm.ArtistName('rin', disambiguation='band b')) == artists[4]
+    assert match(cm.ArtistName('Nako Misaki')) is None
+
+    # Spelling variants are only suggested, they can be different artists
+    assert index.loose_lookup(cm.ArtistName('Kinako Sakurakoji')) == [(1, artists[2])]
+    with pytest.raises(AMQCSLError, match='did you mean Kinako Sakurakouji'):
+        match(cm.ArtistName('Kinako Sakurakoji'))
+    with pytest.raises(AMQCSLError, match='did you mean Wakana Ookuma'):
+        match(cm.ArtistName('Wakana Okuma'))
+    with pytest.raises(AMQCSLError, match='2 artists loosely match'):
+        match(cm.ArtistName('Rin'))
+
+
+def test_loose_names_are_searched(router: Router, client: DBClient):
+    yuuki = {'id': 'mock-id-artist-yuuki', 'name': 'Yuuki', 'originalName': 'ゆうき', 'disambiguation': None, 'type': 1}
+    phrase_route = router.get(
+        '/api/artists',
+        name='artists_phrase',
+        params={'searchTerm': 'Band'},
+    ) % Response(200, json={'artists': [yuuki], 'count': 1})
+    name_route = router.get('/api/artists', name='artists') % Response(200, json={'artists': [], 'count': 0})
+
+    with pytest.raises(AMQCSLError, match='Could not find artist Yuki, did you mean Yuuki'):
+        cm.compact_make_artist_to_meta(client, {'Yuki': 'Character'}, ['Band'])
+    assert phrase_route.call_count == 1
+    assert [call.request.url.params['searchTerm'] for call in name_route.calls] == ['Yuki']
+
+
+def test_artist_to_meta_loose_names(router: Router, client: DBClient):
+    artist_data = load('superstar/liella')
+    liella_route = router.get(
+        '/api/artists',
+        name='artists_liella',
+        params={'searchTerm': 'Liella!'},
+    ) % Response(200, json={'artists': artist_data, 'count': len(artist_data)})
+    other_route = router.get('/api/artists', name='artists') % Response(200, json={'artists': [], 'count': 0})
+
+    expected_artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!'])
+    renames = {
+        ('Liella!', 'Love Live! Superstar!! (11 members)'): ('liella', 'Love Live! Superstar!! (11 members)'),
+        'Sayuri Date': 'sayuri  DATE',
+    }
+    loose_artists = {renames.get(key, key): value for key, value in artists.items()}
+    artist_to_meta = cm.make_artist_to_meta(client, characters, loose_artists, ['Liella!'])
+    assert artist_to_meta == expected_artist_to_meta
+    assert liella_route.call_count == 2
+    # Names without exact matches are still searched for before falling back to normalized names
+    assert [call.request.url.params['searchTerm'] for call in other_route.calls] == ['liella', 'sayuri  DATE']
+
+
+def test_artist_cache_sync(router: Router, client: DBClient, tmp_path: Path):
+    artist_data = load('superstar/liella')
+
+    def artist_route(req: Request):
+        search_term = req.url.params['searchTerm']
+        artists = [artist for artist in artist_data if search_term in artist['name']]
+        return Response(200, json={'artists': artists, 'count': len(artists)})
+
+    def get_artist_route(req: Request, artist_id: str):
+        [artist] = [artist for artist in artist_data if artist['id'] == artist_id]
+        relations = {'forwardRelations': [], 'reverseRelations': [], 'linkedAMQSongs': [], 'linkedTracks': []}
+        return Response(200, json=artist | relations)
+
+    search_route = router.get('/api/artists', name='artists').mock(side_effect=artist_route)
+    get_route = router.get(url__regex=r'/api/artist/(?P<artist_id>[\w-]+)$', name='get_artist')
+    get_route.side_effect = get_artist_route
+
+    expected_artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!'])
+    search_calls = search_route.call_count
+
+    with cm.ArtistCache(tmp_path / 'artists.json') as cache:
+        assert cm.make_artist_to_meta(client, characters, artists, ['Liella!'], cache=cache) == expected_artist_to_meta
+    assert len(cache) == len(artists)
+    search_calls_after_fill = search_route.call_count
+    assert search_calls_after_fill == 2 * search_calls
+
+    cache = cm.ArtistCache(tmp_path / 'artists.json')
+    assert cm.make_artist_to_meta(client, characters, artists, ['Liella!'], cache=cache) == expected_artist_to_meta
+    assert search_route.call_count == search_calls_after_fill
+    assert not get_route.called
+
+    cache = cm.ArtistCache(tmp_path / 'artists.json', ttl=0)
+    assert cm.make_artist_to_meta(client, characters, artists, ['Liella!'], cache=cache) == expected_artist_to_meta
+    assert search_route.call_count == search_calls_after_fill
+    assert get_route.call_count == len(artists)
+
+
+@pytest.mark.asyncio
+async def test_artist_cache_async(router: Router, aclient: AsyncDBClient, tmp_path: Path):
+    artist_data = load('superstar/liella')
+    search_route = router.get('/api/artists', name='artists') % Response(
+        200, json={'artists': artist_data, 'count': len(artist_data)}
+    )
+
+    cache = cm.ArtistCache(tmp_path / 'artists.json')
+    stale_artist = CSLArtistSample('stale-id', 'Liyuu', 'Liyuu', None, 1)
+    cache.add('Liyuu', stale_artist)
+    cache.entries[cache._key('Liyuu')]['resolved_at'] = 0
+    _ = router.get('/api/artist/stale-id', name='get_artist') % Response(404)
+
+    expected_artist_to_meta = await cm.compact_make_artist_to_meta(aclient, compact_characters, ['Liella!'])
+    search_calls = search_route.call_count
+    artist_to_meta = await cm.compact_make_artist_to_meta(aclient, compact_characters, ['Liella!'], cache=cache)
+    assert artist_to_meta == expected_artist_to_meta
+    assert stale_artist not in artist_to_meta
+    assert search_route.call_count == 2 * search_calls
+
+    cache = cm.ArtistCache(tmp_path / 'artists.json')
+    artist_to_meta = await cm.compact_make_artist_to_meta(aclient, compact_characters, ['Liella!'], cache=cache)
+    assert artist_to_meta == expected_artist_to_meta
+    assert search_route.call_count == 2 * search_calls
+
+
+def test_artist_to_meta_stop_early_sync(router: Router, client: DBClient):
+    # Searches in turn, so the second phrase is only searched when stopping early is off
+    client.executor = SerialExecutor()
+    artist_data = load('superstar/liella')
+    liella_route = router.get(
+        '/api/artists',
+        name='artists_liella',
+        params={'searchTerm': 'Liella!'},
+    ) % Response(200, json={'artists': artist_data, 'count': len(artist_data)})
+    other_route = router.get('/api/artists', name='artists') % Response(200, json={'artists': [], 'count': 0})
+
+    expected_artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!', 'Superstar'])
+    assert other_route.call_count == 1
+
+    artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!', 'Superstar'], stop_early=True)
+    assert artist_to_meta == expected_artist_to_meta
+    assert liella_route.call_count == 2
+    assert other_route.call_count == 1
+
+
+def test_artist_to_meta_stop_early_default_executor(router: Router, client: DBClient):
+    # Pages of a search are requested one at a time when stopping early, even on the thread pool
+    artist_data = load('superstar/liella')
+    filler = [{**artist_data[0], 'id': f'mock-id-artist-filler{i}', 'name': f'Filler {i}'} for i in range(50)]
+
+    def search(req: Request) -> Response:
+        # Only the second of 10 pages has the artists being searched for
+        page = artist_data + filler[len(artist_data) :] if req.url.params['skip'] == '50' else filler
+        return Response(200, json={'artists': page, 'count': 500})
+
+    route = router.get('/api/artists', name='artists', params={'searchTerm': 'Liella!'})
+    route.side_effect = search
+
+    artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!'], stop_early=True)
+    assert route.call_count == 2
+    assert artist_to_meta == cm.make_artist_to_meta(client, characters, artists, ['Liella!'])
+    assert route.call_count == 2 + 10
+
+
+@pytest.mark.asyncio
+async def test_artist_to_meta_stop_early_async(router: Router, aclient: AsyncDBClient):
+    artist_data = load('superstar/liella')
+    liella_route = router.get(
+        '/api/artists',
+        name='artists_liella',
+        params={'searchTerm': 'Liella!'},
+    ) % Response(200, json={'artists': artist_data, 'count': len(artist_data)})
+    other_route = router.get('/api/artists', name='artists') % Response(200, json={'artists': [], 'count': 0})
+    phrases = ['Liella!', 'Superstar', 'Love Live!', 'Nijigasaki']
+
+    expected_artist_to_meta = await cm.make_artist_to_meta(aclient, characters, artists, phrases, max_searches=2)
+    assert other_route.call_count == 3
+
+    artist_to_meta = await cm.make_artist_to_meta(
+        aclient, characters, artists, phrases, stop_early=True, max_searches=1
+    )
+    assert artist_to_meta == expected_artist_to_meta
+    assert liella_route.call_count == 2
+    assert other_route.call_count == 3
+
+    with pytest.raises(ValueError):
+        await cm.make_artist_to_meta(aclient, characters, artists, phrases, max_searches=0)
+
+
+@pytest.mark.asyncio
+async def test_unknown_artist_report(
+    aspire_fixture: AspireFixture,
+    aclient: AsyncDBClient,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    artist_to_meta = await cm.make_artist_to_meta(aclient, characters, artists, ['Liella!'])
+    [liyuu] = [artist for artist in artist_to_meta if artist.name == 'Liyuu']
+    artist_to_meta = {artist: metas for artist, metas in artist_to_meta.items() if artist != liyuu}
+
+    report = cm.UnknownArtistReport()
+    async for track, meta in aclient.iter_tracks_with_metadata('Aspire'):
+        cm.queue_character_metadata(aclient, track, artist_to_meta, meta, report)
+    assert [track.id for track in report.tracks] == ['mock-id-track-fundamental']
+    assert list(report.by_artist()) == [liyuu]
+
+    inputs = iter(['y'])
+    monkeypatch.setattr('builtins.input', lambda _: next(inputs))
+    assert report.review()
+    assert next(inputs, None) is None
+    assert cm.UnknownArtistReport().review()
+
+
+@pytest.fixture
+def group_fixture(router: Router, aspire_fixture: AspireFixture) -> AspireFixture:
+    track_data = load('superstar/aspire')
+    _ = router.post('/api/tracks', name='group_tracks') % Response(
+        200, json={'tracks': track_data, 'count': len(track_data)}
+    )
+    return aspire_fixture
+
+
+def test_run_pipeline_sync(group_fixture: AspireFixture, client: DBClient):
+    artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!'])
+    progress: list[int] = []
+    stats = cm.run_pipeline(
+        client,
+        client.groups['Love Live! Sunshine!!'],
+        artist_to_meta,
+        on_progress=lambda stats: progress.append(stats.tracks + stats.written),
+    )
+    assert stats.tracks == group_fixture.num_tracks
+    assert stats.written == group_fixture.num_tracks - 2
+    assert not stats.failed and not stats.report
+    assert progress == sorted(progress) and progress[-1] == stats.tracks + stats.written
+    assert not client.queue
+
+    for track_id, req_content in group_fixture.calls.items():
+        assert_metadatas(req_content, expected_track_names[track_id])
+
+
+def test_run_pipeline_unexpected_error(group_fixture: AspireFixture, client: DBClient):
+    artist_to_meta = cm.make_artist_to_meta(client, characters, artists, ['Liella!'])
+
+    def broken(request: Request, track_id: str):
+        raise RuntimeError('bug')
+
+    # Only db, network and input errors are reported per track, anything else is a bug and stops the run
+    group_fixture.route.side_effect = broken
+    with pytest.raises(RuntimeError, match='bug'):
+        cm.run_pipeline(client, client.groups['Love Live! Sunshine!!'], artist_to_meta)
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_async(group_fixture: AspireFixture, aclient: AsyncDBClient):
+    artist_to_meta = await cm.make_artist_to_meta(aclient, characters, artists, ['Liella!'])
+    failing_id = 'mock-id-track-overover'
+    side_effect = group_fixture.route.side_effect
+
+    def fail_one(request: Request, track_id: str):
+        if track_id == failing_id:
+            return Response(500)
+        return side_effect(request, track_id)  # type: ignore[reportCallIssue]
+
+    group_fixture.route.side_effect = fail_one
+    stats = await cm.run_pipeline(aclient, aclient.groups['Love Live! Sunshine!!'], artist_to_meta, max_writes=2)
+    assert stats.tracks == group_fixture.num_tracks
+    assert stats.written == group_fixture.num_tracks - 3
+    assert [track.id for track, _ in stats.failed] == [failing_id]
+    assert stats.tracks_per_s > 0
+    assert not aclient.queue
+
+    assert len(group_fixture.calls) == group_fixture.num_tracks - 3
+    for track_id, req_content in group_fixture.calls.items():
+        assert_metadatas(req_content, expected_track_names[track_id])
+
+
+def test_compiled_artist_to_meta():
+    tracks = [CSLTrack.from_json(track) for track in load('superstar/aspire')]
+    artist_to_meta = {
+        cred.artist: [ExtraMetadata(True, 'Character', cred.artist.name)]
+        for track in tracks
+        for cred in track.artist_credits
+        if cred.artist.name != 'Liyuu'
+    }
+    compiled = cm.compile_artist_to_meta(artist_to_meta)
+    assert cm.compile_artist_to_meta(compiled) is compiled
+    assert len(compiled) == len(artist_to_meta)
+    assert dict(compiled.items()) == {artist: tuple(metas) for artist, metas in artist_to_meta.items()}
+    [artist] = list(artist_to_meta)[:1]
+    assert attrs.evolve(artist, name='Renamed') in compiled
+
+    existing = CSLMetadata(
+        False,
+        [],
+        [
+            CSLExtraMetadata('meta-1', 2, 'Character', 'Old Character'),
+            CSLExtraMetadata('meta-2', 2, 'Character', 'Sayuri Date'),
+        ],
+        2,
+        [],
+    )
+    handler = ArtistHandler()
+    for track in tracks:
+        for meta in (None, existing):
+            plain = cm.QueueCharacterMetadataBundle(track, artist_to_meta, meta, handler)
+            fast = cm.QueueCharacterMetadataBundle(track, compiled, meta, handler)
+            assert fast.unknown_artists == plain.unknown_artists
+            assert [bundle.filtered_metas for bundle in fast.bundles[:1]] == [
+                bundle.filtered_metas for bundle in plain.bundles[:1]
+            ]
+            assert fast.bundles[1:] == plain.bundles[1:]
+
+
+@pytest.mark.asyncio
+async def test_diff_character_metadata(aspire_fixture: AspireFixture, router: Router, aclient: AsyncDBClient):
+    delete_route = router.delete(url__regex=r'/api/track/[\w-]+/metadata/meta-(old|kanon)') % Response(200)
+    artist_to_meta = await cm.make_artist_to_meta(aclient, characters, artists, ['Liella!'])
+    tracks = [CSLTrack.from_json(track) for track in load('superstar/aspire')]
+    existing = CSLMetadata(
+        False,
+        [],
+        [
+            CSLExtraMetadata('meta-old', 2, 'Character', 'Old Character'),
+            CSLExtraMetadata('meta-kanon', 2, 'Character', 'Kanon Shibuya'),
+        ],
+        2,
+        [],
+    )
+    pairs = [(track, existing if i % 2 else None) for i, track in enumerate(tracks)]
+
+    diff = cm.diff_character_metadata(pairs, artist_to_meta)
+    assert diff.tracks == len(tracks)
+    assert not diff.report
+    edits = {edit.track.id: edit for edit in diff.edits}
+    for track, meta in pairs:
+        bundle = cm.QueueCharacterMetadataBundle(track, artist_to_meta, meta, ArtistHandler())
+        if track.type == 'OffVocal' or not any(bundle.bundles):
+            assert track.id not in edits
+            continue
+        edit = edits[track.id]
+        [add, *removes] = bundle.bundles
+        assert set(edit.add) == set(add.filtered_metas[1])
+        assert set(edit.remove) == {remove.meta for remove in removes}
+
+    bundles = diff.bundles(chunk_size=5)
+    assert [len(bundle.edits) for bundle in bundles] == [5] * (len(edits) // 5) + [len(edits) % 5] * bool(
+        len(edits) % 5
+    )
+    diff.enqueue(aclient, chunk_size=5)
+    await aclient.commit()
+    assert aspire_fixture.calls.keys() == {edit.track.id for edit in diff.edits if edit.add}
+    assert delete_route.call_count == sum(len(edit.remove) for edit in diff.edits) > 0
+    for track_id, req_content in aspire_fixture.calls.items():
+        assert_metadatas(req_content, {meta.value for meta in edits[track_id].add})
+
+
+@pytest.mark.asyncio
+async def test_run_groups(aspire_fixture: AspireFixture, router: Router, aclient: AsyncDBClient):
+    track_data = load('superstar/aspire')
+
+    def tracks_route(request: Request):
+        match json.loads(request.content)['groupFilters']:
+            case ['mock-id-group-lovelivesunshine']:
+                return Response(200, json={'tracks': track_data, 'count': len(track_data)})
+            case ['mock-id-group-idolypride']:
+                return Response(500)
+            case _:
+                return Response(200, json={'tracks': [], 'count': 0})
+
+    _ = router.post('/api/tracks', name='group_tracks').mock(side_effect=tracks_route)
+    sunshine = aclient.groups['Love Live! Sunshine!!']
+    idolypride = aclient.groups['IDOLY PRIDE']
+    bocchi = aclient.groups['Bocchi the Rock!']
+
+    progress: dict[str, int] = {}
+
+    def on_progress(group: CSLGroup, stats: cm.PipelineStats):
+        progress[group.name] = stats.tracks
+
+    report = await runner.run_groups(
+        aclient,
+        {
+            sunshine: runner.CharacterConfig(artists, characters, ['Liella!']),
+            idolypride: {},
+            bocchi: {},
+        },
+        max_groups=2,
+        on_progress=on_progress,
+    )
+    assert [result.group for result in report] == [sunshine, idolypride, bocchi]
+    assert [result.group for result in report.failed] == [idolypride]
+
+    sunshine_result = report.results[sunshine.id]
+    assert sunshine_result.ok and sunshine_result.stats is not None
+    assert sunshine_result.stats.written == aspire_fixture.num_tracks - 2
+    assert progress[sunshine.name] == aspire_fixture.num_tracks
+    for track_id, req_content in aspire_fixture.calls.items():
+        assert_metadatas(req_content, expected_track_names[track_id])
+
+    assert isinstance(report.results[idolypride.id].error, HTTPStatusError)
+    assert report.results[bocchi.id].ok
+    summary = report.summary()
+    assert '2 of 3 groups succeeded' in summary
+    assert f'{idolypride.name}: stopped by' in summary